@@ -6,6 +6,7 @@ from coinmetrics.bitsql.schema import *
 from coinmetrics.bitsql.query import *
 from coinmetrics.bitsql.exporter import *
 from coinmetrics.bitsql.node import *
+from coinmetrics.bitsql.blockfiles import BlockFileNode
 from coinmetrics.bitsql.aggregator import *
 from coinmetrics.bitsql.omni.node import OmniNode
 from coinmetrics.bitsql.omni.schema import OmniSchema
@@ -109,23 +110,23 @@ def dbObjectsFactory(asset, db, log):
         return schema, query, exporter, aggregator
 
 
-def nodeFactory(asset, *args):
+def nodeFactory(asset, *args, **kwargs):
     registry = {
-        "btc": lambda: BitcoinNode(*args),
-        "bch": lambda: BitcoinNode(*args),
-        "btg": lambda: BitcoinGoldNode(*args),
-        "bsv": lambda: BitcoinSvNode(*args),
-        "ltc": lambda: BitcoinNodeBase(*args),
-        "vtc": lambda: BitcoinNodeBase(*args),
-        "doge": lambda: DogecoinNode(*args),
-        "dash": lambda: DashNode(*args),
-        "dgb": lambda: BitcoinNodeBase(*args),
-        "xvg": lambda: VergeNode(*args),
-        "zec": lambda: ZcashNode(*args),
-        "btcp": lambda: BitcoinPrivateNode(*args),
-        "pivx": lambda: PivxNode(*args),
-        "dcr": lambda: DecredNode(*args),
-        "omnilayer": lambda: OmniNode(*args),
+        "btc": lambda: BitcoinNode(*args, **kwargs),
+        "bch": lambda: BitcoinCashNode(*args, **kwargs),
+        "btg": lambda: BitcoinGoldNode(*args, **kwargs),
+        "bsv": lambda: BitcoinSvNode(*args, **kwargs),
+        "ltc": lambda: BitcoinNodeBase(*args, **kwargs),
+        "vtc": lambda: BitcoinNodeBase(*args, **kwargs),
+        "doge": lambda: DogecoinNode(*args, **kwargs),
+        "dash": lambda: DashNode(*args, **kwargs),
+        "dgb": lambda: BitcoinNodeBase(*args, **kwargs),
+        "xvg": lambda: VergeNode(*args, **kwargs),
+        "zec": lambda: ZcashNode(*args, **kwargs),
+        "btcp": lambda: BitcoinPrivateNode(*args, **kwargs),
+        "pivx": lambda: PivxNode(*args, **kwargs),
+        "dcr": lambda: DecredNode(*args, **kwargs),
+        "omnilayer": lambda: OmniNode(*args, **kwargs),
     }
 
     if asset not in registry:
@@ -134,9 +135,9 @@ def nodeFactory(asset, *args):
         return registry[asset]()
 
 
-def runExport(asset, nodeList, dbParams, log, loop=False, lag=60 * 60 * 2, rpcThreads=8):
+def getNodesByHeight(asset, nodeList, log, **nodeOptions):
     def getNodeBlockCount(index, nodeParams):
-        node = nodeFactory(asset, *nodeParams)
+        node = nodeFactory(asset, *nodeParams, **nodeOptions)
         try:
             blockCount = node.getBlockCount()
             return (index, blockCount, node)
@@ -144,64 +145,64 @@ def runExport(asset, nodeList, dbParams, log, loop=False, lag=60 * 60 * 2, rpcTh
             log.warning("failed to get block count from node {0}: {1}".format(nodeParams, e))
             raise e
 
-    def pickNode(nodeList, asset):
-        args = [(index, nodeParams) for index, nodeParams in enumerate(nodeList)]
-        result = [value for value, exception in executeInParallelSameProc(getNodeBlockCount, args) if exception is None]
+    args = [(index, nodeParams) for index, nodeParams in enumerate(nodeList)]
+    result = [value for value, exception in executeInParallelSameProc(getNodeBlockCount, args) if exception is None]
 
-        if len(result) == 0:
-            raise Exception("failed to get block count from any node")
-        else:
-            pick, bestHeight, bestIndex = None, 0, len(nodeList)
-            for index, blockCount, node in result:
-                if blockCount > bestHeight:
-                    bestHeight = blockCount
-                    bestIndex = index
-                    pick = node
-                elif blockCount == bestHeight:
-                    if index < bestIndex:
-                        bestIndex = index
-                        pick = node
-            log.info("picked node: {0}".format(pick))
-            return pick, bestHeight
+    if len(result) == 0:
+        raise Exception("failed to get block count from any node")
+    else:
+        # highest block count goes first, ties are resolved by the order of nodes in the list
+        result = sorted(result, key=lambda value: (-value[1], value[0]))
+        return [(node, blockCount) for _, blockCount, node in result]
 
-    def proc(db):
-        node, nodeHeight = pickNode(nodeList, asset)
-        _, query, exporter, _ = dbObjectsFactory(asset, db, log)
 
-        blockTime = BLOCK_TIMES[asset]
-        blockLag = lag // blockTime
-        blocksPerWeek = 7 * 24 * 3600 // blockTime
+def getHeightsToSync(asset, query, nodeHeight, lag, log):
+    blockLag = lag // BLOCK_TIMES[asset]
+
+    dbHeight = query.getBlockHeight()
+    if dbHeight is None:
+        dbHeight = -1
+    nodeHeight -= blockLag
+
+    if nodeHeight <= dbHeight:
+        log.info("node height (%d) is smaller than or equal to db height (%d), nothing to do" % (nodeHeight, dbHeight))
+        return []
+    else:
+        log.info("node height: %d, db height: %d, blocks to sync: %d" % (nodeHeight, dbHeight, nodeHeight - dbHeight))
+        return [i + dbHeight + 1 for i in range(nodeHeight - dbHeight)]
 
-        dbHeight = query.getBlockHeight()
-        if dbHeight is None:
-            dbHeight = -1
-        nodeHeight -= blockLag
 
-        if nodeHeight <= dbHeight:
-            log.info("node height (%d) is smaller than or equal to db height (%d), nothing to do" % (nodeHeight, dbHeight))
-            return False, False
+def setupExporter(exporter, copyLoader, writeBatchRows, utxoCacheSize, log):
+    if copyLoader:
+        if isinstance(exporter, BitcoinExporter):
+            exporter.setUseCopy(True)
         else:
-            log.info("node height: %d, db height: %d, blocks to sync: %d" % (nodeHeight, dbHeight, nodeHeight - dbHeight))
-            fromHeight = dbHeight + 1
-            toHeight = nodeHeight
-
-            def load(height, stopSignal):
-                return node.getBlock(height)
-
-            def store(blockData, stopSignal):
-                exporter.pushBlock(blockData)
-                log.info("saved block at height: %d (%s)" % (blockData.blockHeight, blockData.blockTime))
-
-            heights = [i + fromHeight for i in range(toHeight - fromHeight + 1)]
-            eta = ETA(log, toHeight - fromHeight + 1, blocksPerWeek, 10)
-            loadPipeline = pipelines.LinearMultithreadedPipeline(rpcThreads, load, "node")
-            storePipeline = pipelines.LinearMultithreadedPipeline(1, store, "db")
-            pipelines.OrderingConnector(loadPipeline, storePipeline)
-            result = pipelines.runPipelineChain(heights, [loadPipeline, storePipeline], log, eta, lambda task: "height " + str(task), 64)
-            return result
+            log.warning("COPY loader is not supported by {0}, using INSERT".format(type(exporter).__name__))
+    if writeBatchRows > 0:
+        if isinstance(exporter, BitcoinExporter):
+            exporter.setWriteBatch(writeBatchRows, WRITE_BATCH_MAX_BYTES)
+        else:
+            log.warning("write batches are not supported by {0}, committing every block".format(type(exporter).__name__))
+    if utxoCacheSize > 0:
+        if isinstance(exporter, BitcoinExporter):
+            exporter.setUtxoCache(utxoCacheSize)
+        else:
+            log.warning("utxo cache is not supported by {0}".format(type(exporter).__name__))
+
+
+def getHeightsToSyncInRange(query, heightRange, nodeHeight, log):
+    # heights of the range that are not exported yet; besides the end of an interrupted range, these can be gaps of
+    # a range whose blocks were lost after a crash
+    fromHeight, toHeight = heightRange
+    toHeight = min(toHeight, nodeHeight)
+    heights = query.getMissingBlockHeightsBetween(fromHeight, toHeight) if toHeight >= fromHeight else []
+    log.info("range %d-%d, blocks to sync: %d" % (fromHeight, toHeight, len(heights)))
+    return heights
+
 
+def runExportProc(proc, dbParams, log, loop):
     if not loop:
-        proc(postgresFactory(*dbParams))
+        return proc(postgresFactory(*dbParams))
     else:
         while True:
             keyboardInterrupt = False
@@ -221,3 +222,152 @@ def runExport(asset, nodeList, dbParams, log, loop=False, lag=60 * 60 * 2, rpcTh
                 time.sleep(30.0)
             except KeyboardInterrupt:
                 break
+
+
+# nodes used by block parsing worker processes, created on first use in each process and keyed by the parameters they
+# were built from, see exportBlocksWithParseProcesses
+parserNodes = {}
+
+
+def getParserNode(asset, nodeParams, nodeOptions):
+    key = (asset, tuple(nodeParams), tuple(sorted(nodeOptions.items())))
+    if key not in parserNodes:
+        parserNodes[key] = nodeFactory(asset, *nodeParams, **nodeOptions)
+    return parserNodes[key]
+
+
+def parseBlockInProcess(task):
+    asset, nodeParams, nodeOptions, responses = task
+    return getParserNode(asset, nodeParams, nodeOptions).parseBlockResponses(responses)
+
+
+def createStorePipeline(exporter, log):
+    def store(blockData, stopSignal):
+        exporter.pushBlock(blockData)
+        log.info("saved block at height: %d (%s)" % (blockData.blockHeight, blockData.blockTime))
+        # pending count includes the block being stored
+        exporter.flushIfNeeded(storePipeline.getPendingCount() > 1)
+
+    storePipeline = pipelines.LinearMultithreadedPipeline(1, store, "db")
+    return storePipeline
+
+
+def finishStorePipeline(storePipeline, exporter):
+    # blocks of an open write batch are complete and in order unless the store itself failed mid-block
+    if not storePipeline.faulted():
+        exporter.flush()
+
+
+def exportBlocks(node, heights, exporter, log, eta, rpcThreads):
+    def load(height, stopSignal):
+        return node.getBlock(height)
+
+    loadPipeline = pipelines.LinearMultithreadedPipeline(rpcThreads, load, "node")
+    storePipeline = createStorePipeline(exporter, log)
+    pipelines.OrderingConnector(loadPipeline, storePipeline)
+    result = pipelines.runPipelineChain(heights, [loadPipeline, storePipeline], log, eta, lambda task: "height " + str(task), 64)
+    finishStorePipeline(storePipeline, exporter)
+    return result
+
+
+def exportBlocksWithParseProcesses(asset, nodeParams, nodeOptions, node, heights, exporter, log, eta, rpcThreads, parseProcesses):
+    # rpc threads only move response bodies around, decoding and conversion to block data (which holds the GIL)
+    # happens in worker processes, each with its own node object built from the same parameters
+    def load(height, stopSignal):
+        return asset, nodeParams, nodeOptions, node.fetchBlockResponses(height)
+
+    loadPipeline = pipelines.LinearMultithreadedPipeline(rpcThreads, load, "node")
+    parsePipeline = pipelines.LinearMultiprocessPipeline(parseProcesses, parseBlockInProcess, "parse")
+    storePipeline = createStorePipeline(exporter, log)
+    pipelines.UnorderedConnector(loadPipeline, parsePipeline)
+    pipelines.OrderingConnector(parsePipeline, storePipeline)
+    result = pipelines.runPipelineChain(heights, [loadPipeline, parsePipeline, storePipeline], log, eta,
+                                        lambda task: "height " + str(task), 64)
+    finishStorePipeline(storePipeline, exporter)
+    return result
+
+
+def exportBlockBatches(node, heights, exporter, log, eta, rpcThreads):
+    # heights are fetched in batches that grow or shrink with observed block size, so that early history with tiny blocks
+    # goes at hundreds of blocks per request; batch size is re-evaluated every round of rpcThreads * 4 batches
+    batchSize = pipelines.AdaptiveBatchSize(BATCH_FETCH_TARGET_SIZE, 1, BATCH_FETCH_MAX_BLOCKS, initialBatchSize=10)
+
+    def load(batch, stopSignal):
+        blocks = node.getBlocks(batch)
+        batchSize.observe(len(blocks), sum(blockData.blockSize for blockData in blocks))
+        return blocks
+
+    def store(blocks, stopSignal):
+        exporter.pushBlocks(blocks)
+        log.info("saved blocks at heights: %d-%d (%s)" % (blocks[0].blockHeight, blocks[-1].blockHeight, blocks[-1].blockTime))
+        exporter.flushIfNeeded(storePipeline.getPendingCount() > 1)
+        eta.workFinished(len(blocks))
+        eta.workStarted()
+
+    position = 0
+    eta.workStarted()
+    while position < len(heights):
+        size = batchSize.get()
+        batches = []
+        while position < len(heights) and len(batches) < rpcThreads * 4:
+            batches.append(heights[position:position + size])
+            position += size
+
+        log.info("fetching %d batches of up to %d blocks" % (len(batches), size))
+        loadPipeline = pipelines.LinearMultithreadedPipeline(rpcThreads, load, "node")
+        storePipeline = pipelines.LinearMultithreadedPipeline(1, store, "db")
+        pipelines.OrderingConnector(loadPipeline, storePipeline)
+        result, keyboardInterrupt = pipelines.runPipelineChain(batches, [loadPipeline, storePipeline], log, None,
+                                                               lambda task: "heights %d-%d" % (task[0], task[-1]), 64)
+        finishStorePipeline(storePipeline, exporter)
+        if not result or keyboardInterrupt:
+            return result, keyboardInterrupt
+
+    return True, False
+
+
+def runExport(asset, nodeList, dbParams, log, loop=False, lag=60 * 60 * 2, rpcThreads=8, batchFetch=False, rawBlocks=False,
+              blocksDir=None, blockIndexPath=None, parseProcesses=0, copyLoader=False, writeBatchRows=0,
+              utxoCacheSize=0, initialSync=False, heightRange=None):
+    if parseProcesses > 0 and (batchFetch or blocksDir is not None):
+        raise Exception("parse processes can't be combined with batch fetch or block files export")
+    nodeOptions = {"rpcPoolSize": rpcThreads}
+    if rawBlocks:
+        nodeOptions["rawBlocks"] = True
+    blockFileNode = None
+
+    def proc(db):
+        nonlocal blockFileNode
+        if blocksDir is not None:
+            # node is only used to convert blocks read from disk, it's not queried
+            if blockFileNode is None:
+                blockFileNode = BlockFileNode(asset, nodeFactory(asset, *nodeList[0]), blocksDir, blockIndexPath, log)
+            node, nodeHeight = blockFileNode, blockFileNode.getBlockCount()
+        else:
+            node, nodeHeight = getNodesByHeight(asset, nodeList, log, **nodeOptions)[0]
+        log.info("picked node: {0}".format(node))
+        schema, query, exporter, _ = dbObjectsFactory(asset, db, log)
+        setupExporter(exporter, copyLoader, writeBatchRows, utxoCacheSize, log)
+        if initialSync:
+            exporter.setDeferredSpends(schema.getDeferredSpendsTableName())
+
+        blocksPerWeek = 7 * 24 * 3600 // BLOCK_TIMES[asset]
+        if heightRange is None:
+            heights = getHeightsToSync(asset, query, nodeHeight, lag, log)
+        else:
+            heights = getHeightsToSyncInRange(query, heightRange, nodeHeight, log)
+        if len(heights) == 0:
+            return True, False
+        else:
+            eta = ETA(log, len(heights), blocksPerWeek, 10)
+            if batchFetch:
+                result = exportBlockBatches(node, heights, exporter, log, eta, rpcThreads)
+            elif parseProcesses > 0:
+                result = exportBlocksWithParseProcesses(asset, node.getConnectionParameters(), nodeOptions, node, heights, exporter, log, eta,
+                                                        rpcThreads, parseProcesses)
+            else:
+                result = exportBlocks(node, heights, exporter, log, eta, rpcThreads)
+            log.info("rpc connection stats for node {0}: {1}".format(node, node.getConnectionStats()))
+            return result
+
+    return runExportProc(proc, dbParams, log, loop)
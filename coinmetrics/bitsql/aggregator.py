@@ -1,9 +1,28 @@
+import concurrent.futures
+import threading
 from datetime import timedelta, datetime
 from coinmetrics.utils.eta import ETA
 from coinmetrics.utils.timeutil import alignDateToInterval
+from coinmetrics.bitsql.query import ExplainQueryAccess
+from coinmetrics.bitsql.bitmap import RoaringBitmap
+from coinmetrics.bitsql.sketch import HyperLogLog
+
+# metrics missing on at least this many dates are computed with range queries, each covering at most this many days
+RANGE_QUERY_MIN_DATES = 7
+RANGE_QUERY_MAX_DAYS = 366
+# quantiles of daily fee and transaction value metrics estimated from sketches
+SKETCH_QUANTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
 
 
 class DailyStatistic(object):
+    # whether the metric reads only blocks, transactions and outputs of its own day (see BitcoinQuery.materializeDay)
+    dayScoped = False
+    # whether the metric starts from its own value of the previous day, so that dates have to be computed in order
+    sequential = False
+    # query method returning (date, value) rows for a range of days, see BitcoinQuery.getDailyTxCountBetween
+    rangeProc = None
+    # block statistics total the metric is the sum of, see BitcoinQuery.getBlockStatsTotalsBetween
+    blockStatsTotal = None
 
     def __init__(self, name, dataType, dbAccess, query):
         self.name = name
@@ -41,9 +60,27 @@ class DailyStatistic(object):
             INSERT INTO {0} (date, value) VALUES (%s, %s)
             ON CONFLICT ON CONSTRAINT {0}_pkey DO UPDATE SET value=EXCLUDED.value""".format(self.tableName), (date, value))
 
+    def saveAll(self, values):
+        # values of many dates in one statement
+        self.dbAccess.executeValues("""
+            INSERT INTO {0} (date, value) VALUES %s
+            ON CONFLICT ON CONSTRAINT {0}_pkey DO UPDATE SET value=EXCLUDED.value""".format(self.tableName),
+            sorted(values.items()), 512)
+        self.dbAccess.commit()
+
     def calculateForDate(self, date):
         pass
 
+    def supportsRanges(self):
+        return self.rangeProc is not None and getattr(self.query, self.rangeProc, None) is not None
+
+    def runOnRange(self, minDate, maxDate, save=True):
+        # values of the dates in [minDate, maxDate) that have any data
+        values = dict(getattr(self.query, self.rangeProc)(minDate, maxDate))
+        if save and len(values) > 0:
+            self.saveAll(values)
+        return values
+
 
 class SimpleStatistic(DailyStatistic):
 
@@ -51,6 +88,10 @@ class SimpleStatistic(DailyStatistic):
         super(SimpleStatistic, self).__init__(self.name, self.dataType, dbAccess, query)
 
     def calculateForDate(self, date):
+        if self.blockStatsTotal in getattr(self.query, "blockStatsTotals", []):
+            totals = self.query.getBlockStatsTotalsBetween(date, date + timedelta(days=1))
+            if totals is not None:
+                return totals[self.blockStatsTotal]
         return getattr(self.query, self.proc)(date, date + timedelta(days=1))
 
 
@@ -58,81 +99,118 @@ class DailyTxCountStatistic(SimpleStatistic):
     name = "tx_count"
     dataType = "INTEGER"
     proc = "getTxCountBetween"
+    rangeProc = "getDailyTxCountBetween"
+    blockStatsTotal = "tx_count"
+    dayScoped = True
 
 class DailyTxVolumeStatistic(SimpleStatistic):
     name = "tx_volume"
     dataType = "DECIMAL(32)"
     proc = "getOutputVolumeBetween"
+    rangeProc = "getDailyOutputVolumeBetween"
+    dayScoped = True
 
 class DailyActiveAddressesStatistic(SimpleStatistic):
     name = "active_addresses"
     dataType = "INTEGER"
     proc = "getActiveAddressesCountBetween"
+    rangeProc = "getDailyActiveAddressesCountBetween"
+    dayScoped = True
 
 class DailyFeesStatistic(SimpleStatistic):
     name = "fees"
     dataType = "BIGINT"
     proc = "getFeesVolumeBetween"
+    rangeProc = "getDailyFeesVolumeBetween"
+    blockStatsTotal = "fee_sum"
+    dayScoped = True
 
 class DailyRewardStatistic(SimpleStatistic):
     name = "reward"
     dataType = "BIGINT"
     proc = "getRewardBetween"
+    rangeProc = "getDailyRewardBetween"
+    blockStatsTotal = "reward"
+    dayScoped = True
 
 class DailyAverageDifficultyStatistic(SimpleStatistic):
     name = "average_difficulty"
     dataType = "FLOAT"
     proc = "getAverageDifficultyBetween"
+    rangeProc = "getDailyAverageDifficultyBetween"
+    dayScoped = True
 
 class DailyMedianFeeStatistic(SimpleStatistic):
     name = "median_fee"
     dataType = "BIGINT"
     proc = "getMedianFeeBetween"
+    rangeProc = "getDailyMedianFeeBetween"
+    dayScoped = True
 
 class DailyMedianTransactionValueStatistic(SimpleStatistic):
     name = "median_tx_value"
     dataType = "BIGINT"
     proc = "getMedianTransactionValueBetween"
+    rangeProc = "getDailyMedianTransactionValueBetween"
+    dayScoped = True
 
 class DailyPaymentCountStatistic(SimpleStatistic):
     name = "payment_count"
     dataType = "BIGINT"
     proc = "getPaymentCountBetween"
+    rangeProc = "getDailyPaymentCountBetween"
+    dayScoped = True
 
 class DailyBlockSizeStatistic(SimpleStatistic):
     name = "block_size"
     dataType = "BIGINT"
     proc = "getBlockSizeBetween"
+    rangeProc = "getDailyBlockSizeBetween"
+    blockStatsTotal = "size"
+    dayScoped = True
 
 class DailyHeuristicalTxVolumeStatistic(SimpleStatistic):
     name = "heuristical_volume"
     dataType = "DECIMAL(32)"
     proc = "getHeuristicalOutputVolumeBetween"
+    rangeProc = "getDailyHeuristicalOutputVolumeBetween"
+    dayScoped = True
 
 class DailyBlockCountStatistic(SimpleStatistic):
     name = "block_count"
     dataType = "BIGINT"
     proc = "getBlockCountBetween"
+    rangeProc = "getDailyBlockCountBetween"
+    dayScoped = True
 
 class Daily1YCirculatingSupplyStatistic(SimpleStatistic):
     name = "1y_circulating_supply"
     dataType = "DECIMAL(32)"
     proc = "get1YCirculatingSupplyBetween"
+    rangeProc = "getDaily1YCirculatingSupplyBetween"
+    sequential = True
 
 class Daily180DCirculatingSupplyStatistic(SimpleStatistic):
     name = "180d_circulating_supply"
     dataType = "DECIMAL(32)"
     proc = "get180DCirculatingSupplyBetween"
+    rangeProc = "getDaily180DCirculatingSupplyBetween"
+    sequential = True
 
 class Daily30DCirculatingSupplyStatistic(SimpleStatistic):
     name = "30d_circulating_supply"
     dataType = "DECIMAL(32)"
     proc = "get30DCirculatingSupplyBetween"
+    rangeProc = "getDaily30DCirculatingSupplyBetween"
+    sequential = True
 
 class DailyTotalSupplyStatistic(SimpleStatistic):
     name = "total_supply"
     dataType = "DECIMAL(32)"
     proc = "getTotalSupplyBetween"
+    rangeProc = "getDailyTotalSupplyBetween"
+    sequential = True
+    dayScoped = True
 
 class DailyNaive30DCirculatingSupplyStatistic(SimpleStatistic):
     name = "30d_naive_circulating_supply"
@@ -140,6 +218,92 @@ class DailyNaive30DCirculatingSupplyStatistic(SimpleStatistic):
     proc = "get30DNaiveCirculatingSupplyBetween"
 
 
+class DailyActiveAddressesSketchStatistic(SimpleStatistic):
+    # HyperLogLog registers of the day's active addresses; ordered together with the N-day counts merged from them
+    name = "active_addresses_sketch"
+    dataType = "SMALLINT[]"
+    proc = "getActiveAddressesSketchBetween"
+    dayScoped = True
+    sequential = True
+    # suffix of names of the N-day counts computed from this metric
+    windowSuffix = ""
+
+    def getMergedSketch(self, minDate, maxDate):
+        sketch = HyperLogLog()
+        for row in self.dbAccess.queryReturnAll("SELECT value FROM " + self.tableName + " WHERE date >= %s AND date < %s",
+                                                (minDate, maxDate)):
+            sketch.merge(row[0])
+        return sketch
+
+    def getCountBetween(self, minDate, maxDate):
+        return self.getMergedSketch(minDate, maxDate).getEstimate()
+
+
+class DailyActiveAddressIdsStatistic(SimpleStatistic):
+    # RoaringBitmap of ids of the day's active addresses, exact N-day counts are cardinalities of unions of them
+    name = "active_address_ids"
+    dataType = "BYTEA"
+    proc = "getActiveAddressIdsBetween"
+    dayScoped = True
+    sequential = True
+    windowSuffix = "_exact"
+
+    def getUnion(self, minDate, maxDate):
+        bitmap = RoaringBitmap()
+        for row in self.dbAccess.queryReturnAll("SELECT value FROM " + self.tableName + " WHERE date >= %s AND date < %s",
+                                                (minDate, maxDate)):
+            bitmap.union(RoaringBitmap.deserialize(row[0]))
+        return bitmap
+
+    def getCountBetween(self, minDate, maxDate):
+        return self.getUnion(minDate, maxDate).getCardinality()
+
+
+class NDayActiveAddressesStatistic(DailyStatistic):
+    # count of addresses active during the days up to and including the date, from the saved daily values of a sketch
+    # (estimate) or bitmap (exact) metric
+    sequential = True
+
+    def __init__(self, days, sourceStatistic, dbAccess, query):
+        self.days = days
+        self.sourceStatistic = sourceStatistic
+        super(NDayActiveAddressesStatistic, self).__init__("%dd_active_addresses%s" % (days, sourceStatistic.windowSuffix),
+                                                           "INTEGER", dbAccess, query)
+
+    def calculateForDate(self, date):
+        return self.sourceStatistic.getCountBetween(date - timedelta(days=self.days - 1), date + timedelta(days=1))
+
+
+class DailySketch(object):
+    # quantile sketch of a day, computed once per date for all quantile metrics that read it
+
+    def __init__(self, query, proc):
+        self.query = query
+        self.proc = proc
+        self.date = None
+        self.sketch = None
+
+    def getForDate(self, date):
+        if date != self.date:
+            self.sketch = getattr(self.query, self.proc)(date, date + timedelta(days=1))
+            self.date = date
+        return self.sketch
+
+
+class DailyQuantileStatistic(DailyStatistic):
+    # within SKETCH_RELATIVE_ACCURACY of the exact value of the quantile's rank, see QuantileSketch.getQuantile
+    dayScoped = True
+
+    def __init__(self, namePrefix, quantile, dailySketch, dbAccess, query):
+        self.quantile = quantile
+        self.dailySketch = dailySketch
+        super(DailyQuantileStatistic, self).__init__("%s_p%d" % (namePrefix, round(quantile * 100)), "BIGINT", dbAccess, query)
+
+    def calculateForDate(self, date):
+        value = self.dailySketch.getForDate(date).getQuantile(self.quantile)
+        return int(round(value)) if value is not None else None
+
+
 class DailyAggregator(object):
 
     def __init__(self, dbAccess, query, log, minDate=None):
@@ -148,6 +312,7 @@ class DailyAggregator(object):
         self.log = log
         self.minDate = minDate
         self.metrics = []
+        self.fused = False
 
         self.createDailyMetrics()
 
@@ -158,8 +323,11 @@ class DailyAggregator(object):
         self.addMetric(DailyHeuristicalTxVolumeStatistic(self.dbAccess, self.query))
         self.addMetric(DailyMedianTransactionValueStatistic(self.dbAccess, self.query))
         self.addMetric(DailyActiveAddressesStatistic(self.dbAccess, self.query))
+        self.addActiveAddressesSketchMetrics()
+        self.addActiveAddressIdsMetrics()
         self.addMetric(DailyFeesStatistic(self.dbAccess, self.query))
         self.addMetric(DailyMedianFeeStatistic(self.dbAccess, self.query))
+        self.addQuantileMetrics()
         self.addMetric(DailyPaymentCountStatistic(self.dbAccess, self.query))
         self.addMetric(DailyRewardStatistic(self.dbAccess, self.query))
         self.addMetric(DailyBlockSizeStatistic(self.dbAccess, self.query))
@@ -171,13 +339,47 @@ class DailyAggregator(object):
         # can be useful for diagnosis
         # self.addMetric(DailyNaive30DCirculatingSupplyStatistic(self.dbAccess, self.query))
 
+    def addQuantileMetrics(self):
+        feeSketch = DailySketch(self.query, "getFeeSketchBetween")
+        txValueSketch = DailySketch(self.query, "getTxValueSketchBetween")
+        for quantile in SKETCH_QUANTILES:
+            self.addMetric(DailyQuantileStatistic("fee", quantile, feeSketch, self.dbAccess, self.query))
+        for quantile in SKETCH_QUANTILES:
+            self.addMetric(DailyQuantileStatistic("tx_value", quantile, txValueSketch, self.dbAccess, self.query))
+
+    def addActiveAddressesSketchMetrics(self):
+        self.activeAddressesSketch = DailyActiveAddressesSketchStatistic(self.dbAccess, self.query)
+        self.addMetric(self.activeAddressesSketch)
+        self.addMetric(NDayActiveAddressesStatistic(7, self.activeAddressesSketch, self.dbAccess, self.query))
+        self.addMetric(NDayActiveAddressesStatistic(30, self.activeAddressesSketch, self.dbAccess, self.query))
+
+    def addActiveAddressIdsMetrics(self):
+        # exact N-day counts need integer address ids
+        if not self.query.getSchema().usesAddressIds():
+            return
+        activeAddressIds = DailyActiveAddressIdsStatistic(self.dbAccess, self.query)
+        self.addMetric(activeAddressIds)
+        self.addMetric(NDayActiveAddressesStatistic(7, activeAddressIds, self.dbAccess, self.query))
+        self.addMetric(NDayActiveAddressesStatistic(30, activeAddressIds, self.dbAccess, self.query))
+
+    def estimateActiveAddresses(self, minDate, maxDate):
+        # addresses active in [minDate, maxDate) estimated from stored daily sketches, for spans like calendar months
+        return self.activeAddressesSketch.getMergedSketch(minDate, maxDate).getEstimate()
+
+    def setFused(self, fused):
+        # day-scoped metrics of a date are computed from one copy of the day's transactions and outputs
+        self.fused = fused
+
     def getMetricNames(self):
         return [metric.getName() for metric in self.metrics]
 
     def addMetric(self, metric):
         self.metrics.append(metric)
 
-    def run(self, metricNames, startDate, endDate, shouldSave, forceRecomputation):
+    def getMetrics(self, metricNames):
+        return [metric for metric in self.metrics if metric.getName() in metricNames]
+
+    def getDatesAndStats(self, metricNames, startDate, endDate, forceRecomputation):
         minBlockTime, maxBlockTime = self._getBlockchainTimeBounds()
         minComputeTime = max(minBlockTime, alignDateToInterval(startDate, timedelta(days=1)))
         maxComputeTime = min(maxBlockTime, alignDateToInterval(endDate, timedelta(days=1)))
@@ -194,21 +396,143 @@ class DailyAggregator(object):
                     datesToStatMap[missingDate].append(metric)
 
         datesAndStats = [(missingDate, statList) for missingDate, statList in datesToStatMap.items()]
-        datesAndStats = sorted(datesAndStats, key=lambda pair: pair[0])
+        return sorted(datesAndStats, key=lambda pair: pair[0])
+
+    def runRanges(self, datesAndStats, shouldSave):
+        # computes metrics missing on many dates with range queries, returns dates and metrics still to compute
+        # (those of dates without any data, which range queries don't return)
+        statDates = {}
+        for date, statList in datesAndStats:
+            for stat in statList:
+                if stat.supportsRanges():
+                    statDates.setdefault(stat, []).append(date)
+
+        doneDates = {}
+        for stat, dates in statDates.items():
+            if len(dates) < RANGE_QUERY_MIN_DATES:
+                continue
+            doneDates[stat] = set()
+            for minDate, maxDate in self.getDateRanges(dates):
+                t = datetime.now()
+                values = stat.runOnRange(minDate, maxDate, shouldSave)
+                doneDates[stat].update(values.keys())
+                self.log.info("aggregation result for %s on %s - %s: %d dates (time spent: %s)" % (stat.getName(), minDate,
+                              maxDate - timedelta(days=1), len(values), datetime.now() - t))
+
+        datesAndStats = [(date, [stat for stat in statList if date not in doneDates.get(stat, ())])
+                         for date, statList in datesAndStats]
+        return [(date, statList) for date, statList in datesAndStats if len(statList) > 0]
+
+    def getDateRanges(self, dates):
+        # [minDate, maxDate) ranges of consecutive dates
+        ranges = []
+        for date in sorted(dates):
+            if len(ranges) > 0 and ranges[-1][1] == date and (date - ranges[-1][0]).days < RANGE_QUERY_MAX_DAYS:
+                ranges[-1] = (ranges[-1][0], date + timedelta(days=1))
+            else:
+                ranges.append((date, date + timedelta(days=1)))
+        return ranges
+
+    def run(self, metricNames, startDate, endDate, shouldSave, forceRecomputation):
+        datesAndStats = self.getDatesAndStats(metricNames, startDate, endDate, forceRecomputation)
         if len(datesAndStats) == 0:
             self.log.info("no metrics to calculate")
             return
+        datesAndStats = self.runRanges(datesAndStats, shouldSave)
+        if len(datesAndStats) == 0:
+            return
 
         eta = ETA(self.log, len(datesAndStats), 60, 10)
         for missingDate, statList in datesAndStats:
             eta.workStarted()
-            self.log.info("date: %s" % missingDate)
-            for stat in statList:
-                t = datetime.now()
-                value = stat.runOn(missingDate, shouldSave)
-                self.log.info("aggregation result for %s on %s: %s (time spent: %s)" % (stat.getName(), missingDate, str(value), datetime.now() - t))
+            self.runDate(missingDate, statList, shouldSave)
             eta.workFinished(1)
 
+    def runParallel(self, metricNames, startDate, endDate, shouldSave, forceRecomputation, aggregatorFactory, workers):
+        # dates are spread over worker threads, each with its own aggregator and connection made by aggregatorFactory;
+        # sequential metrics form a single task that goes through their dates in order
+        datesAndStats = self.getDatesAndStats(metricNames, startDate, endDate, forceRecomputation)
+        if len(datesAndStats) == 0:
+            self.log.info("no metrics to calculate")
+            return
+        datesAndStats = self.runRanges(datesAndStats, shouldSave)
+        if len(datesAndStats) == 0:
+            return
+
+        workerState = threading.local()
+
+        def runDates(datesAndStatNames):
+            if not hasattr(workerState, "aggregator"):
+                workerState.aggregator = aggregatorFactory()
+            for date, statNames in datesAndStatNames:
+                workerState.aggregator.runDate(date, workerState.aggregator.getMetrics(statNames), shouldSave)
+
+        tasks = []
+        sequentialTask = []
+        for date, statList in datesAndStats:
+            statNames = [stat.getName() for stat in statList if not stat.sequential]
+            if len(statNames) > 0:
+                tasks.append([(date, statNames)])
+            statNames = [stat.getName() for stat in statList if stat.sequential]
+            if len(statNames) > 0:
+                sequentialTask.append((date, statNames))
+        if len(sequentialTask) > 0:
+            tasks.insert(0, sequentialTask)
+
+        eta = ETA(self.log, len(tasks), 60, 10)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(runDates, task) for task in tasks]
+            eta.workStarted()
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+                eta.workFinished(1)
+                eta.workStarted()
+
+    def runDate(self, date, statList, shouldSave):
+        self.log.info("date: %s" % date)
+        fusedStats = [stat for stat in statList if stat.dayScoped] if self.fused and hasattr(self.query, "materializeDay") else []
+        if len(fusedStats) > 1:
+            t = datetime.now()
+            self.query.materializeDay(date, date + timedelta(days=1))
+            self.log.info("day data of %s copied (time spent: %s)" % (date, datetime.now() - t))
+            try:
+                self.runStats(fusedStats, date, shouldSave)
+            finally:
+                self.query.releaseDay()
+            statList = [stat for stat in statList if stat not in fusedStats]
+        self.runStats(statList, date, shouldSave)
+
+    def runStats(self, statList, date, shouldSave):
+        for stat in statList:
+            t = datetime.now()
+            value = stat.runOn(date, shouldSave)
+            self.log.info("aggregation result for %s on %s: %s (time spent: %s)" % (stat.getName(), date, str(value), datetime.now() - t))
+
+    def explain(self, metricNames, date):
+        # scans chosen by the planner for the daily queries of each metric, to check whether an index profile lets
+        # them use index-only scans
+        explainAccess = ExplainQueryAccess(self.dbAccess)
+        explainQuery = type(self.query)(explainAccess, self.query.getSchema())
+        result = []
+        for metric in self.metrics:
+            if metric.getName() in metricNames and hasattr(metric, "proc"):
+                getattr(explainQuery, metric.proc)(date, date + timedelta(days=1))
+                result.append((metric.getName(), explainAccess.takeScans()))
+        return result
+
+    def timeQueries(self, metricNames, minDate, maxDate):
+        # seconds spent in the daily queries of each metric over the dates, nothing is saved
+        result = []
+        for metric in self.metrics:
+            if metric.getName() in metricNames and hasattr(metric, "proc"):
+                t = datetime.now()
+                date = minDate
+                while date <= maxDate:
+                    getattr(self.query, metric.proc)(date, date + timedelta(days=1))
+                    date += timedelta(days=1)
+                result.append((metric.getName(), (datetime.now() - t).total_seconds()))
+        return result
+
     def drop(self, metricNames):
         for metric in self.metrics:
             if metric.getName() in metricNames:
@@ -1,7 +1,10 @@
 import argparse
 import logging
+from datetime import datetime, timedelta
+import dateutil.parser
 from coinmetrics.bitsql import runExport, dbObjectsFactory, postgresFactory
 from coinmetrics.bitsql.constants import SUPPORTED_ASSETS
+from coinmetrics.bitsql.schema import BitcoinSchema
 from coinmetrics.utils.arguments import postgres_connection_argument
 
 
@@ -12,7 +15,33 @@ argParser.add_argument("--drop-db", dest="dropDb", action="store_true",
                        help="drop tables that contain data of the given asset")
 argParser.add_argument("--add-index", dest="addIndex", action="store_true", help="add indexes to tables")
 argParser.add_argument("--drop-index", dest="dropIndex", action="store_true", help="remove table indexes")
+argParser.add_argument("--index-profile", dest="indexProfile", type=str, choices=["btree", "brin"], default="btree",
+                       help="indexes built by --add-index: plain B-tree time indexes, or BRIN indexes on append-ordered "
+                            "time columns with covering B-trees for metric queries (needs PostgreSQL 11); outputs only get "
+                            "a BRIN index with --inputs-table, as spend updates scatter output rows otherwise")
+argParser.add_argument("--explain-report", dest="explainReport", action="store_true",
+                       help="print scans the planner chooses for metric queries of one day")
+argParser.add_argument("--explain-date", dest="explainDate", type=dateutil.parser.parse,
+                       help="day used by --explain-report, last full day of blocks by default")
 argParser.add_argument("--vacuum", action="store_true", help="vacuum outputs table")
+argParser.add_argument("--reindex", action="store_true", help="rebuild indexes of outputs table")
+argParser.add_argument("--partition", type=lambda value: datetime.strptime(value, "%Y-%m"),
+                       help="YYYY-MM: with --vacuum or --reindex, process only partitions of this month")
+argParser.add_argument("--inputs-table", dest="inputsTable", action="store_true",
+                       help="store spends in a separate append-only inputs table instead of updating outputs (empty database only)")
+argParser.add_argument("--compact-schema", dest="compactSchema", action="store_true",
+                       help="store hashes as BYTEA and values as BIGINT (empty database only)")
+argParser.add_argument("--tx-ids", dest="txIds", action="store_true",
+                       help="add integer transaction ids that queries join on instead of hashes, --add-index indexes them; "
+                            "primary keys stay on hashes, which spends are looked up by (empty database only)")
+argParser.add_argument("--address-ids", dest="addressIds", action="store_true",
+                       help="store output addresses as ids from an address dictionary table (empty database only)")
+argParser.add_argument("--partitioned", action="store_true",
+                       help="partition transactions and outputs by month, PostgreSQL 11+ (empty database only)")
+argParser.add_argument("--block-stats", dest="blockStats", action="store_true",
+                       help="write per-block statistics during export, daily metrics are rolled up from them")
+argParser.add_argument("--table-stats", dest="tableStats", action="store_true",
+                       help="print size on disk, live and dead row counts of asset tables")
 args = argParser.parse_args()
 
 
@@ -26,12 +55,62 @@ if args.dropDb:
     schema.drop()
 elif args.addIndex:
     schema, _, _, _ = dbObjectsFactory(args.asset, postgresFactory(*args.database), appLog)
+    schema.setIndexProfile(args.indexProfile)
     schema.addIndexes()
 elif args.dropIndex:
     schema, _, _, _ = dbObjectsFactory(args.asset, postgresFactory(*args.database), appLog)
     schema.dropIndexes()
 elif args.vacuum:
     schema, _, _, _ = dbObjectsFactory(args.asset, postgresFactory(*args.database), appLog)
-    schema.vacuum()
+    if args.partition is not None:
+        schema.vacuumTables(schema.getMonthPartitions(args.partition))
+    else:
+        schema.vacuum()
+elif args.reindex:
+    schema, _, _, _ = dbObjectsFactory(args.asset, postgresFactory(*args.database), appLog)
+    if args.partition is not None:
+        schema.reindexTables(schema.getMonthPartitions(args.partition))
+    else:
+        schema.reindexTables([schema.getOutputsTableName()])
+elif args.inputsTable:
+    schema, _, _, _ = dbObjectsFactory(args.asset, postgresFactory(*args.database), appLog)
+    schema.useInputsTable()
+elif args.compactSchema:
+    schema, _, _, _ = dbObjectsFactory(args.asset, postgresFactory(*args.database), appLog)
+    schema.useCompactLayout()
+elif args.txIds:
+    schema, _, _, _ = dbObjectsFactory(args.asset, postgresFactory(*args.database), appLog)
+    schema.useTxIds()
+elif args.addressIds:
+    schema, _, _, _ = dbObjectsFactory(args.asset, postgresFactory(*args.database), appLog)
+    schema.useAddressIds()
+elif args.partitioned:
+    schema, _, _, _ = dbObjectsFactory(args.asset, postgresFactory(*args.database), appLog)
+    schema.usePartitions()
+elif args.blockStats:
+    schema, _, _, _ = dbObjectsFactory(args.asset, postgresFactory(*args.database), appLog)
+    schema.useBlockStats()
+elif args.explainReport:
+    schema, query, _, aggregator = dbObjectsFactory(args.asset, postgresFactory(*args.database), appLog)
+    if not isinstance(schema, BitcoinSchema):
+        raise Exception("explain report is not supported for asset %s" % args.asset)
+    date = args.explainDate
+    if date is None:
+        date = query.getMaxBlockTime().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    indexOnlyCount = 0
+    metricScans = aggregator.explain(aggregator.getMetricNames(), date)
+    for metricName, scans in metricScans:
+        indexOnly = any(nodeType == "Index Only Scan" for nodeType, _, _ in scans)
+        indexOnlyCount += 1 if indexOnly else 0
+        print("%s%s:" % (metricName, " (index-only)" if indexOnly else ""))
+        for nodeType, relationName, indexName in sorted(set(scans), key=lambda scan: tuple(str(value) for value in scan)):
+            # bitmap index scans name only the index
+            target = [name for name in (relationName, indexName) if name is not None]
+            print("    %s: %s" % (nodeType, " using ".join(target)))
+    print("%d of %d metrics use index-only scans on %s" % (indexOnlyCount, len(metricScans), date.date()))
+elif args.tableStats:
+    schema, _, _, _ = dbObjectsFactory(args.asset, postgresFactory(*args.database), appLog)
+    for tableName, size, liveRows, deadRows in schema.getTableStats():
+        print("%s: %.1f MiB, %d live rows, %d dead rows" % (tableName, size / 1048576.0, liveRows, deadRows))
 else:
     print("no action chosen, exiting")
\ No newline at end of file
@@ -12,6 +12,35 @@ argParser.add_argument("nodes", type=bitcoin_node_connection_argument, nargs="+"
                        help="Node parameters host:port:rpcUser:rpcPassword")
 argParser.add_argument("--rpcthreads", type=int, default=8, help="Maximum amount of simultaneous RPC requests")
 argParser.add_argument("--loop", action="store_true", help="run export continously, in a loop")
+argParser.add_argument("--batchfetch", action="store_true",
+                       help="fetch several blocks per RPC batch, batch size adapts to block size; speeds up early history")
+argParser.add_argument("--async", dest="asyncMode", action="store_true",
+                       help="fetch blocks with asyncio instead of a thread pool, --rpcthreads then limits connections per node")
+argParser.add_argument("--maxblocksinflight", type=int, default=256,
+                       help="Maximum amount of blocks being fetched simultaneously in async mode")
+argParser.add_argument("--rawblocks", action="store_true",
+                       help="request serialized blocks and decode them locally (bsv, doge, dash, pivx, xvg)")
+argParser.add_argument("--blocksdir", type=str, default=None,
+                       help="read blocks from node's blk*.dat files in this directory instead of RPC (btc, bsv, doge); "
+                            "first node parameters are still used to pick node type")
+argParser.add_argument("--blockindex", type=str, default="blockindex.dat",
+                       help="file where locations of blocks in --blocksdir are persisted between runs")
+argParser.add_argument("--parseprocesses", type=int, default=0,
+                       help="decode blocks in this many worker processes instead of RPC threads, 0 to disable")
+argParser.add_argument("--copy", action="store_true",
+                       help="load rows with COPY instead of INSERT, falls back to INSERT if COPY fails")
+argParser.add_argument("--writebatch", type=int, default=0,
+                       help="commit consecutive blocks together, up to this many rows per transaction; 0 commits every block")
+argParser.add_argument("--utxocache", type=int, default=0,
+                       help="keep up to this many fresh outputs in memory so that outputs spent before commit are written "
+                            "once; most effective with --writebatch")
+argParser.add_argument("--initial-sync", dest="initialSync", action="store_true",
+                       help="bulk export of a fresh asset into unlogged tables without keys, followed by building keys and "
+                            "indexes and vacuum; rerun to resume if interrupted")
+argParser.add_argument("--initial-sync-workers", dest="initialSyncWorkers", type=int, default=4,
+                       help="Amount of simultaneous key/index builds at the end of initial sync")
+argParser.add_argument("--initial-sync-shards", dest="initialSyncShards", type=int, default=1,
+                       help="Amount of processes exporting separate height ranges in parallel during initial sync")
 args = argParser.parse_args()
 
 
@@ -19,4 +48,23 @@ logging.basicConfig(format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s'
 appLog = logging.getLogger("bitsql:{0}".format(args.asset))
 appLog.setLevel(logging.DEBUG)
 
-runExport(args.asset, args.nodes, args.database, appLog, loop=args.loop, rpcThreads=args.rpcthreads)
+if args.initialSync:
+    from coinmetrics.bitsql.initialsync import runInitialSync
+    runInitialSync(args.asset, args.nodes, args.database, appLog, workers=args.initialSyncWorkers,
+                   shards=args.initialSyncShards, rpcThreads=args.rpcthreads, batchFetch=args.batchfetch,
+                   rawBlocks=args.rawblocks, blocksDir=args.blocksdir, blockIndexPath=args.blockindex,
+                   parseProcesses=args.parseprocesses, copyLoader=args.copy, writeBatchRows=args.writebatch,
+                   utxoCacheSize=args.utxocache)
+elif args.asyncMode:
+    # imported here, so that aiohttp is only required for async export
+    from coinmetrics.bitsql.asyncexport import runAsyncExport
+    runAsyncExport(args.asset, args.nodes, args.database, appLog, loop=args.loop, rpcThreads=args.rpcthreads,
+                   maxBlocksInFlight=args.maxblocksinflight, rawBlocks=args.rawblocks,
+                   copyLoader=args.copy, writeBatchRows=args.writebatch,
+                   utxoCacheSize=args.utxocache, batchFetch=args.batchfetch, blocksDir=args.blocksdir,
+                   parseProcesses=args.parseprocesses)
+else:
+    runExport(args.asset, args.nodes, args.database, appLog, loop=args.loop, rpcThreads=args.rpcthreads,
+              batchFetch=args.batchfetch, rawBlocks=args.rawblocks, blocksDir=args.blocksdir, blockIndexPath=args.blockindex,
+              parseProcesses=args.parseprocesses, copyLoader=args.copy, writeBatchRows=args.writebatch,
+              utxoCacheSize=args.utxocache)
@@ -0,0 +1,75 @@
+import argparse
+import logging
+from datetime import datetime, timedelta
+from coinmetrics.bitsql import runExport, dbObjectsFactory, postgresFactory
+from coinmetrics.bitsql.constants import SUPPORTED_ASSETS
+from coinmetrics.utils.arguments import postgres_connection_argument, bitcoin_node_connection_argument
+
+
+argParser = argparse.ArgumentParser(
+    description="Exports the same block range with the default (UPDATE) layout and with --inputs-table, and compares "
+                "export throughput, table bloat (as reported by dbcontrol --table-stats) and metric query times. "
+                "Tables of the asset are dropped before every run.")
+argParser.add_argument("asset", type=str, choices=SUPPORTED_ASSETS)
+argParser.add_argument("database", type=postgres_connection_argument, help="Database parameters dbHost:dbPort:dbName:dbUser:dbPassword")
+argParser.add_argument("nodes", type=bitcoin_node_connection_argument, nargs="+",
+                       help="Node parameters in form host:port:user:password")
+argParser.add_argument("--blocks", type=int, default=100000, help="export blocks from genesis up to this height")
+argParser.add_argument("--query-days", dest="queryDays", type=int, default=7,
+                       help="time metric queries of this many last full days of exported blocks")
+argParser.add_argument("--layouts", type=str, nargs="+", choices=["update", "inputs"], default=["update", "inputs"])
+argParser.add_argument("--drop-db", dest="dropDb", action="store_true",
+                       help="confirm that existing tables of the asset may be dropped")
+argParser.add_argument("--copy", action="store_true", help="export with COPY, as export --copy")
+argParser.add_argument("--writebatch", type=int, default=0, help="export with write batches, as export --writebatch")
+argParser.add_argument("--utxocache", type=int, default=0, help="export with utxo cache, as export --utxocache")
+args = argParser.parse_args()
+
+
+logging.basicConfig(format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s')
+appLog = logging.getLogger("bitsql-bench:{0}".format(args.asset))
+appLog.setLevel(logging.INFO)
+
+
+def runLayout(layout):
+    schema, _, _, _ = dbObjectsFactory(args.asset, postgresFactory(*args.database), appLog)
+    schema.drop()
+    schema, _, _, _ = dbObjectsFactory(args.asset, postgresFactory(*args.database), appLog)
+    if layout == "inputs":
+        schema.useInputsTable()
+
+    t = datetime.now()
+    runExport(args.asset, args.nodes, args.database, appLog, heightRange=(0, args.blocks), copyLoader=args.copy,
+              writeBatchRows=args.writebatch, utxoCacheSize=args.utxocache)
+    exportTime = (datetime.now() - t).total_seconds()
+
+    db = postgresFactory(*args.database)
+    schema, query, _, aggregator = dbObjectsFactory(args.asset, db, appLog)
+    # bloat left by export is measured before vacuum, sizes once more after it
+    statsAfterExport = schema.getTableStats()
+    schema.addIndexes()
+    schema.vacuum()
+    vacuumedSizes = {tableName: size for tableName, size, _, _ in schema.getTableStats()}
+
+    maxDate = query.getMaxBlockTime().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    minDate = maxDate - timedelta(days=args.queryDays - 1)
+    queryTimes = aggregator.timeQueries(aggregator.getMetricNames(), minDate, maxDate)
+    blockCount = query.getBlockCountBetweenHeights(0, args.blocks)
+    return exportTime, blockCount, statsAfterExport, vacuumedSizes, queryTimes, (minDate, maxDate)
+
+
+schema, query, _, _ = dbObjectsFactory(args.asset, postgresFactory(*args.database), appLog)
+if query.getBlockHeight() is not None and not args.dropDb:
+    raise Exception("%s tables are not empty, pass --drop-db to let the benchmark drop them" % args.asset)
+
+results = [(layout, runLayout(layout)) for layout in args.layouts]
+
+for layout, (exportTime, blockCount, statsAfterExport, vacuumedSizes, queryTimes, (minDate, maxDate)) in results:
+    print("%s layout:" % layout)
+    print("    export: %d blocks in %.1f s, %.1f blocks/s" % (blockCount, exportTime, blockCount / exportTime))
+    for tableName, size, liveRows, deadRows in statsAfterExport:
+        print("    %s: %.1f MiB (%.1f MiB vacuumed), %d live rows, %d dead rows" % (tableName, size / 1048576.0,
+            vacuumedSizes.get(tableName, 0) / 1048576.0, liveRows, deadRows))
+    print("    metric queries of %s - %s: %.1f s" % (minDate.date(), maxDate.date(), sum(seconds for _, seconds in queryTimes)))
+    for metricName, seconds in queryTimes:
+        print("        %s: %.2f s" % (metricName, seconds))
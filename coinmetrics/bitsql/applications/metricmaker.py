@@ -2,7 +2,7 @@ import argparse
 import logging
 import dateutil.parser
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 from coinmetrics.bitsql import dbObjectsFactory, postgresFactory
 from coinmetrics.bitsql.constants import SUPPORTED_ASSETS
 from coinmetrics.utils.arguments import postgres_connection_argument
@@ -19,6 +19,12 @@ argParser.add_argument("--drop", action="store_true", help="Drop calculated metr
 argParser.add_argument("--metrics", type=str, default=[], nargs="+", help="Metrics on which operation will act, all by default")
 argParser.add_argument("--excludemetrics", type=str, default=[], nargs="+", help="Metrics on which operation will not act, none by default")
 argParser.add_argument("--list", action="store_true", default=False, help="Will list metrics' names")
+argParser.add_argument("--fused", action="store_true", default=False,
+                       help="Compute metrics of a day from one temporary copy of its transactions and outputs")
+argParser.add_argument("--workers", type=int, default=1,
+                       help="Compute metrics of different dates in parallel on this many database connections")
+argParser.add_argument("--active-addresses-estimate", dest="activeAddressesEstimate", action="store_true", default=False,
+                       help="Print monthly active address counts estimated from saved active_addresses_sketch values")
 argParser.add_argument("--loop", action="store_true", default=False, help="Continously calculate metrics")
 args = argParser.parse_args()
 
@@ -32,6 +38,7 @@ def proc(startDate, endDate, save, force):
     for asset in args.assets:
         db = postgresFactory(*args.database)
         _, _, _, aggregator = dbObjectsFactory(asset, db, appLog)
+        aggregator.setFused(args.fused)
 
         metrics = aggregator.getMetricNames() if len(args.metrics) == 0 else args.metrics
         metrics = [metric for metric in metrics if len(args.excludemetrics) == 0 or metric not in args.excludemetrics]
@@ -40,6 +47,18 @@ def proc(startDate, endDate, save, force):
             aggregator.drop(metrics)
         elif args.list:
             print(aggregator.getMetricNames())
+        elif args.activeAddressesEstimate:
+            month = startDate.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            while month < endDate:
+                nextMonth = (month + timedelta(days=32)).replace(day=1)
+                print("%s %s: %d" % (asset, month.strftime("%Y-%m"), aggregator.estimateActiveAddresses(month, nextMonth)))
+                month = nextMonth
+        elif args.workers > 1:
+            def aggregatorFactory(asset=asset):
+                _, _, _, workerAggregator = dbObjectsFactory(asset, postgresFactory(*args.database), appLog)
+                workerAggregator.setFused(args.fused)
+                return workerAggregator
+            aggregator.runParallel(metrics, startDate, endDate, save, force, aggregatorFactory, args.workers)
         else:
             aggregator.run(metrics, startDate, endDate, save, force)
 
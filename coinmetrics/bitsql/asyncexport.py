@@ -0,0 +1,97 @@
+import asyncio
+import concurrent.futures
+from collections import deque
+from coinmetrics.bitsql import dbObjectsFactory, getNodesByHeight, getHeightsToSync, runExportProc, setupExporter
+from coinmetrics.bitsql.constants import BLOCK_TIMES
+from coinmetrics.bitsql.node import BitcoinNodeBase
+from coinmetrics.utils.asyncjsonrpc import AsyncJsonRpcCaller
+from coinmetrics.utils.eta import ETA
+
+
+async def exportBlocksAsync(sources, heights, exporter, log, eta, maxBlocksInFlight):
+    # blocks are fetched concurrently, but stored strictly in order of heights by a single writer thread,
+    # same as OrderingConnector does for the multithreaded pipeline
+    loop = asyncio.get_event_loop()
+    writer = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def store(blockData, moreBlocksReady):
+        exporter.pushBlock(blockData)
+        log.info("saved block at height: %d (%s)" % (blockData.blockHeight, blockData.blockTime))
+        exporter.flushIfNeeded(moreBlocksReady)
+
+    def moreBlocksReady():
+        return len(pending) > 0 and pending[0].done()
+
+    async def load(index, height):
+        node, rpc = sources[index % len(sources)]
+        return await node.getBlockAsync(rpc, height)
+
+    pending = deque()
+    try:
+        eta.workStarted()
+        for index, height in enumerate(heights):
+            pending.append(asyncio.ensure_future(load(index, height)))
+            if len(pending) >= maxBlocksInFlight:
+                blockData = await pending.popleft()
+                await loop.run_in_executor(writer, store, blockData, moreBlocksReady())
+                eta.workFinished(1)
+                eta.workStarted()
+
+        while len(pending) > 0:
+            blockData = await pending.popleft()
+            await loop.run_in_executor(writer, store, blockData, moreBlocksReady())
+            eta.workFinished(1)
+            eta.workStarted()
+        await loop.run_in_executor(writer, exporter.flush)
+    finally:
+        for task in pending:
+            task.cancel()
+        if len(pending) > 0:
+            await asyncio.wait(pending)
+        writer.shutdown()
+
+
+def runAsyncExport(asset, nodeList, dbParams, log, loop=False, lag=60 * 60 * 2, rpcThreads=8, maxBlocksInFlight=256,
+                   rawBlocks=False, copyLoader=False, writeBatchRows=0,
+                   utxoCacheSize=0, batchFetch=False, blocksDir=None, parseProcesses=0):
+    # blocks are fetched one per request on the event loop, options of the other fetch paths don't apply
+    if batchFetch or blocksDir is not None or parseProcesses > 0:
+        raise Exception("async export can't be combined with batch fetch, block files export or parse processes")
+    async def closeSources(sources):
+        for _, rpc in sources:
+            await rpc.close()
+
+    def proc(db):
+        nodes = getNodesByHeight(asset, nodeList, log, **({"rawBlocks": True} if rawBlocks else {}))
+        for node, _ in nodes:
+            if not isinstance(node, BitcoinNodeBase):
+                raise Exception("asynchronous export is not supported for asset %s" % asset)
+
+        _, query, exporter, _ = dbObjectsFactory(asset, db, log)
+        setupExporter(exporter, copyLoader, writeBatchRows, utxoCacheSize, log)
+        nodeHeight = nodes[0][1]
+        heights = getHeightsToSync(asset, query, nodeHeight, lag, log)
+        if len(heights) == 0:
+            return True, False
+
+        # only nodes that have all the blocks we're going to request take part in the export
+        sources = []
+        for node, blockCount in nodes:
+            if blockCount >= heights[-1]:
+                log.info("using node: {0}".format(node))
+                sources.append((node, AsyncJsonRpcCaller.fromJsonRpcCaller(node.bitcoinAccess, rpcThreads)))
+
+        blocksPerWeek = 7 * 24 * 3600 // BLOCK_TIMES[asset]
+        eta = ETA(log, len(heights), blocksPerWeek, 10)
+        eventLoop = asyncio.new_event_loop()
+        asyncio.set_event_loop(eventLoop)
+        try:
+            eventLoop.run_until_complete(exportBlocksAsync(sources, heights, exporter, log, eta, maxBlocksInFlight))
+            return True, False
+        except KeyboardInterrupt:
+            return False, True
+        finally:
+            eventLoop.run_until_complete(closeSources(sources))
+            eventLoop.close()
+
+    return runExportProc(proc, dbParams, log, loop)
@@ -0,0 +1,82 @@
+import struct
+
+# containers with more values than this are stored as bitmaps of all 65536 positions, smaller ones as sorted arrays
+ARRAY_CONTAINER_MAX_SIZE = 4096
+BITMAP_CONTAINER_BYTES = 65536 // 8
+
+
+class RoaringBitmap(object):
+    # compressed set of integer ids in the layout of roaring bitmaps: ids are grouped by their high bits into containers
+    # of 65536 ids, a container keeps its low 16 bits either as a sorted array (sparse) or as a bitmap (dense, held
+    # as a python int so that unions are single big-integer ORs)
+
+    def __init__(self):
+        self.containers = {}
+
+    @staticmethod
+    def fromContainers(containers):
+        # containers: high bits of ids -> distinct low 16 bits of ids in ascending order
+        bitmap = RoaringBitmap()
+        for key, values in containers.items():
+            bitmap.containers[key] = values if len(values) <= ARRAY_CONTAINER_MAX_SIZE else RoaringBitmap.toBits(values)
+        return bitmap
+
+    @staticmethod
+    def toBits(container):
+        if not isinstance(container, list):
+            return container
+        bits = bytearray(BITMAP_CONTAINER_BYTES)
+        for value in container:
+            bits[value >> 3] |= 1 << (value & 7)
+        return int.from_bytes(bytes(bits), "little")
+
+    @staticmethod
+    def getContainerSize(container):
+        return len(container) if isinstance(container, list) else bin(container).count("1")
+
+    def union(self, other):
+        for key, container in other.containers.items():
+            current = self.containers.get(key)
+            if current is None:
+                self.containers[key] = container
+            elif isinstance(current, list) and isinstance(container, list):
+                values = sorted(set(current).union(container))
+                self.containers[key] = values if len(values) <= ARRAY_CONTAINER_MAX_SIZE else RoaringBitmap.toBits(values)
+            else:
+                self.containers[key] = RoaringBitmap.toBits(current) | RoaringBitmap.toBits(container)
+
+    def getCardinality(self):
+        return sum(RoaringBitmap.getContainerSize(container) for container in self.containers.values())
+
+    def serialize(self):
+        # container count, then every container as key, cardinality - 1 and its values (array) or bits (bitmap)
+        parts = [struct.pack("<I", len(self.containers))]
+        for key in sorted(self.containers.keys()):
+            container = self.containers[key]
+            size = RoaringBitmap.getContainerSize(container)
+            parts.append(struct.pack("<IH", key, size - 1))
+            if size <= ARRAY_CONTAINER_MAX_SIZE:
+                values = container if isinstance(container, list) else \
+                    [value for value in range(65536) if (container >> value) & 1]
+                parts.append(struct.pack("<%dH" % size, *values))
+            else:
+                parts.append(RoaringBitmap.toBits(container).to_bytes(BITMAP_CONTAINER_BYTES, "little"))
+        return b"".join(parts)
+
+    @staticmethod
+    def deserialize(data):
+        data = bytes(data)
+        bitmap = RoaringBitmap()
+        count, = struct.unpack_from("<I", data, 0)
+        offset = 4
+        for _ in range(count):
+            key, size = struct.unpack_from("<IH", data, offset)
+            size += 1
+            offset += 6
+            if size <= ARRAY_CONTAINER_MAX_SIZE:
+                bitmap.containers[key] = list(struct.unpack_from("<%dH" % size, data, offset))
+                offset += 2 * size
+            else:
+                bitmap.containers[key] = int.from_bytes(data[offset:offset + BITMAP_CONTAINER_BYTES], "little")
+                offset += BITMAP_CONTAINER_BYTES
+        return bitmap
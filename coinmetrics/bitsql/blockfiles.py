@@ -0,0 +1,237 @@
+import mmap
+import os
+import re
+import struct
+from coinmetrics.bitsql import rawblock
+from coinmetrics.bitsql.constants import BLOCK_FILE_MAGIC
+
+BLOCK_FILE_NAME = re.compile(r"^blk(\d{5})\.dat$")
+INDEX_RECORD = struct.Struct("<32s32sIIIiII")
+MEDIAN_TIME_SPAN = 11
+
+
+def compactToTarget(bits):
+    exponent = bits >> 24
+    mantissa = bits & 0x007fffff
+    if exponent <= 3:
+        return mantissa >> (8 * (3 - exponent))
+    else:
+        return mantissa << (8 * (exponent - 3))
+
+
+def getBlockWork(bits):
+    target = compactToTarget(bits)
+    if target <= 0:
+        return 0
+    return (1 << 256) // (target + 1)
+
+
+def getDifficulty(bits):
+    shift = (bits >> 24) & 0xff
+    difficulty = float(0x0000ffff) / float(bits & 0x00ffffff)
+    while shift < 29:
+        difficulty *= 256.0
+        shift += 1
+    while shift > 29:
+        difficulty /= 256.0
+        shift -= 1
+    return difficulty
+
+
+class BlockFileEntry(object):
+
+    def __init__(self, blockHash, prevHash, fileNumber, offset, size, version, time, bits):
+        self.blockHash = blockHash
+        self.prevHash = prevHash
+        self.fileNumber = fileNumber
+        self.offset = offset
+        self.size = size
+        self.version = version
+        self.time = time
+        self.bits = bits
+
+    def pack(self):
+        return INDEX_RECORD.pack(self.blockHash, self.prevHash, self.fileNumber, self.offset, self.size,
+                                 self.version, self.time, self.bits)
+
+
+class BlockFileNode(object):
+    # block source reading node's blk*.dat files directly; blocks are converted by a regular node object (which is never
+    # asked to do RPC calls), so exported data is the same as with runExport.
+    # Index of block locations is appended to indexPath as new files/blocks appear, so only the tail is rescanned on restart.
+
+    def __init__(self, asset, node, blocksDir, indexPath, log):
+        if asset not in BLOCK_FILE_MAGIC or node.getRawBlockFormat() is None:
+            raise Exception("reading block files is not supported for asset %s" % asset)
+        self.asset = asset
+        self.node = node
+        self.blocksDir = blocksDir
+        self.indexPath = indexPath
+        self.log = log
+        self.magic = BLOCK_FILE_MAGIC[asset]
+        self.blockFormat = node.getRawBlockFormat()
+        self.xorKey = self.readXorKey()
+        self.entries = {}
+        self.fileEnds = {}
+        self.files = {}
+        self.chain = []
+        self.chainWork = []
+        self.loadIndex()
+        self.updateIndex()
+
+    def __repr__(self):
+        return self.blocksDir
+
+    def getConnectionStats(self):
+        return {"files": len(self.fileEnds), "blocks": len(self.entries), "chain": len(self.chain)}
+
+    def getBlockCount(self):
+        self.updateIndex()
+        return len(self.chain) - 1
+
+    def getBlock(self, height):
+        entry = self.chain[height]
+        rawBlock = self.readBlock(entry)
+        blockDict = {
+            "hash": rawblock.hashToHex(entry.blockHash),
+            "height": height,
+            "chainwork": "%064x" % self.chainWork[height],
+            "time": entry.time,
+            "mediantime": self.getMedianTime(height),
+            "size": entry.size,
+            "difficulty": getDifficulty(entry.bits),
+        }
+        block = self.node.initBlock(blockDict)
+        _, txDicts = rawblock.decodeBlock(rawBlock, self.blockFormat)
+        txDicts = [txDict for txDict in txDicts if not self.node.excludeTransaction(txDict["txid"], block)]
+        self.node.processBlockTransactions(block, txDicts)
+        return block
+
+    def getBlocks(self, heights):
+        return [self.getBlock(height) for height in heights]
+
+    def getMedianTime(self, height):
+        times = sorted(entry.time for entry in self.chain[max(0, height - MEDIAN_TIME_SPAN + 1):height + 1])
+        return times[len(times) // 2]
+
+    def readXorKey(self):
+        # bitcoin core 28+ obfuscates block files with a key stored alongside them
+        path = os.path.join(self.blocksDir, "xor.dat")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                key = f.read()
+            if any(key):
+                return key
+        return None
+
+    def getFile(self, fileNumber):
+        if fileNumber not in self.files:
+            with open(self.getFilePath(fileNumber), "rb") as f:
+                self.files[fileNumber] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.files[fileNumber]
+
+    def getFilePath(self, fileNumber):
+        return os.path.join(self.blocksDir, "blk%05d.dat" % fileNumber)
+
+    def readRange(self, fileNumber, offset, size):
+        data = self.getFile(fileNumber)[offset:offset + size]
+        if self.xorKey is not None:
+            keyLength = len(self.xorKey)
+            shift = offset % keyLength
+            keyStream = (self.xorKey[shift:] + self.xorKey * (size // keyLength + 2))[:size]
+            data = (int.from_bytes(data, "little") ^ int.from_bytes(keyStream, "little")).to_bytes(size, "little")
+        return data
+
+    def readBlock(self, entry):
+        return self.readRange(entry.fileNumber, entry.offset, entry.size)
+
+    def loadIndex(self):
+        if not os.path.exists(self.indexPath):
+            return
+        with open(self.indexPath, "rb") as f:
+            data = f.read()
+        count = len(data) // INDEX_RECORD.size
+        for i in range(count):
+            entry = BlockFileEntry(*INDEX_RECORD.unpack_from(data, i * INDEX_RECORD.size))
+            self.addEntry(entry)
+        self.log.info("loaded %d block locations from index %s" % (count, self.indexPath))
+
+    def addEntry(self, entry):
+        self.entries[entry.blockHash] = entry
+        self.fileEnds[entry.fileNumber] = max(self.fileEnds.get(entry.fileNumber, 0), entry.offset + entry.size)
+
+    def updateIndex(self):
+        fileNumbers = sorted(int(match.group(1)) for match in
+                             (BLOCK_FILE_NAME.match(name) for name in os.listdir(self.blocksDir)) if match is not None)
+        newEntries = []
+        for fileNumber in fileNumbers:
+            # files before the last known one are complete, node only appends to the newest file
+            if fileNumber in self.fileEnds and fileNumber < max(self.fileEnds):
+                continue
+            newEntries += self.scanFile(fileNumber, self.fileEnds.get(fileNumber, 0))
+
+        if len(newEntries) > 0:
+            with open(self.indexPath, "ab") as f:
+                for entry in newEntries:
+                    f.write(entry.pack())
+            self.log.info("indexed %d new blocks in %s" % (len(newEntries), self.blocksDir))
+
+        if len(newEntries) > 0 or len(self.chain) == 0:
+            self.buildChain()
+
+    def scanFile(self, fileNumber, offset):
+        # a mapping of the growing file must not be reused, it is remapped on the next read
+        if fileNumber in self.files:
+            self.files.pop(fileNumber).close()
+
+        fileSize = os.path.getsize(self.getFilePath(fileNumber))
+        result = []
+        while offset + 8 + rawblock.BLOCK_HEADER_SIZE <= fileSize:
+            prefix = self.readRange(fileNumber, offset, 8)
+            # rest of the file is preallocated zeroes or a block that is still being written
+            if prefix[0:4] != self.magic:
+                break
+            size = struct.unpack_from("<I", prefix, 4)[0]
+            if offset + 8 + size > fileSize:
+                break
+            header = rawblock.decodeBlockHeader(self.readRange(fileNumber, offset + 8, rawblock.BLOCK_HEADER_SIZE))
+            entry = BlockFileEntry(bytes.fromhex(header["hash"])[::-1], bytes.fromhex(header["previousblockhash"])[::-1],
+                                   fileNumber, offset + 8, size, header["version"], header["time"], header["bits"])
+            if entry.blockHash not in self.entries:
+                self.addEntry(entry)
+                result.append(entry)
+            offset += 8 + size
+
+        if fileNumber in self.files:
+            self.files.pop(fileNumber).close()
+        return result
+
+    def buildChain(self):
+        # blocks are stored in order of arrival, not height, and stale blocks are stored too: the best chain is the one
+        # with most work among blocks that link back to genesis
+        children = {}
+        for entry in self.entries.values():
+            children.setdefault(entry.prevHash, []).append(entry)
+
+        work = {}
+        parents = {}
+        stack = [(entry, 0) for entry in children.get(rawblock.NULL_HASH, [])]
+        tip, tipWork = None, -1
+        while len(stack) > 0:
+            entry, parentWork = stack.pop()
+            entryWork = parentWork + getBlockWork(entry.bits)
+            work[entry.blockHash] = entryWork
+            if entryWork > tipWork:
+                tip, tipWork = entry, entryWork
+            for child in children.get(entry.blockHash, []):
+                parents[child.blockHash] = entry
+                stack.append((child, entryWork))
+
+        chain = []
+        while tip is not None:
+            chain.append(tip)
+            tip = parents.get(tip.blockHash)
+        chain.reverse()
+        self.chain = chain
+        self.chainWork = [work[entry.blockHash] for entry in chain]
+        self.log.info("block files chain height: %d" % (len(chain) - 1))
@@ -2,6 +2,17 @@ HASH_PRECISION = 78
 CHAINWORK_PRECISION = 48
 OUTPUT_VALUE_PRECISION = 32
 MAX_ADDRESS_LENGTH = 64
+BATCH_FETCH_TARGET_SIZE = 4 * 1024 * 1024
+BATCH_FETCH_MAX_BLOCKS = 500
+WRITE_BATCH_MAX_BYTES = 32 * 1024 * 1024
+# transaction id is block height shifted by this many bits plus position of transaction in block; BSV blocks already
+# hold more than 2^20 transactions, 24 bits still leave room for heights up to 2^39 in a BIGINT
+TX_ID_INDEX_BITS = 24
+ADDRESS_CACHE_SIZE = 1000000
+# relative accuracy of quantile estimates of fee and transaction value sketches
+SKETCH_RELATIVE_ACCURACY = 0.01
+# HyperLogLog sketches of active addresses have 2^HLL_PRECISION registers (about 0.8% standard error)
+HLL_PRECISION = 14
 OUTPUT_TYPES = {
     "nulldata": 0,
     "nonstandard": 1,
@@ -43,3 +54,10 @@ BLOCK_TIMES = {
 
 SUPPORTED_ASSETS = ["btc", "ltc", "vtc", "dash", "doge", "zec", "dgb", "xvg", "pivx", "dcr", "bch",
                     "btg", "omnilayer", "usdt", "maid", "bsv", "btcp"]
+
+# network magic that prefixes every record in node's blocks/blk*.dat files
+BLOCK_FILE_MAGIC = {
+    "btc": bytes.fromhex("f9beb4d9"),
+    "bsv": bytes.fromhex("e3e1f3e8"),
+    "doge": bytes.fromhex("c0c0c0c0"),
+}
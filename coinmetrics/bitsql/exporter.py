@@ -1,3 +1,17 @@
+import time
+from collections import OrderedDict
+from coinmetrics.bitsql.constants import TX_ID_INDEX_BITS, ADDRESS_CACHE_SIZE
+from coinmetrics.bitsql.sketch import QuantileSketch
+
+# positions of value and spend fields in output rows, see insertOutputs
+OUTPUT_ROW_VALUE = 5
+OUTPUT_ROW_TIME_SPENT = 7
+OUTPUT_ROW_MEDIAN_TIME_SPENT = 9
+OUTPUT_ROW_SPEND_SIGNATURE = 10
+OUTPUT_ROW_SPENDING_TX_HASH = 11
+OUTPUT_ROW_SPENDING_TX_ID = 13
+
+
 class BulkExporterBase(object):
 
     def pushBlock(self, blockData):
@@ -21,12 +35,126 @@ class BulkExporterBase(object):
 
 
 class BitcoinExporter(BulkExporterBase):
+    # fees of block statistics take a lookup of spent output values, they are computed only for assets whose fee metrics
+    # are rolled up from block statistics (see BitcoinQuery.blockStatsTotals)
+    blockStatsFees = True
 
     def __init__(self, dbAccess, schema, log):
         self.asset = schema.getAsset()
         self.schema = schema
         self.dbAccess = dbAccess
         self.log = log
+        self.useCopy = False
+        self.inputsStagingTableName = None
+        self.blockRowCount = 0
+        self.blockWriteTime = 0.0
+        self.writeBatchMaxRows = None
+        self.writeBatchMaxBytes = None
+        self.batchBlocks = []
+        self.batchRowCount = 0
+        self.batchByteCount = 0
+        self.utxoCacheMaxSize = None
+        self.utxoCache = {}
+        self.utxoCacheHits = 0
+        self.utxoCacheMisses = 0
+        self.utxoCacheSpills = 0
+        self.deferredSpendsTableName = None
+        self.addressCache = OrderedDict()
+        self.addressCacheMaxSize = ADDRESS_CACHE_SIZE
+        self.partitionMonths = set()
+
+    def setDeferredSpends(self, tableName):
+        # spends are appended to tableName instead of updating outputs, to be merged into outputs later in one pass
+        self.deferredSpendsTableName = tableName
+
+    def setUtxoCache(self, maxSize):
+        # outputs created in the current transaction are kept in memory (up to maxSize of them) and inserted right before
+        # commit, so outputs spent in the meantime are written once with spend fields already set, instead of being
+        # inserted and then updated; only spends of outputs not in cache go through the UPDATE path. Combined with write
+        # batches this covers all spends within a batch.
+        self.utxoCacheMaxSize = maxSize
+
+    def getUtxoCacheStats(self):
+        lookups = self.utxoCacheHits + self.utxoCacheMisses
+        return {
+            "hits": self.utxoCacheHits,
+            "misses": self.utxoCacheMisses,
+            "hitRate": float(self.utxoCacheHits) / lookups if lookups > 0 else 0.0,
+            "spills": self.utxoCacheSpills,
+            "size": len(self.utxoCache),
+        }
+
+    def setWriteBatch(self, maxRows, maxBytes):
+        # consecutive blocks are written in one transaction, which is committed when the batch reaches one of the limits
+        # or when flush() is called; height in the blocks table is thus always the last block of a committed batch
+        self.writeBatchMaxRows = maxRows
+        self.writeBatchMaxBytes = maxBytes
+
+    def setUseCopy(self, useCopy):
+        # with COPY, rows are streamed instead of being rendered into INSERT statements, spent outputs are staged in a
+        # temporary table and applied with a single UPDATE
+        self.useCopy = useCopy
+
+    def pushBlock(self, blockData):
+        if not self.useCopy:
+            return super(BitcoinExporter, self).pushBlock(blockData)
+
+        try:
+            super(BitcoinExporter, self).pushBlock(blockData)
+        except Exception as e:
+            # rollback discards the whole uncommitted write batch, so it is replayed together with the failed block
+            self.replayWithoutCopy(self.batchBlocks + [blockData], blockData.blockHeight, e)
+
+    def replayWithoutCopy(self, replayBlocks, height, error):
+        self.dbAccess.rollback()
+        self.inputsStagingTableName = None
+        self.log.warning("COPY failed at height %d, falling back to INSERT: %s" % (height, error))
+        self.useCopy = False
+        self.utxoCache = {}
+        # ids of addresses and partitions created by the discarded transaction are gone too
+        self.addressCache = OrderedDict()
+        self.partitionMonths = set()
+        self.batchBlocks, self.batchRowCount, self.batchByteCount = [], 0, 0
+        for replayBlock in replayBlocks:
+            super(BitcoinExporter, self).pushBlock(replayBlock)
+
+    def pushBlocks(self, blocks):
+        for blockData in blocks:
+            self.pushBlock(blockData)
+            self.flushIfNeeded(True)
+
+    def writeBatchEnabled(self):
+        return self.writeBatchMaxRows is not None
+
+    def flushIfNeeded(self, moreBlocksReady):
+        # without more blocks ready to be written there's no point in holding the batch open
+        if not self.writeBatchEnabled() or len(self.batchBlocks) == 0:
+            return
+        if not moreBlocksReady or self.batchRowCount >= self.writeBatchMaxRows or self.batchByteCount >= self.writeBatchMaxBytes:
+            self.flush()
+
+    def flush(self):
+        if len(self.batchBlocks) == 0:
+            return
+        try:
+            self.writeCachedOutputs()
+        except Exception as e:
+            if not self.useCopy:
+                raise
+            # outputs cached over the batch are written by COPY here, outside of pushBlock
+            self.replayWithoutCopy(self.batchBlocks, self.batchBlocks[-1].blockHeight, e)
+            self.writeCachedOutputs()
+        self.dbAccess.commit()
+        self.log.info("committed %d blocks up to height %d (%d rows, %d bytes)" % (len(self.batchBlocks),
+            self.batchBlocks[-1].blockHeight, self.batchRowCount, self.batchByteCount))
+        self.batchBlocks, self.batchRowCount, self.batchByteCount = [], 0, 0
+        self.logUtxoCacheStats()
+
+    def logUtxoCacheStats(self):
+        if self.utxoCacheMaxSize is not None:
+            stats = self.getUtxoCacheStats()
+            self.log.info("utxo cache: %d hits, %d misses, hit rate %.1f%%, %d spills" % (stats["hits"], stats["misses"],
+                stats["hitRate"] * 100.0, stats["spills"]))
 
     def prologue(self, blockData):
         inputsCount, outputsCount = 0, 0
@@ -34,95 +162,340 @@ class BitcoinExporter(BulkExporterBase):
             inputsCount += len(tx.getInputs())
             outputsCount += len(tx.getOutputs())
         self.log.info("txs: %d, inputs: %d, outputs: %d" % (len(blockData.getTransactions()), inputsCount, outputsCount))
+        self.blockRowCount = 0
+        self.blockWriteTime = 0.0
+        self.blockItemCount = len(blockData.getTransactions()) + inputsCount + outputsCount
+        if self.schema.usesPartitions():
+            month = (blockData.blockTime.year, blockData.blockTime.month)
+            if month not in self.partitionMonths:
+                self.schema.createPartitions(blockData.blockTime)
+                self.partitionMonths.add(month)
 
     def epilogue(self, blockData):
-        self.dbAccess.commit()
+        # with deferred spends (initial sync) spent outputs may not be written yet, days of those blocks get no rollups
+        if self.schema.usesBlockStats() and self.deferredSpendsTableName is None:
+            self.insertBlockStats(blockData)
+        if self.writeBatchEnabled():
+            self.batchBlocks.append(blockData)
+            self.batchRowCount += self.blockItemCount
+            self.batchByteCount += blockData.blockSize
+        else:
+            self.writeCachedOutputs()
+            self.dbAccess.commit()
+        if self.blockWriteTime > 0:
+            self.log.info("%s: %d rows, %.0f rows/s" % ("copy" if self.useCopy else "insert", self.blockRowCount,
+                                                        self.blockRowCount / self.blockWriteTime))
+
+    def insertRows(self, tableName, columns, rows):
+        if len(rows) == 0:
+            return
+        start = time.time()
+        if self.useCopy:
+            self.dbAccess.copyFrom(tableName, columns, rows)
+        else:
+            self.dbAccess.executeValues("INSERT INTO " + tableName + " (" + ", ".join(columns) + ") VALUES %s", rows, 512)
+        self.blockWriteTime += time.time() - start
+        self.blockRowCount += len(rows)
 
     def insertBlock(self, blockData):
-        self.dbAccess.queryNoReturnNoCommit("INSERT INTO " + self.schema.getBlocksTableName() + "\
-            (block_hash, block_height, block_size, block_time, block_median_time, block_difficulty, block_chainwork) \
-            VALUES (%s, %s, %s, %s, %s, %s, %s)", (blockData.hashAsNumber, blockData.blockHeight, 
-                blockData.blockSize, blockData.blockTime, blockData.blockMedianTime, blockData.difficulty, blockData.chainworkAsNumber))
+        self.insertRows(self.schema.getBlocksTableName(),
+            ["block_hash", "block_height", "block_size", "block_time", "block_median_time", "block_difficulty", "block_chainwork"],
+            [(self.schema.encodeHash(blockData.hashAsNumber), blockData.blockHeight, blockData.blockSize, blockData.blockTime,
+              self.schema.encodeMedianTime(blockData.blockMedianTime), blockData.difficulty, blockData.chainworkAsNumber)])
+
+    def getTxId(self, blockData, txIndex):
+        # ids grow with height and position in block, so they are assigned without any lookups and stay the same when
+        # blocks are exported again
+        if txIndex >= 1 << TX_ID_INDEX_BITS:
+            raise Exception("transaction %d of block at height %d doesn't fit into a transaction id" % (txIndex, blockData.blockHeight))
+        return (blockData.blockHeight << TX_ID_INDEX_BITS) | txIndex
 
     def insertTransactions(self, blockData):
         txs = blockData.getTransactions()
+        encodeHash = self.schema.encodeHash
+        encodeMedianTime = self.schema.encodeMedianTime
+        blockHash = encodeHash(blockData.hashAsNumber)
+        txIds = self.schema.usesTxIds()
         transactionTuples = []
         for index, tx in enumerate(txs):
-            transactionTuples.append((tx.txHash, tx.txSize, tx.coinbase, blockData.hashAsNumber, tx.txTime, tx.txMedianTime))
+            row = (encodeHash(tx.txHash), tx.txSize, tx.coinbase, blockHash, tx.txTime, encodeMedianTime(tx.txMedianTime))
+            transactionTuples.append(row + (self.getTxId(blockData, index),) if txIds else row)
+
+        self.insertRows(self.schema.getTransactionsTableName(),
+            ["tx_hash", "tx_size", "tx_coinbase", "tx_block_hash", "tx_time", "tx_median_time"] + (["tx_id"] if txIds else []),
+            transactionTuples)
 
-        self.dbAccess.executeValues("INSERT INTO " + self.schema.getTransactionsTableName() + "\
-            (tx_hash, tx_size, tx_coinbase, tx_block_hash, tx_time, tx_median_time) VALUES %s", transactionTuples, 512)
-            
     def insertInputs(self, blockData):
+        encodeHash = self.schema.encodeHash
+        txIds = self.schema.usesTxIds()
+        if self.schema.usesInputsTable():
+            # spends are appended, outputs rows are never touched again, so cached outputs need no spend fields either
+            rows = []
+            for txIndex, tx in enumerate(blockData.getTransactions()):
+                txHash, txMedianTime = encodeHash(tx.txHash), self.schema.encodeMedianTime(tx.txMedianTime)
+                txIdValue = (self.getTxId(blockData, txIndex),) if txIds else ()
+                for inputTxHash, outputIndex, outputSpendSignature in tx.getInputs():
+                    rows.append((encodeHash(inputTxHash), outputIndex, txHash, bytearray.fromhex(outputSpendSignature),
+                                 tx.txTime, txMedianTime) + txIdValue)
+            self.insertRows(self.schema.getInputsTableName(), ["input_spent_tx_hash", "input_spent_index", "input_tx_hash",
+                "input_spend_signature", "input_time", "input_median_time"] + (["input_tx_id"] if txIds else []), rows)
+            return
+
         batchUpdateData = []
-        for tx in blockData.getTransactions():
+        for txIndex, tx in enumerate(blockData.getTransactions()):
+            txHash, txMedianTime = encodeHash(tx.txHash), self.schema.encodeMedianTime(tx.txMedianTime)
+            txId = self.getTxId(blockData, txIndex) if txIds else None
             for inputTxHash, outputIndex, outputSpendSignature in tx.getInputs():
-                batchUpdateData.append((inputTxHash, outputIndex, bytearray.fromhex(outputSpendSignature), 
-                                        tx.txHash, tx.txTime, tx.txMedianTime))
+                inputTxHash = encodeHash(inputTxHash)
+                if self.utxoCacheMaxSize is not None:
+                    cachedOutput = self.utxoCache.get((inputTxHash, outputIndex))
+                    if cachedOutput is not None:
+                        self.utxoCacheHits += 1
+                        cachedOutput[OUTPUT_ROW_SPEND_SIGNATURE] = bytearray.fromhex(outputSpendSignature)
+                        cachedOutput[OUTPUT_ROW_SPENDING_TX_HASH] = txHash
+                        cachedOutput[OUTPUT_ROW_TIME_SPENT] = tx.txTime
+                        cachedOutput[OUTPUT_ROW_MEDIAN_TIME_SPENT] = txMedianTime
+                        if txIds:
+                            cachedOutput[OUTPUT_ROW_SPENDING_TX_ID] = txId
+                        continue
+                    self.utxoCacheMisses += 1
+                row = (inputTxHash, outputIndex, bytearray.fromhex(outputSpendSignature), txHash, tx.txTime, txMedianTime)
+                batchUpdateData.append(row + (txId,) if txIds else row)
+
+        if len(batchUpdateData) == 0:
+            return
+        # row layout: outpoint followed by spend columns of the schema
+        spendColumns = self.schema.getSpendColumns()
+        if self.deferredSpendsTableName is not None:
+            self.insertRows(self.deferredSpendsTableName, ["output_tx_hash", "output_index"] + spendColumns, batchUpdateData)
+            return
+        assignments = ", ".join(column + "=data." + column for column in spendColumns)
+        start = time.time()
+        if self.useCopy:
+            stagingTableName = self.getInputsStagingTableName()
+            self.dbAccess.copyFrom(stagingTableName, ["output_tx_hash", "output_index"] + spendColumns, batchUpdateData)
+            self.dbAccess.queryNoReturnNoCommit("UPDATE " + self.schema.getOutputsTableName() + " \
+                SET " + assignments + " \
+                FROM " + stagingTableName + " AS data \
+                WHERE " + self.schema.getOutputsTableName() + ".output_tx_hash=data.output_tx_hash AND " 
+                + self.schema.getOutputsTableName() + ".output_index=data.output_index")
+            self.dbAccess.queryNoReturnNoCommit("TRUNCATE " + stagingTableName)
+        else:
+            self.dbAccess.executeValues("UPDATE " + self.schema.getOutputsTableName() + " \
+                SET " + assignments + " \
+                FROM (VALUES %s) AS data (output_tx_hash, output_index, " + ", ".join(spendColumns) + ") \
+                WHERE " + self.schema.getOutputsTableName() + ".output_tx_hash=data.output_tx_hash AND " 
+                + self.schema.getOutputsTableName() + ".output_index=data.output_index", batchUpdateData, 512)
+        self.blockWriteTime += time.time() - start
+        self.blockRowCount += len(batchUpdateData)
 
-        self.dbAccess.executeValues("UPDATE " + self.schema.getOutputsTableName() + "\
-            SET output_spending_tx_hash=data.output_spending_tx_hash, output_time_spent=data.output_time_spent, \
-            output_median_time_spent=data.output_median_time_spent, output_spend_signature=data.output_spend_signature \
-            FROM (VALUES %s) AS data (output_tx_hash, output_index, output_spend_signature, \
-            output_spending_tx_hash, output_time_spent, output_median_time_spent) \
-            WHERE " + self.schema.getOutputsTableName() + ".output_tx_hash=data.output_tx_hash AND " 
-            + self.schema.getOutputsTableName() + ".output_index=data.output_index", batchUpdateData, 512)
+    def getInputsStagingTableName(self):
+        if self.inputsStagingTableName is None:
+            self.inputsStagingTableName = self.asset + "_inputs_staging"
+            self.dbAccess.queryNoReturnNoCommit("CREATE TEMPORARY TABLE IF NOT EXISTS " + self.inputsStagingTableName + " \
+                (LIKE " + self.schema.getOutputsTableName() + " INCLUDING DEFAULTS)")
+        return self.inputsStagingTableName
+
+    def setAddressCacheSize(self, maxSize):
+        self.addressCacheMaxSize = maxSize
+
+    def getAddressIds(self, blockData):
+        # address -> id for all output addresses of the block; recently seen addresses are kept in an LRU cache, the rest
+        # are inserted into the addresses table (if new) and looked up in two statements per block
+        addresses = set()
+        for tx in blockData.getTransactions():
+            for _, _, outputAddresses, _, _ in tx.getOutputs():
+                addresses.update(outputAddresses)
+
+        result = {}
+        missing = []
+        for address in addresses:
+            addressId = self.addressCache.get(address)
+            if addressId is not None:
+                self.addressCache.move_to_end(address)
+                result[address] = addressId
+            else:
+                missing.append(address)
+
+        if len(missing) > 0:
+            # sorted, so that concurrent exporters lock new addresses in the same order
+            missing.sort()
+            start = time.time()
+            tableName = self.schema.getAddressesTableName()
+            self.dbAccess.queryNoReturnNoCommit("INSERT INTO " + tableName + " (address) \
+                SELECT unnest(%s::VARCHAR[]) ON CONFLICT (address) DO NOTHING", (missing,))
+            for address, addressId in self.dbAccess.queryReturnAll("SELECT address, address_id FROM " + tableName + " \
+                WHERE address = ANY(%s::VARCHAR[])", (missing,)):
+                result[address] = addressId
+                self.addressCache[address] = addressId
+            while len(self.addressCache) > self.addressCacheMaxSize:
+                self.addressCache.popitem(last=False)
+            self.blockWriteTime += time.time() - start
+        return result
 
     def insertOutputs(self, blockData):
         rows = []
-        for tx in blockData.getTransactions():
+        txIds = self.schema.usesTxIds()
+        addressIds = self.getAddressIds(blockData) if self.schema.usesAddressIds() else None
+        for txIndex, tx in enumerate(blockData.getTransactions()):
+            txHash, txMedianTime = self.schema.encodeHash(tx.txHash), self.schema.encodeMedianTime(tx.txMedianTime)
+            txId = self.getTxId(blockData, txIndex) if txIds else None
             for outputIndex, outputType, addresses, scriptHex, value in tx.getOutputs():
-                rows.append((tx.txHash, outputIndex, outputType, addresses, 
-                    bytearray.fromhex(scriptHex), value, tx.txTime, None, tx.txMedianTime, None))
-        self.dbAccess.executeValues("INSERT INTO " + self.schema.getOutputsTableName() + "\
-            (output_tx_hash, output_index, output_type, output_addresses, output_script, \
-            output_value_satoshi, output_time_created, output_time_spent, output_median_time_created, \
-            output_median_time_spent) VALUES %s", rows, 512)
+                if addressIds is not None:
+                    addresses = [addressIds[address] for address in addresses]
+                row = [txHash, outputIndex, outputType, addresses, 
+                    bytearray.fromhex(scriptHex), value, tx.txTime, None, txMedianTime, None, None, None]
+                if txIds:
+                    row += [txId, None]
+                rows.append(row)
+
+        if self.utxoCacheMaxSize is None:
+            self.writeOutputs(rows)
+        else:
+            for row in rows:
+                self.utxoCache[(row[0], row[1])] = row
+            if len(self.utxoCache) > self.utxoCacheMaxSize:
+                # oldest outputs are least likely to be spent soon, they are written out to make room for fresh ones
+                self.utxoCacheSpills += 1
+                spillCount = len(self.utxoCache) - self.utxoCacheMaxSize // 2
+                spilledKeys = []
+                for key in self.utxoCache:
+                    if len(spilledKeys) >= spillCount:
+                        break
+                    spilledKeys.append(key)
+                self.writeOutputs([self.utxoCache.pop(key) for key in spilledKeys])
+
+    def writeCachedOutputs(self):
+        if len(self.utxoCache) > 0:
+            self.writeOutputs(list(self.utxoCache.values()))
+            self.utxoCache = {}
+
+    def writeOutputs(self, rows):
+        self.insertRows(self.schema.getOutputsTableName(), self.schema.getOutputColumns(), rows)
+
+    def getSpentValues(self, blockData):
+        # outpoint -> value of outputs spent by the block, from the utxo cache or in one lookup for the rest;
+        # None if some of them aren't in the database
+        values = {}
+        missing = []
+        encodeHash = self.schema.encodeHash
+        for tx in blockData.getTransactions():
+            for inputTxHash, outputIndex, _ in tx.getInputs():
+                key = (encodeHash(inputTxHash), outputIndex)
+                cachedOutput = self.utxoCache.get(key)
+                if cachedOutput is not None:
+                    values[key] = cachedOutput[OUTPUT_ROW_VALUE]
+                else:
+                    missing.append(key)
+
+        if len(missing) > 0:
+            start = time.time()
+            for position, value in self.dbAccess.queryReturnAll("SELECT s.position, o.output_value_satoshi \
+                FROM unnest(%s::" + self.schema.hashType + "[], %s::INTEGER[]) WITH ORDINALITY AS s(tx_hash, index, position) \
+                JOIN " + self.schema.getOutputsTableName() + " AS o ON \
+                    o.output_tx_hash = s.tx_hash AND o.output_index = s.index",
+                    ([key[0] for key in missing], [key[1] for key in missing])):
+                values[missing[position - 1]] = value
+            self.blockWriteTime += time.time() - start
+            if any(key not in values for key in missing):
+                return None
+        return values
+
+    def insertBlockStats(self, blockData):
+        spentValues = None
+        if self.blockStatsFees:
+            spentValues = self.getSpentValues(blockData)
+            # i.e. outputs of transactions the node object excludes; days of such a block are computed as usual
+            if spentValues is None:
+                self.log.warning("outputs spent at height %d are missing, no statistics for the block" % blockData.blockHeight)
+                return
+        encodeHash = self.schema.encodeHash
+        txCount, outputSum, feeSum, reward = 0, 0, 0, 0
+        feeSketch = QuantileSketch()
+        for tx in blockData.getTransactions():
+            txOutputSum = sum(value for _, _, _, _, value in tx.getOutputs())
+            if tx.coinbase:
+                reward += txOutputSum
+                continue
+            txCount += 1
+            outputSum += txOutputSum
+            if spentValues is not None:
+                fee = sum(spentValues[(encodeHash(inputTxHash), outputIndex)] for inputTxHash, outputIndex, _ in tx.getInputs()) - txOutputSum
+                feeSum += fee
+                feeSketch.add(fee)
+
+        if spentValues is None:
+            feeSum = None
+        feeKeys, feeCounts = feeSketch.getBuckets()
+        self.insertRows(self.schema.getBlockStatsTableName(),
+            ["block_stats_hash", "block_stats_time", "block_stats_tx_count", "block_stats_size", "block_stats_output_sum",
+             "block_stats_fee_sum", "block_stats_reward", "block_stats_fee_sketch_keys", "block_stats_fee_sketch_counts"],
+            [(encodeHash(blockData.hashAsNumber), blockData.blockTime, txCount, blockData.blockSize, outputSum, feeSum, reward,
+              feeKeys, feeCounts)])
 
     def insertCoinbaseScripts(self, blockData):
+        rows = []
         for tx in blockData.getTransactions():
             if tx.getCoinbaseScript() is not None:
-                self.dbAccess.queryNoReturnNoCommit("INSERT INTO " + self.schema.getCoinbaseScriptsTableName() + "\
-                    (coinbase_script_tx_hash, coinbase_script_hex) VALUES (%s, %s)",
-                    (tx.txHash, bytearray.fromhex(tx.getCoinbaseScript())))
+                rows.append((self.schema.encodeHash(tx.txHash), bytearray.fromhex(tx.getCoinbaseScript())))
+        self.insertRows(self.schema.getCoinbaseScriptsTableName(), ["coinbase_script_tx_hash", "coinbase_script_hex"], rows)
 
 
 class ZcashExporter(BitcoinExporter):
+    blockStatsFees = False
 
     def additionalProcessing(self, blockData):
-        for tx in blockData.getTransactions():
+        joinSplits = []
+        saplingPayments = []
+        txIds = self.schema.usesTxIds()
+        for txIndex, tx in enumerate(blockData.getTransactions()):
+            txHash = self.schema.encodeHash(tx.txHash)
+            txIdValue = (self.getTxId(blockData, txIndex),) if txIds else ()
             for valueOld, valueNew in tx.getJoinSplits():
-                self.dbAccess.queryNoReturnNoCommit("INSERT INTO " + self.schema.getJoinSplitsTableName() + "\
-                    (joinsplit_tx_hash, joinsplit_value_old, joinsplit_value_new, joinsplit_time) \
-                    VALUES (%s, %s, %s, %s)", (tx.txHash, valueOld, valueNew, tx.txTime))
+                joinSplits.append((txHash, valueOld, valueNew, tx.txTime) + txIdValue)
             for inputCount, outputCount, valueBalance in tx.getSaplingPayments():
-                self.dbAccess.queryNoReturnNoCommit("INSERT INTO " + self.schema.getSaplingPaymentTableName() + "\
-                    (sapling_payment_tx_hash, sapling_payment_input_count, sapling_payment_output_count, sapling_payment_value_balance, sapling_payment_time) \
-                    VALUES (%s, %s, %s, %s, %s)", (tx.txHash, inputCount, outputCount, valueBalance, tx.txTime))
+                saplingPayments.append((txHash, inputCount, outputCount, valueBalance, tx.txTime) + txIdValue)
+        self.insertRows(self.schema.getJoinSplitsTableName(),
+            ["joinsplit_tx_hash", "joinsplit_value_old", "joinsplit_value_new", "joinsplit_time"] +
+            (["joinsplit_tx_id"] if txIds else []), joinSplits)
+        self.insertRows(self.schema.getSaplingPaymentTableName(),
+            ["sapling_payment_tx_hash", "sapling_payment_input_count", "sapling_payment_output_count",
+             "sapling_payment_value_balance", "sapling_payment_time"] + (["sapling_payment_tx_id"] if txIds else []),
+            saplingPayments)
 
 
 class PivxExporter(BitcoinExporter):
+    blockStatsFees = False
 
     def additionalProcessing(self, blockData):
-        for tx in blockData.getTransactions():
+        mints = []
+        spends = []
+        txIds = self.schema.usesTxIds()
+        for txIndex, tx in enumerate(blockData.getTransactions()):
+            txHash = self.schema.encodeHash(tx.txHash)
+            txIdValue = (self.getTxId(blockData, txIndex),) if txIds else ()
             for mintValue in tx.getZerocoinMints():
-                self.dbAccess.queryNoReturnNoCommit("INSERT INTO " + self.schema.getZerocoinMintsTableName() + "\
-                    (zerocoin_mint_tx_hash, zerocoin_mint_value, zerocoin_mint_time) \
-                    VALUES (%s, %s, %s)", (tx.txHash, mintValue, tx.txTime))
+                mints.append((txHash, mintValue, tx.txTime) + txIdValue)
             for spendValue in tx.getZerocoinSpends():
-                self.dbAccess.queryNoReturnNoCommit("INSERT INTO " + self.schema.getZerocoinSpendsTableName() + "\
-                    (zerocoin_spend_tx_hash, zerocoin_spend_value, zerocoin_spend_time) \
-                    VALUES (%s, %s, %s)", (tx.txHash, spendValue, tx.txTime))
+                spends.append((txHash, spendValue, tx.txTime) + txIdValue)
+        self.insertRows(self.schema.getZerocoinMintsTableName(),
+            ["zerocoin_mint_tx_hash", "zerocoin_mint_value", "zerocoin_mint_time"] + (["zerocoin_mint_tx_id"] if txIds else []),
+            mints)
+        self.insertRows(self.schema.getZerocoinSpendsTableName(),
+            ["zerocoin_spend_tx_hash", "zerocoin_spend_value", "zerocoin_spend_time"] +
+            (["zerocoin_spend_tx_id"] if txIds else []), spends)
 
 
 class DecredExporter(BitcoinExporter):
+    blockStatsFees = False
 
     def insertTransactions(self, blockData):
         transactionTuples = []
-        for tx in blockData.getTransactions():
-            transactionTuples.append((tx.txHash, tx.txSize, tx.coinbase, blockData.hashAsNumber, tx.txTime,
-                tx.vote, tx.ticket))
-        self.dbAccess.executeValues(
-            "INSERT INTO " + self.schema.getTransactionsTableName() + "\
-             (tx_hash, tx_size, tx_coinbase, tx_block_hash, tx_time, tx_vote, tx_ticket) VALUES %s", 
-             transactionTuples, 512)
\ No newline at end of file
+        blockHash = self.schema.encodeHash(blockData.hashAsNumber)
+        txIds = self.schema.usesTxIds()
+        for txIndex, tx in enumerate(blockData.getTransactions()):
+            row = (self.schema.encodeHash(tx.txHash), tx.txSize, tx.coinbase, blockHash, tx.txTime, tx.vote, tx.ticket)
+            transactionTuples.append(row + (self.getTxId(blockData, txIndex),) if txIds else row)
+        self.insertRows(self.schema.getTransactionsTableName(),
+            ["tx_hash", "tx_size", "tx_coinbase", "tx_block_hash", "tx_time", "tx_vote", "tx_ticket"] +
+            (["tx_id"] if txIds else []), transactionTuples)
@@ -0,0 +1,203 @@
+import concurrent.futures
+import logging
+from coinmetrics.bitsql import runExport, dbObjectsFactory, postgresFactory, getNodesByHeight
+from coinmetrics.bitsql.constants import BLOCK_TIMES
+from coinmetrics.bitsql.schema import BitcoinSchema
+
+SHARD_RANGES_PER_PROCESS = 8
+
+
+class InitialSyncState(object):
+    # completed steps of the initial sync; the table exists only while initial sync is in progress
+
+    def __init__(self, dbAccess, asset):
+        self.dbAccess = dbAccess
+        self.tableName = asset + "_initial_sync_steps"
+
+    def exists(self):
+        return self.tableName in self.dbAccess.getTableNames()
+
+    def create(self):
+        self.dbAccess.queryNoReturnCommit("CREATE TABLE %s (step VARCHAR(256) PRIMARY KEY)" % self.tableName)
+
+    def drop(self):
+        self.dbAccess.queryNoReturnCommit("DROP TABLE %s" % self.tableName)
+
+    def isDone(self, step):
+        return self.dbAccess.queryReturnOne("SELECT count(*) FROM " + self.tableName + " WHERE step = %s", (step,))[0] > 0
+
+    def markDone(self, step):
+        self.dbAccess.queryNoReturnNoCommit("INSERT INTO " + self.tableName + " (step) VALUES (%s)", (step,))
+
+    def unmark(self, step):
+        self.dbAccess.queryNoReturnNoCommit("DELETE FROM " + self.tableName + " WHERE step = %s", (step,))
+
+    def clear(self):
+        self.dbAccess.queryNoReturnNoCommit("DELETE FROM %s" % self.tableName)
+
+    def getSteps(self, prefix):
+        return [row[0] for row in self.dbAccess.queryReturnAll("SELECT step FROM " + self.tableName + " WHERE step LIKE %s \
+            ORDER BY step", (prefix + "%",))]
+
+
+def isTableEmpty(db, tableName):
+    return db.queryReturnOne("SELECT count(*) FROM (SELECT 1 FROM %s LIMIT 1) AS t" % tableName)[0] == 0
+
+
+def isLoadedDataLost(schema, query, db, state):
+    # PostgreSQL truncates unlogged tables after a crash, while marks of the (logged) state table and rows of logged
+    # (e.g. partitioned) tables survive. Blocks, transactions and outputs are never empty after loading any block, so
+    # an empty one that is still unlogged means that loaded data is gone. A completed load also has every height.
+    tableNames = [schema.getBlocksTableName(), schema.getTransactionsTableName(), schema.getOutputsTableName()]
+    emptyTableNames = [tableName for tableName in tableNames if isTableEmpty(db, tableName)]
+    if len(emptyTableNames) == len(tableNames) and not state.isDone("load") and len(state.getSteps("loaded:")) == 0:
+        return False
+    if any(not state.isDone("logged:" + tableName) for tableName in emptyTableNames):
+        return True
+    if state.isDone("load") and not state.isDone("logged:" + schema.getBlocksTableName()):
+        height = query.getBlockHeight()
+        return height is None or query.getBlockCountBetweenHeights(0, height) != height + 1
+    return False
+
+
+def restartInitialSync(schema, db, state):
+    # tables that were made logged before the crash (and partitioned ones, which are always logged) kept their rows,
+    # all tables are emptied so that the export starts from genesis without duplicates
+    tableNames = [tableName for tableName, _ in schema.getPrimaryKeys()]
+    if schema.getDeferredSpendsTableName() in db.getTableNames():
+        tableNames.append(schema.getDeferredSpendsTableName())
+    schema.dropIndexes()
+    db.queryNoReturnNoCommit("TRUNCATE %s" % ", ".join(tableNames))
+    state.clear()
+    db.commit()
+    schema.prepareInitialSync()
+
+
+def exportHeightRange(asset, nodeList, dbParams, logName, logLevel, heightRange, exportOptions):
+    # loggers can't be pickled before Python 3.7, worker process looks the logger up by name
+    log = logging.getLogger(logName)
+    log.setLevel(logLevel)
+    return runExport(asset, nodeList, dbParams, log, initialSync=True, heightRange=heightRange, **exportOptions)
+
+
+def loadShards(asset, nodeList, dbParams, log, lag, shards, db, query, state, exportOptions):
+    # with deferred spends blocks don't depend on each other, so the height range is cut into pieces exported by
+    # separate processes, each with its own node and database connections; there are several pieces per process,
+    # so that processes which got early (small) blocks take more pieces. Pieces are fixed on the first run, resumed
+    # runs continue every unfinished piece from its highest exported block.
+    ranges = [tuple(int(value) for value in step.split(":")[1:]) for step in state.getSteps("range:")]
+    if len(ranges) == 0:
+        nodeHeight = getNodesByHeight(asset, nodeList, log)[0][1]
+        targetHeight = nodeHeight - lag // BLOCK_TIMES[asset]
+        rangeCount = shards * SHARD_RANGES_PER_PROCESS
+        rangeSize = max(targetHeight // rangeCount + 1, 1)
+        ranges = [(start, min(start + rangeSize - 1, targetHeight)) for start in range(0, targetHeight + 1, rangeSize)]
+        for fromHeight, toHeight in ranges:
+            state.markDone("range:%d:%d" % (fromHeight, toHeight))
+        db.commit()
+        log.info("initial sync: heights 0-%d split into %d ranges" % (targetHeight, len(ranges)))
+
+    # a loaded mark is only trusted when every height of the range is there, blocks are in unlogged tables
+    for heightRange in ranges:
+        if state.isDone("loaded:%d:%d" % heightRange) and \
+                query.getBlockCountBetweenHeights(*heightRange) != heightRange[1] - heightRange[0] + 1:
+            log.warning("initial sync: range %d-%d is marked loaded but has missing blocks, exporting it again" % heightRange)
+            state.unmark("loaded:%d:%d" % heightRange)
+    db.commit()
+    ranges = sorted(heightRange for heightRange in ranges if not state.isDone("loaded:%d:%d" % heightRange))
+    success = True
+    with concurrent.futures.ProcessPoolExecutor(max_workers=shards) as executor:
+        futures = [(heightRange, executor.submit(exportHeightRange, asset, nodeList, dbParams, log.name, log.level, heightRange,
+                                                   exportOptions))
+                   for heightRange in ranges]
+        for heightRange, future in futures:
+            try:
+                result, keyboardInterrupt = future.result()
+            except Exception as e:
+                log.critical("initial sync: range %d-%d failed: %s" % (heightRange[0], heightRange[1], e))
+                result, keyboardInterrupt = False, False
+            if result and not keyboardInterrupt:
+                state.markDone("loaded:%d:%d" % heightRange)
+                db.commit()
+                log.info("initial sync: range %d-%d loaded" % heightRange)
+            else:
+                success = False
+    return success
+
+
+def runInitialSyncSteps(asset, dbParams, log, steps, workers):
+    # every step runs with its own connection, so that index builds on different tables go in parallel
+    def runStep(step, proc):
+        db = postgresFactory(*dbParams)
+        try:
+            schema, _, _, _ = dbObjectsFactory(asset, db, log)
+            state = InitialSyncState(db, asset)
+            if state.isDone(step):
+                return
+            # some steps (vacuum) can't run inside a transaction block
+            db.commit()
+            log.info("initial sync: %s" % step)
+            # steps either commit together with their mark or can be safely repeated
+            proc(schema, db)
+            state.markDone(step)
+            db.commit()
+            log.info("initial sync: %s done" % step)
+        finally:
+            db.close()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(runStep, step, proc) for step, proc in steps]
+        for future in futures:
+            future.result()
+
+
+def runInitialSync(asset, nodeList, dbParams, log, lag=60 * 60 * 2, workers=4, shards=1, **exportOptions):
+    # fresh asset export in bulk load layout (see BitcoinSchema.prepareInitialSync), followed by conversion to regular
+    # tables: spends are merged into outputs, tables are made logged, primary keys and indexes are built and outputs are
+    # vacuumed. Progress is stored in the database, so an interrupted run can be resumed by running it again.
+    # Unlogged tables are truncated by PostgreSQL after a crash; marks of lost data are detected on resume (see
+    # isLoadedDataLost) and the sync restarts from genesis.
+    db = postgresFactory(*dbParams)
+    schema, query, _, _ = dbObjectsFactory(asset, db, log)
+    if not isinstance(schema, BitcoinSchema):
+        raise Exception("initial sync is not supported for asset %s" % asset)
+
+    state = InitialSyncState(db, asset)
+    if not state.exists():
+        if query.getBlockHeight() is not None:
+            raise Exception("initial sync requires empty %s tables, use regular export to continue" % asset)
+        state.create()
+        schema.prepareInitialSync()
+        log.info("initial sync: tables prepared for bulk load")
+    elif isLoadedDataLost(schema, query, db, state):
+        log.warning("initial sync: loaded data was truncated after a server crash, restarting from genesis")
+        restartInitialSync(schema, db, state)
+
+    if not state.isDone("load"):
+        if shards > 1:
+            success = loadShards(asset, nodeList, dbParams, log, lag, shards, db, query, state, exportOptions)
+        else:
+            result, keyboardInterrupt = runExport(asset, nodeList, dbParams, log, lag=lag, initialSync=True, **exportOptions)
+            success = result and not keyboardInterrupt
+        if not success:
+            log.info("initial sync: export did not complete, run again to resume")
+            return False
+        state.markDone("load")
+        db.commit()
+
+    runInitialSyncSteps(asset, dbParams, log, [("spends", lambda schema, db: schema.applyDeferredSpends())], 1)
+    runInitialSyncSteps(asset, dbParams, log, [("logged:" + tableName, lambda schema, db, tableName=tableName:
+                                                schema.setTableLogged(tableName))
+                                               for tableName, _ in schema.getPrimaryKeys()], workers)
+    runInitialSyncSteps(asset, dbParams, log, [("pk:" + tableName, lambda schema, db, tableName=tableName, columns=columns:
+                                                schema.addPrimaryKey(tableName, columns))
+                                               for tableName, columns in schema.getPrimaryKeys()], workers)
+    runInitialSyncSteps(asset, dbParams, log, [("index:" + name, lambda schema, db, statement=statement:
+                                                db.queryNoReturnNoCommit(statement))
+                                               for name, statement in schema.getIndexes()], workers)
+    runInitialSyncSteps(asset, dbParams, log, [("vacuum", lambda schema, db: schema.vacuum())], 1)
+
+    state.drop()
+    db.close()
+    log.info("initial sync: completed")
+    return True
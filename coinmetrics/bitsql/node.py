@@ -1,8 +1,9 @@
 import binascii
 from coinmetrics.utils import bech32
-from coinmetrics.utils.jsonrpc import JsonRpcCaller
+from coinmetrics.utils.jsonrpc import JsonRpcCaller, parseRpcResponseBody
 from coinmetrics.bitsql.constants import *
 from coinmetrics.bitsql.data import *
+from coinmetrics.bitsql import rawblock
 from datetime import datetime
 
 
@@ -25,53 +26,188 @@ def outputValueToSatoshis(outputValue):
 
 class BitcoinNodeBase(object):
 
-    def __init__(self, host, port, user, password):
-        self.bitcoinAccess = JsonRpcCaller(host, port, user, password)
+    def __init__(self, host, port, user, password, rpcPoolSize=1, rawBlocks=False):
+        self.bitcoinAccess = JsonRpcCaller(host, port, user, password, poolSize=rpcPoolSize)
+        self.setRawBlocks(rawBlocks)
 
     def __repr__(self):
         return self.bitcoinAccess.getAddress()
 
+    def getConnectionStats(self):
+        return self.bitcoinAccess.getConnectionStats()
+
+    def getConnectionParameters(self):
+        rpc = self.bitcoinAccess
+        return (rpc.host, int(rpc.port), rpc.user, rpc.password)
+
     def getBlockCount(self):
         return self.bitcoinAccess.call("getblockcount")
 
     def supportsGetBlock2(self):
         return True
 
+    def getRawBlockFormat(self):
+        return None
+
+    def setRawBlocks(self, rawBlocks):
+        # in raw mode blocks are requested as serialized hex (getblock verbosity 0) and decoded locally,
+        # which is a lot cheaper for the node than building verbose JSON
+        if rawBlocks and self.getRawBlockFormat() is None:
+            raise Exception("raw block decoding is not supported by {0}".format(type(self).__name__))
+        self.rawBlocks = rawBlocks
+
     def getBlock(self, height):
         blockHash = self.bitcoinAccess.call("getblockhash", [height])
+        if self.rawBlocks:
+            headerDict, rawBlockHex = self.bitcoinAccess.bulkCall(self.getRawBlockCalls(blockHash))
+            return self.processRawBlock(headerDict, rawBlockHex)
+        blockDict = self.bitcoinAccess.call("getblock", self.getBlockParams(blockHash))
+        block = self.initBlock(blockDict)
+        txDicts = self.getBlockTransactions(blockDict, block)
+        self.completeBlockTransactions(txDicts)
+        self.processBlockTransactions(block, txDicts)
+        return block
+
+    def getBlocks(self, heights):
+        # fetches several blocks in two round trips: all hashes in one batch, then all block bodies in another
+        blockHashes = self.bitcoinAccess.bulkCall(("getblockhash", [height]) for height in heights)
+        if self.rawBlocks:
+            results = self.bitcoinAccess.bulkCall(call for blockHash in blockHashes for call in self.getRawBlockCalls(blockHash))
+            return [self.processRawBlock(results[i], results[i + 1]) for i in range(0, len(results), 2)]
+        blockDicts = self.bitcoinAccess.bulkCall(("getblock", self.getBlockParams(blockHash)) for blockHash in blockHashes)
+        result = []
+        for blockDict in blockDicts:
+            block = self.initBlock(blockDict)
+            txDicts = self.getBlockTransactions(blockDict, block)
+            self.completeBlockTransactions(txDicts)
+            self.processBlockTransactions(block, txDicts)
+            result.append(block)
+        return result
+
+    def fetchBlockResponses(self, height):
+        # fetch half of getBlock: returns undecoded response bodies, which parseBlockResponses turns into block data
+        blockHash = self.bitcoinAccess.call("getblockhash", [height])
+        if self.rawBlocks:
+            return [self.bitcoinAccess.bulkCallRaw(self.getRawBlockCalls(blockHash))]
+        elif self.supportsGetBlock2():
+            return [self.bitcoinAccess.callRaw("getblock", self.getBlockParams(blockHash))]
+        else:
+            # transaction list is needed to request transactions, so verbose block is decoded here
+            blockResponse = self.bitcoinAccess.callRaw("getblock", self.getBlockParams(blockHash))
+            blockDict = parseRpcResponseBody(blockResponse)
+            hashes = self.getBlockTransactionHashes(blockDict, self.initBlock(blockDict))
+            if len(hashes) > 0:
+                return [blockResponse, self.bitcoinAccess.bulkCallRaw(("getrawtransaction", [txHash, 1]) for txHash in hashes)]
+            else:
+                return [blockResponse]
+
+    def parseBlockResponses(self, responses):
+        if self.rawBlocks:
+            headerDict, rawBlockHex = parseRpcResponseBody(responses[0])
+            return self.processRawBlock(headerDict, rawBlockHex)
+
+        blockDict = parseRpcResponseBody(responses[0])
+        block = self.initBlock(blockDict)
         if self.supportsGetBlock2():
-            blockDict = self.bitcoinAccess.call("getblock", [blockHash, 2])
+            txDicts = self.getIncludedBlockTransactions(blockDict, block)
+        elif len(responses) > 1:
+            txDicts = parseRpcResponseBody(responses[1])
         else:
-            blockDict = self.bitcoinAccess.call("getblock", [blockHash])
+            txDicts = []
+        self.completeBlockTransactions(txDicts)
+        self.processBlockTransactions(block, txDicts)
+        return block
+
+    async def getBlockAsync(self, rpc, height):
+        blockHash = await rpc.call("getblockhash", [height])
+        if self.rawBlocks:
+            headerDict, rawBlockHex = await rpc.bulkCall(self.getRawBlockCalls(blockHash))
+            block, txDicts = self.decodeRawBlock(headerDict, rawBlockHex)
+            await self.completeRawBlockTransactionsAsync(rpc, txDicts)
+            self.processBlockTransactions(block, txDicts)
+            return block
+        blockDict = await rpc.call("getblock", self.getBlockParams(blockHash))
         block = self.initBlock(blockDict)
+        txDicts = await self.getBlockTransactionsAsync(rpc, blockDict, block)
+        self.processBlockTransactions(block, txDicts)
+        return block
 
-        txDicts = self.getBlockTransactions(blockDict, block)
+    def getBlockParams(self, blockHash):
+        if self.supportsGetBlock2():
+            return [blockHash, 2]
+        else:
+            return [blockHash]
+
+    def getRawBlockCalls(self, blockHash):
+        # header still comes from the node, as height, chainwork, median time and difficulty aren't part of the serialized block
+        return [("getblockheader", [blockHash, True]), ("getblock", [blockHash, False])]
+
+    def decodeRawBlock(self, headerDict, rawBlockHex):
+        rawBlock = binascii.unhexlify(rawBlockHex)
+        blockDict = dict(headerDict)
+        blockDict["size"] = len(rawBlock)
+        block = self.initBlock(blockDict)
+        _, txDicts = rawblock.decodeBlock(rawBlock, self.getRawBlockFormat())
+        return block, [txDict for txDict in txDicts if not self.excludeTransaction(txDict["txid"], block)]
+
+    def processRawBlock(self, headerDict, rawBlockHex):
+        block, txDicts = self.decodeRawBlock(headerDict, rawBlockHex)
+        self.completeBlockTransactions(txDicts)
+        self.processBlockTransactions(block, txDicts)
+        return block
+
+    def completeBlockTransactions(self, txDicts):
+        # data that isn't part of the transaction dicts is requested here (or in the async version), so that
+        # processBlockTransactions never blocks on the node
+        pass
+
+    async def completeRawBlockTransactionsAsync(self, rpc, txDicts):
+        pass
+
+    def processBlockTransactions(self, block, txDicts):
         txIndex = 0
         for txDict in txDicts:
             transaction = self.processTransaction(txDict, txIndex, block)
             block.addTransaction(transaction)
             txIndex += 1
 
-        return block
+    def getBlockTransactionHashes(self, blockDict, blockData):
+        return self.getIncludedBlockTransactionHashes(blockDict, blockData)
 
     def getBlockTransactions(self, blockDict, blockData):
         if self.supportsGetBlock2():
-            txDicts = blockDict["tx"]
-            result = []
-            for tx in txDicts:
-                if not self.excludeTransaction(tx["txid"], blockData):
-                    result.append(tx)
-            return result
+            return self.getIncludedBlockTransactions(blockDict, blockData)
         else:
-            hashes = []
-            for txHash in blockDict["tx"]:
-                if not self.excludeTransaction(txHash, blockData):
-                    hashes.append(txHash)
+            hashes = self.getBlockTransactionHashes(blockDict, blockData)
             if len(hashes) > 0:
                 return self.bitcoinAccess.bulkCall(("getrawtransaction", [txHash, 1]) for txHash in hashes)
             else:
                 return []
 
+    async def getBlockTransactionsAsync(self, rpc, blockDict, blockData):
+        if self.supportsGetBlock2():
+            return self.getIncludedBlockTransactions(blockDict, blockData)
+        else:
+            hashes = self.getBlockTransactionHashes(blockDict, blockData)
+            if len(hashes) > 0:
+                return await rpc.bulkCall(("getrawtransaction", [txHash, 1]) for txHash in hashes)
+            else:
+                return []
+
+    def getIncludedBlockTransactions(self, blockDict, blockData):
+        result = []
+        for tx in blockDict["tx"]:
+            if not self.excludeTransaction(tx["txid"], blockData):
+                result.append(tx)
+        return result
+
+    def getIncludedBlockTransactionHashes(self, blockDict, blockData):
+        hashes = []
+        for txHash in blockDict["tx"]:
+            if not self.excludeTransaction(txHash, blockData):
+                hashes.append(txHash)
+        return hashes
+
     def initBlock(self, blockDict):
         hashAsNumber = int(blockDict["hash"], base=16)
         assert(hashAsNumber < 10**HASH_PRECISION)
@@ -178,6 +314,9 @@ class BitcoinNodeBase(object):
 
 class BitcoinNode(BitcoinNodeBase):
 
+    def getRawBlockFormat(self):
+        return rawblock.BITCOIN_FORMAT
+
     def excludeTransaction(self, txHash, blockData):
         txHash = int(txHash, base=16)
         if (blockData.blockHeight == 91842 and txHash == 96714513404922958314624647138985365973445136781445592526454084119790809023897) or (blockData.blockHeight == 91880 and txHash == 103012905635419619419213554242971767587813086721766557307841598175607561106536):
@@ -188,6 +327,10 @@ class BitcoinNode(BitcoinNodeBase):
 
 class BitcoinGoldNode(BitcoinNode):
 
+    def getRawBlockFormat(self):
+        # equihash header
+        return None
+
     def processSegwitOutput(self, outputDict, addresses):
         assert len(addresses) <= 1
         if len(addresses) == 0:
@@ -196,11 +339,21 @@ class BitcoinGoldNode(BitcoinNode):
             addresses.append(bech32.encode(prefix, 0, binascii.unhexlify(outputDict["scriptPubKey"]["hex"][4:])))
 
 
+class BitcoinCashNode(BitcoinNode):
+
+    def getRawBlockFormat(self):
+        # node reports cashaddr addresses
+        return None
+
+
 class BitcoinSvNode(BitcoinNode):
 
     def supportsGetBlock2(self):
         return False
 
+    def getRawBlockFormat(self):
+        return rawblock.BITCOIN_SV_FORMAT
+
 
 # joinsplits: 3306, 3308
 # sapling payments: b17707e9daff8c39bba43c3d0986c231d9bb7f8c62dd961d61f79def6fd8b85d 5582ac303b6ecbd2af0c94a6cb6259a237818defceaccfdf961b5eefa79eb5eb
@@ -260,6 +413,9 @@ class DogecoinNode(BitcoinNodeBase):
     def supportsGetBlock2(self):
         return False
 
+    def getRawBlockFormat(self):
+        return rawblock.DOGECOIN_FORMAT
+
     def getBlockMedianTime(self, blockDict):
         # dogecoin node doesn't report median block time
         return datetime(1970, 1, 1)
@@ -281,6 +437,9 @@ class PivxNode(BitcoinNode):
     def supportsGetBlock2(self):
         return False
 
+    def getRawBlockFormat(self):
+        return rawblock.PIVX_FORMAT
+
     def getBlockMedianTime(self, blockDict):
         # PIVX node doesn't report median block time
         return datetime(1970, 1, 1)
@@ -289,11 +448,34 @@ class PivxNode(BitcoinNode):
         data = super(PivxNode, self).initTransaction(txDict, txIndex, blockData)
         return PivxTransactionData(data.txHash, data.txSize, data.txTime, data.txMedianTime, data.coinbase)
 
+    async def getBlockTransactionsAsync(self, rpc, blockDict, blockData):
+        txDicts = await super(PivxNode, self).getBlockTransactionsAsync(rpc, blockDict, blockData)
+        await self.completeRawBlockTransactionsAsync(rpc, txDicts)
+        return txDicts
+
+    def getZerocoinSpendInputs(self, txDicts):
+        return [(txDict, index, inputDict) for txDict in txDicts for index, inputDict in enumerate(txDict["vin"])
+                if "txid" in inputDict and int(inputDict["txid"], base=16) == 0]
+
+    def completeBlockTransactions(self, txDicts):
+        spends = self.getZerocoinSpendInputs(txDicts)
+        if len(spends) > 0:
+            amounts = self.bitcoinAccess.bulkCall(("getspentzerocoinamount", [txDict["txid"], index]) for txDict, index, _ in spends)
+            for (_, _, inputDict), amount in zip(spends, amounts):
+                inputDict["zerocoinamount"] = amount
+
+    async def completeRawBlockTransactionsAsync(self, rpc, txDicts):
+        # zerocoin spend amounts are awaited here, processInput only reads them and never calls the node
+        spends = self.getZerocoinSpendInputs(txDicts)
+        if len(spends) > 0:
+            amounts = await rpc.bulkCall(("getspentzerocoinamount", [txDict["txid"], index]) for txDict, index, _ in spends)
+            for (_, _, inputDict), amount in zip(spends, amounts):
+                inputDict["zerocoinamount"] = amount
+
     def processInput(self, transaction, inputDict, index):
         inputTxHashAsNumber = int(inputDict["txid"], base=16)
         if inputTxHashAsNumber == 0:
-            amount = self.bitcoinAccess.call("getspentzerocoinamount", [transaction.getHashString(), index])
-            transaction.addZerocoinSpend(outputValueToSatoshis(amount))
+            transaction.addZerocoinSpend(outputValueToSatoshis(inputDict["zerocoinamount"]))
         else:
             return super(PivxNode, self).processInput(transaction, inputDict, index)
 
@@ -321,14 +503,18 @@ class VergeNode(BitcoinNodeBase):
     def supportsGetBlock2(self):
         return False
 
+    def getRawBlockFormat(self):
+        return rawblock.VERGE_FORMAT
+
     def getBlockMedianTime(self, blockDict):
         return datetime(1970, 1, 1)
 
 
 class DecredNode(BitcoinNodeBase):
 
-    def __init__(self, host, port, user, password):
-        self.bitcoinAccess = JsonRpcCaller(host, port, user, password, tls=True, tlsVerify=False)
+    def __init__(self, host, port, user, password, rpcPoolSize=1, rawBlocks=False):
+        self.bitcoinAccess = JsonRpcCaller(host, port, user, password, tls=True, tlsVerify=False, poolSize=rpcPoolSize)
+        self.setRawBlocks(rawBlocks)
         self.duplicateTransactions = {
             ("752db9a8fa003bb7fbacad57627001973b6b95500cb0aab0dfe406483467ac10", 83822),
             ("8521fb31190eacd9aaf4b27862ef88e55c6a6de8b66f241733800ddaa0b27e1b", 83912),
@@ -375,13 +561,12 @@ class DecredNode(BitcoinNodeBase):
     def excludeTransaction(self, txHash, blockData):
         return (txHash, blockData.blockHeight) in self.duplicateTransactions or txHash in self.missingInfoTransactions
 
-    def getBlockTransactions(self, blockDict, blockData):
-        baseTxs = super(DecredNode, self).getBlockTransactions(blockDict, blockData)
+    def getBlockTransactionHashes(self, blockDict, blockData):
+        baseHashes = super(DecredNode, self).getBlockTransactionHashes(blockDict, blockData)
         if "stx" in blockDict:
-            stakeTxs = self.bitcoinAccess.bulkCall(("getrawtransaction", [txHash, 1]) for txHash in blockDict["stx"])
-            return baseTxs + stakeTxs
+            return baseHashes + blockDict["stx"]
         else:
-            return baseTxs
+            return baseHashes
 
     def initTransaction(self, txDict, txIndex, blockData):
         data = super(DecredNode, self).initTransaction(txDict, txIndex, blockData)
@@ -411,3 +596,6 @@ class DashNode(BitcoinNodeBase):
 
     def supportsGetBlock2(self):
         return False
+
+    def getRawBlockFormat(self):
+        return rawblock.DASH_FORMAT
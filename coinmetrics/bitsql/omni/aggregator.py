@@ -8,6 +8,7 @@ class OmniManagedPropertyAggregator(DailyAggregator):
         self.addMetric(DailyTxVolumeStatistic(self.dbAccess, self.query))
         self.addMetric(DailyMedianTransactionValueStatistic(self.dbAccess, self.query))
         self.addMetric(DailyActiveAddressesStatistic(self.dbAccess, self.query))
+        self.addActiveAddressesSketchMetrics()
         self.addMetric(DailyRewardStatistic(self.dbAccess, self.query))
 
 
@@ -18,3 +19,4 @@ class OmniCrowdsalePropertyAggregator(DailyAggregator):
         self.addMetric(DailyTxVolumeStatistic(self.dbAccess, self.query))
         self.addMetric(DailyMedianTransactionValueStatistic(self.dbAccess, self.query))
         self.addMetric(DailyActiveAddressesStatistic(self.dbAccess, self.query))
+        self.addActiveAddressesSketchMetrics()
@@ -27,6 +27,17 @@ class OmniExporter(object):
 
         self.dbAccess.commit()
 
+    def pushBlocks(self, blocks):
+        for blockData in blocks:
+            self.pushBlock(blockData)
+
+    def flushIfNeeded(self, moreBlocksReady):
+        pass
+
+    def flush(self):
+        # blocks are committed one by one
+        pass
+
     def insertTransactions(self, txList, tableName, prefix):
         if len(txList) == 0:
             return
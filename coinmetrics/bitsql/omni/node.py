@@ -29,8 +29,8 @@ def omniOutputValueSatoshi(amount):
 
 class OmniNode(object):
 
-    def __init__(self, host, port, user, password):
-        self.omniAccess = JsonRpcCaller(host, port, user, password)
+    def __init__(self, host, port, user, password, rpcPoolSize=1):
+        self.omniAccess = JsonRpcCaller(host, port, user, password, poolSize=rpcPoolSize)
         self.txProcessors = {
             0: self.processSimpleSend,
             3: self.processSendOwners,
@@ -45,6 +45,9 @@ class OmniNode(object):
             56: self.processRevokeTokens,
         }
 
+    def getConnectionStats(self):
+        return self.omniAccess.getConnectionStats()
+
     def getBlockCount(self):
         return self.omniAccess.call("getblockcount")
 
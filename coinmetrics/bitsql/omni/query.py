@@ -1,3 +1,6 @@
+from coinmetrics.bitsql.sketch import HyperLogLog, getHllRegistersQuery
+
+
 class OmniQuery(object):
 
     def __init__(self, dbAccess, schema):
@@ -79,9 +82,8 @@ class PropertyQuery(object):
                 (self.propertyId, minTime, maxTime, self.propertyId, minTime, maxTime, self.propertyId, minTime, maxTime))
         return result[0]    
 
-    def getActiveAddressesCountBetween(self, minTime, maxTime):
-        result = self.dbAccess.queryReturnOne("WITH \
-            addresses AS (\
+    def getActiveAddressesQuery(self):
+        return "\
                 SELECT simple_send_tx_sending_address AS address FROM " + self.schema.getSimpleSendTxTableName() + " \
                     WHERE simple_send_tx_property_id=%s AND simple_send_tx_time >= %s AND simple_send_tx_time < %s \
                 UNION ALL \
@@ -95,13 +97,20 @@ class PropertyQuery(object):
                     WHERE send_all_tx_property_id=%s AND send_all_tx_time >= %s AND send_all_tx_time < %s \
                 UNION ALL \
                 SELECT send_all_tx_receiving_address AS address FROM " + self.schema.getSendAllTxTableName() + "\
-                    WHERE send_all_tx_property_id=%s AND send_all_tx_time >= %s AND send_all_tx_time < %s \
-            ) \
-            SELECT COUNT(DISTINCT address) FROM addresses", 
-                (self.propertyId, minTime, maxTime, self.propertyId, minTime, maxTime, self.propertyId, minTime, maxTime,
-                    self.propertyId, minTime, maxTime, self.propertyId, minTime, maxTime))
+                    WHERE send_all_tx_property_id=%s AND send_all_tx_time >= %s AND send_all_tx_time < %s"
+
+    def getActiveAddressesCountBetween(self, minTime, maxTime):
+        result = self.dbAccess.queryReturnOne("WITH \
+            addresses AS (" + self.getActiveAddressesQuery() + ") \
+            SELECT COUNT(DISTINCT address) FROM addresses", (self.propertyId, minTime, maxTime) * 5)
         return result[0] if result[0] is not None else 0
 
+    def getActiveAddressesSketchBetween(self, minTime, maxTime):
+        sketch = HyperLogLog()
+        sketch.setRanks(self.dbAccess.queryReturnAll(getHllRegistersQuery(self.getActiveAddressesQuery()),
+                                                     (self.propertyId, minTime, maxTime) * 5))
+        return sketch.registers
+
 
 class ManagedPropertyQuery(PropertyQuery):
 
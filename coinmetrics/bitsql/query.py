@@ -1,16 +1,83 @@
+import re
 from datetime import timedelta
 from dateutil.relativedelta import relativedelta
+from coinmetrics.bitsql.bitmap import RoaringBitmap
+from coinmetrics.bitsql.sketch import HyperLogLog, QuantileSketch, getHllRegistersQuery, getQuantileSketchQuery
+
+# column substitution for the optional address ids layout of BitcoinSchema (useAddressIds): output_addresses is
+# replaced with an array of address ids
+ADDRESS_ID_REWRITE = (re.compile(r"\boutput_addresses\b"), "output_address_ids")
+
+
+class LayoutQueryAccess(object):
+    # runs metric queries, which are written against the default layout, on optional layouts by renaming columns in
+    # their text; distinct counts then work on integers instead of strings
+
+    def __init__(self, dbAccess, rewrites):
+        self.dbAccess = dbAccess
+        self.rewrites = rewrites
+
+    def rewrite(self, text):
+        for pattern, replacement in self.rewrites:
+            text = pattern.sub(replacement, text)
+        return text
+
+    def queryReturnOne(self, text, params=None):
+        return self.dbAccess.queryReturnOne(self.rewrite(text), params)
+
+    def queryReturnAll(self, text, params=None):
+        return self.dbAccess.queryReturnAll(self.rewrite(text), params)
+
+    def queryNoReturnCommit(self, text, params=None):
+        self.dbAccess.queryNoReturnCommit(self.rewrite(text), params)
+
+
+class ExplainQueryAccess(object):
+    # collects plans of metric queries instead of running them; every query gets a single zero (or no rows), so that
+    # metrics combining several queries still go through all of them
+
+    def __init__(self, dbAccess):
+        self.dbAccess = dbAccess
+        self.plans = []
+
+    def explain(self, text, params):
+        self.plans.append(self.dbAccess.queryReturnOne("EXPLAIN (FORMAT JSON) " + text, params)[0][0]["Plan"])
+
+    def queryReturnOne(self, text, params=None):
+        self.explain(text, params)
+        return (0,)
+
+    def queryReturnAll(self, text, params=None):
+        self.explain(text, params)
+        return []
+
+    def takeScans(self):
+        # (node type, relation, index) of every scan in the collected plans
+        scans = []
+        plans = self.plans
+        while len(plans) > 0:
+            plan = plans.pop()
+            if "Relation Name" in plan or "Index Name" in plan:
+                scans.append((plan["Node Type"], plan.get("Relation Name"), plan.get("Index Name")))
+            plans.extend(plan.get("Plans", []))
+        return scans
 
 
 class BitcoinQuery(object):
+    # block statistics totals (see BitcoinSchema.useBlockStats) that equal daily metrics of this asset when summed up
+    blockStatsTotals = ["tx_count", "size", "fee_sum", "reward"]
 
     def __init__(self, dbAccess, schema):
-        self.dbAccess = dbAccess
+        rewrites = [ADDRESS_ID_REWRITE] if schema.usesAddressIds() else []
+        self.dbAccess = LayoutQueryAccess(dbAccess, rewrites) if len(rewrites) > 0 else dbAccess
+        # suffix of columns that queries join and group transactions on: BIGINT ids (useTxIds) instead of hashes when
+        # the schema has them; columns returned as results stay hashes
+        self.txJoinColumn = "tx_id" if schema.usesTxIds() else "tx_hash"
         self.schema = schema
         self.asset = schema.getAsset()
         self.blocksTable = schema.getBlocksTableName()
         self.txTable = schema.getTransactionsTableName()
-        self.outputsTable = schema.getOutputsTableName()
+        self.outputsTable = schema.getOutputsQueryTableName()
 
     def getSchema(self):
         return self.schema
@@ -18,10 +85,45 @@ class BitcoinQuery(object):
     def getAsset(self):
         return self.schema.getAsset()
 
+    def materializeDay(self, minDate, maxDate):
+        # copies transactions of the day and outputs created or spent during it into temporary tables and points
+        # queries at them, so that metrics of one day read the large tables once instead of once per metric;
+        # queries keep their time filters, which select the same rows from the copies
+        dayTxTable, dayOutputsTable = self.asset + "_day_transactions", self.asset + "_day_outputs"
+        self.releaseDay()
+        self.dbAccess.queryNoReturnCommit("CREATE TEMPORARY TABLE " + dayTxTable + " AS \
+            SELECT * FROM " + self.txTable + " WHERE (tx_time >= %s AND tx_time < %s)", (minDate, maxDate))
+        self.dbAccess.queryNoReturnCommit("CREATE TEMPORARY TABLE " + dayOutputsTable + " AS \
+            SELECT * FROM " + self.outputsTable + " WHERE \
+                (output_time_created >= %s AND output_time_created < %s) \
+            UNION ALL \
+            SELECT * FROM " + self.outputsTable + " WHERE \
+                (output_time_spent >= %s AND output_time_spent < %s) AND \
+                NOT (output_time_created >= %s AND output_time_created < %s)", (minDate, maxDate) * 3)
+        self.dbAccess.queryNoReturnCommit("ANALYZE " + dayTxTable)
+        self.dbAccess.queryNoReturnCommit("ANALYZE " + dayOutputsTable)
+        self.txTable, self.outputsTable = dayTxTable, dayOutputsTable
+
+    def releaseDay(self):
+        self.dbAccess.queryNoReturnCommit("DROP TABLE IF EXISTS %s_day_transactions, %s_day_outputs" % (self.asset, self.asset))
+        self.txTable = self.schema.getTransactionsTableName()
+        self.outputsTable = self.schema.getOutputsQueryTableName()
+
     def getBlockHeight(self):
         result = self.dbAccess.queryReturnOne("SELECT max(block_height) FROM %s" % self.schema.getBlocksTableName())[0]
         return result
 
+    def getBlockCountBetweenHeights(self, minHeight, maxHeight):
+        result = self.dbAccess.queryReturnOne("SELECT count(*) FROM " + self.blocksTable + \
+            " WHERE block_height >= %s AND block_height <= %s", (minHeight, maxHeight))[0]
+        return result
+
+    def getMissingBlockHeightsBetween(self, minHeight, maxHeight):
+        return [row[0] for row in self.dbAccess.queryReturnAll("\
+            SELECT h FROM generate_series(%s, %s) AS h \
+            WHERE NOT EXISTS (SELECT 1 FROM " + self.blocksTable + " WHERE block_height = h) \
+            ORDER BY h", (minHeight, maxHeight))]
+
     def getBlockTime(self, height):
         result = self.dbAccess.queryReturnOne("SELECT block_time FROM %s WHERE block_height=%d" % (self.schema.getBlocksTableName(), height))
         return result[0]
@@ -95,7 +197,7 @@ class BitcoinQuery(object):
         result = self.dbAccess.queryReturnOne("WITH \
             o AS (\
                 SELECT \
-                    output_tx_hash, \
+                    output_" + self.txJoinColumn + ", \
                     output_index, \
                     output_value_satoshi, \
                     output_addresses \
@@ -103,36 +205,36 @@ class BitcoinQuery(object):
                     (output_time_created >= %s AND output_time_created < %s) AND output_type>1), \
             i AS (\
                 SELECT \
-                    output_spending_tx_hash, \
+                    output_spending_" + self.txJoinColumn + ", \
                     output_index, \
                     output_addresses \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_spent >= %s AND output_time_spent < %s)), \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false) \
             SELECT \
                 sum(o.output_value_satoshi) \
             FROM o JOIN t ON \
-                o.output_tx_hash = t.tx_hash \
+                o.output_" + self.txJoinColumn + " = t." + self.txJoinColumn + " \
             LEFT JOIN (\
                 SELECT \
-                    o.output_tx_hash as change_output_tx_hash, \
+                    o.output_" + self.txJoinColumn + " as change_output_tx, \
                     o.output_index as change_output_index \
                 FROM o JOIN i ON \
-                    (o.output_tx_hash = i.output_spending_tx_hash) AND \
+                    (o.output_" + self.txJoinColumn + " = i.output_spending_" + self.txJoinColumn + ") AND \
                     ((o.output_addresses && i.output_addresses) = true)) change ON \
-                o.output_tx_hash=change.change_output_tx_hash AND o.output_index=change.change_output_index \
-            WHERE change.change_output_tx_hash is NULL", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
+                o.output_" + self.txJoinColumn + "=change.change_output_tx AND o.output_index=change.change_output_index \
+            WHERE change.change_output_tx is NULL", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
         return result[0] if result[0] is not None else 0
 
     def getHeuristicalOutputVolumeBetween(self, minDate, maxDate):
         result = self.dbAccess.queryReturnOne("WITH \
             o AS (\
                 SELECT \
-                    output_tx_hash, \
+                    output_" + self.txJoinColumn + ", \
                     output_index, \
                     output_value_satoshi, \
                     output_addresses \
@@ -143,36 +245,33 @@ class BitcoinQuery(object):
                          (EXTRACT(EPOCH FROM (output_time_spent - output_time_created)) > 2400))), \
             i AS (\
                 SELECT \
-                    output_spending_tx_hash, \
+                    output_spending_" + self.txJoinColumn + ", \
                     output_index, \
                     output_addresses \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_spent >= %s AND output_time_spent < %s)), \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false) \
             SELECT \
                 sum(o.output_value_satoshi) \
             FROM o JOIN t ON \
-                o.output_tx_hash = t.tx_hash \
+                o.output_" + self.txJoinColumn + " = t." + self.txJoinColumn + " \
             LEFT JOIN (\
                 SELECT \
-                    o.output_tx_hash as change_output_tx_hash, \
+                    o.output_" + self.txJoinColumn + " as change_output_tx, \
                     o.output_index as change_output_index \
                 FROM o JOIN i ON \
-                    (o.output_tx_hash = i.output_spending_tx_hash) AND \
+                    (o.output_" + self.txJoinColumn + " = i.output_spending_" + self.txJoinColumn + ") AND \
                     ((o.output_addresses && i.output_addresses) = true)) change ON \
-                o.output_tx_hash=change.change_output_tx_hash AND o.output_index=change.change_output_index \
-            WHERE change.change_output_tx_hash is NULL", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
+                o.output_" + self.txJoinColumn + "=change.change_output_tx AND o.output_index=change.change_output_index \
+            WHERE change.change_output_tx is NULL", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
         return result[0] if result[0] is not None else 0
 
-    def getActiveAddressesCountBetween(self, minDate, maxDate):
-        result = self.dbAccess.queryReturnOne("\
-            SELECT \
-                count(distinct address) \
-            FROM ( \
+    def getActiveAddressesQuery(self):
+        return "\
                 SELECT \
                     unnest(output_addresses) AS address \
                 FROM " + self.outputsTable + " WHERE \
@@ -181,83 +280,107 @@ class BitcoinQuery(object):
                 SELECT \
                     unnest(output_addresses) AS address \
                 FROM " + self.outputsTable + " WHERE \
-                    (output_time_spent >= %s AND output_time_spent < %s)) active_addresses", (minDate, maxDate, minDate, maxDate))
+                    (output_time_spent >= %s AND output_time_spent < %s)"
+
+    def getActiveAddressesCountBetween(self, minDate, maxDate):
+        result = self.dbAccess.queryReturnOne("\
+            SELECT \
+                count(distinct address) \
+            FROM ( " + self.getActiveAddressesQuery() + ") active_addresses", (minDate, maxDate, minDate, maxDate))
         return result[0]
 
+    def getActiveAddressesSketchBetween(self, minDate, maxDate):
+        sketch = HyperLogLog()
+        sketch.setRanks(self.dbAccess.queryReturnAll(getHllRegistersQuery(self.getActiveAddressesQuery()),
+                                                     (minDate, maxDate, minDate, maxDate)))
+        return sketch.registers
+
+    def getActiveAddressIdsBetween(self, minDate, maxDate):
+        # serialized RoaringBitmap of ids of active addresses; requires address ids (BitcoinSchema.useAddressIds),
+        # with which the active addresses query returns ids
+        rows = self.dbAccess.queryReturnAll("\
+            SELECT \
+                address >> 16, \
+                array_agg(DISTINCT address & 65535 ORDER BY address & 65535) \
+            FROM (" + self.getActiveAddressesQuery() + ") active_addresses \
+            GROUP BY 1", (minDate, maxDate, minDate, maxDate))
+        return RoaringBitmap.fromContainers(dict(rows)).serialize()
+
     def getFeesVolumeBetween(self, minDate, maxDate):
         result = self.dbAccess.queryReturnOne("WITH \
             o AS (\
                 SELECT \
-                    output_tx_hash, \
+                    output_" + self.txJoinColumn + ", \
                     output_value_satoshi \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_created >= %s AND output_time_created < %s)), \
             i AS (\
                 SELECT \
-                    output_spending_tx_hash, \
+                    output_spending_" + self.txJoinColumn + ", \
                     output_value_satoshi \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_spent >= %s AND output_time_spent < %s)), \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false), \
-            volume_o AS (SELECT sum(o.output_value_satoshi) v FROM o JOIN t ON t.tx_hash=o.output_tx_hash), \
-            volume_i AS (SELECT sum(i.output_value_satoshi) v FROM i JOIN t ON t.tx_hash=i.output_spending_tx_hash) \
+            volume_o AS (SELECT sum(o.output_value_satoshi) v FROM o JOIN t ON t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + "), \
+            volume_i AS (SELECT sum(i.output_value_satoshi) v FROM i JOIN t ON t." + self.txJoinColumn + "=i.output_spending_" + self.txJoinColumn + ") \
             SELECT \
                 coalesce(volume_i.v, 0) - coalesce(volume_o.v, 0) \
             FROM \
                 volume_o CROSS JOIN volume_i", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
         return result[0]
 
-    def getMedianFeeBetween(self, minDate, maxDate):
-        result = self.dbAccess.queryReturnOne("WITH \
+    def getTxFeesQuery(self, minDate, maxDate):
+        # query of the fee of every non-coinbase transaction of the range and its parameters; getTxValuesQuery gives
+        # transaction values without change outputs
+        return "WITH \
             o AS (\
                 SELECT \
-                    output_tx_hash, \
+                    output_" + self.txJoinColumn + ", \
                     output_value_satoshi \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_created >= %s AND output_time_created < %s)), \
             i AS (\
                 SELECT \
-                    output_spending_tx_hash, \
+                    output_spending_" + self.txJoinColumn + ", \
                     output_value_satoshi \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_spent >= %s AND output_time_spent < %s)), \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false), \
             so AS (\
                 SELECT \
                     coalesce(sum(o.output_value_satoshi), 0) as sum_outputs, \
-                    t.tx_hash \
+                    t." + self.txJoinColumn + " \
                 FROM t JOIN o ON \
-                    t.tx_hash=o.output_tx_hash \
-                GROUP BY t.tx_hash), \
+                    t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + "), \
             si AS (\
                 SELECT \
                     coalesce(sum(i.output_value_satoshi), 0) as sum_inputs, \
-                    t.tx_hash \
+                    t." + self.txJoinColumn + " \
                 FROM t JOIN i ON \
-                    t.tx_hash=i.output_spending_tx_hash \
-                GROUP BY t.tx_hash), \
+                    t." + self.txJoinColumn + "=i.output_spending_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + "), \
             fees AS (\
                 SELECT \
                     coalesce(si.sum_inputs, 0) - coalesce(so.sum_outputs, 0) as fee, \
-                    si.tx_hash as hash \
+                    si." + self.txJoinColumn + " as hash \
                 FROM si FULL OUTER JOIN so ON \
-                    si.tx_hash=so.tx_hash) \
-            SELECT percentile_cont(0.5) WITHIN GROUP (ORDER BY fee) FROM fees", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
-        return result[0]
+                    si." + self.txJoinColumn + "=so." + self.txJoinColumn + ") \
+            SELECT fee FROM fees", (minDate, maxDate, minDate, maxDate, minDate, maxDate)
 
-    def getMedianTransactionValueBetween(self, minDate, maxDate):
-        result = self.dbAccess.queryReturnOne("WITH \
+    def getTxValuesQuery(self, minDate, maxDate):
+        return "WITH \
             o AS (\
                 SELECT \
-                    output_tx_hash, \
+                    output_" + self.txJoinColumn + ", \
                     output_index, \
                     output_value_satoshi, \
                     output_addresses \
@@ -265,54 +388,92 @@ class BitcoinQuery(object):
                     (output_time_created >= %s AND output_time_created < %s)), \
             i AS (\
                 SELECT \
-                    output_spending_tx_hash, \
+                    output_spending_" + self.txJoinColumn + ", \
                     output_index, \
                     output_addresses \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_spent >= %s AND output_time_spent < %s)), \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false), \
             so AS (\
                 SELECT \
                     sum(o.output_value_satoshi) as sum_outputs \
                 FROM t JOIN o ON \
-                    t.tx_hash=o.output_tx_hash \
+                    t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + " \
                 LEFT JOIN (\
                     SELECT \
-                        o.output_tx_hash as change_output_tx_hash, \
+                        o.output_" + self.txJoinColumn + " as change_output_tx, \
                         o.output_index as change_output_index \
                     FROM o JOIN i ON \
-                        (o.output_tx_hash = i.output_spending_tx_hash) AND \
+                        (o.output_" + self.txJoinColumn + " = i.output_spending_" + self.txJoinColumn + ") AND \
                         ((o.output_addresses && i.output_addresses) = true)) change ON \
-                    o.output_tx_hash=change.change_output_tx_hash AND o.output_index=change.change_output_index \
-                WHERE change.change_output_tx_hash is NULL \
-                GROUP BY t.tx_hash) \
-            SELECT percentile_cont(0.5) WITHIN GROUP (ORDER BY sum_outputs) FROM so", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
+                    o.output_" + self.txJoinColumn + "=change.change_output_tx AND o.output_index=change.change_output_index \
+                WHERE change.change_output_tx is NULL \
+                GROUP BY t." + self.txJoinColumn + ") \
+            SELECT sum_outputs FROM so", (minDate, maxDate, minDate, maxDate, minDate, maxDate)
+
+    def getMedianFeeBetween(self, minDate, maxDate):
+        return self.getMedianBetween(*self.getTxFeesQuery(minDate, maxDate))
+
+    def getMedianTransactionValueBetween(self, minDate, maxDate):
+        return self.getMedianBetween(*self.getTxValuesQuery(minDate, maxDate))
+
+    def getMedianBetween(self, valuesQuery, params):
+        result = self.dbAccess.queryReturnOne("\
+            SELECT percentile_cont(0.5) WITHIN GROUP (ORDER BY value) FROM (" + valuesQuery + ") tx_values (value)", params)
         return result[0]
 
+    def getFeeSketchBetween(self, minDate, maxDate):
+        # fee sketches of blocks written by the exporter are merged when they cover the range and their fees are
+        # computed like the asset's fee_sum, otherwise the day's fees are bucketed in the database
+        if "fee_sum" in self.blockStatsTotals and self.getBlockStatsTotalsBetween(minDate, maxDate) is not None:
+            rows = self.dbAccess.queryReturnAll("\
+                SELECT \
+                    bucket_key, \
+                    sum(bucket_count) \
+                FROM " + self.schema.getBlockStatsTableName() + ", \
+                    unnest(block_stats_fee_sketch_keys, block_stats_fee_sketch_counts) AS buckets (bucket_key, bucket_count) \
+                WHERE \
+                    block_stats_time >= %s AND block_stats_time < %s \
+                GROUP BY bucket_key", (minDate, maxDate))
+        else:
+            valuesQuery, params = self.getTxFeesQuery(minDate, maxDate)
+            rows = self.dbAccess.queryReturnAll(getQuantileSketchQuery(valuesQuery), params)
+        sketch = QuantileSketch()
+        sketch.addBuckets([row[0] for row in rows], [row[1] for row in rows])
+        return sketch
+
+    def getTxValueSketchBetween(self, minDate, maxDate):
+        # block statistics have sums of all outputs, so values without change are always bucketed in the database
+        valuesQuery, params = self.getTxValuesQuery(minDate, maxDate)
+        rows = self.dbAccess.queryReturnAll(getQuantileSketchQuery(valuesQuery), params)
+        sketch = QuantileSketch()
+        sketch.addBuckets([row[0] for row in rows], [row[1] for row in rows])
+        return sketch
+
     def getPaymentCountBetween(self, minDate, maxDate):
         result = self.dbAccess.queryReturnOne("WITH \
             o AS (\
                 SELECT \
-                    output_tx_hash, \
+                    output_" + self.txJoinColumn + ", \
                     output_value_satoshi \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_created >= %s AND output_time_created < %s) AND output_type>1), \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false), \
             so AS (\
                 SELECT \
                     GREATEST(count(*) - 1, 0) as payments, \
-                    t.tx_hash \
+                    t." + self.txJoinColumn + " \
                 FROM t JOIN o ON \
-                    t.tx_hash=o.output_tx_hash \
-                GROUP BY t.tx_hash) \
+                    t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + ") \
             SELECT sum(payments) FROM so", (minDate, maxDate, minDate, maxDate))
         return result[0] if result[0] is not None else 0
 
@@ -320,18 +481,298 @@ class BitcoinQuery(object):
         result = self.dbAccess.queryReturnOne("WITH \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     tx_coinbase=true AND (tx_time >= %s AND tx_time < %s)), \
             o AS (\
                 SELECT \
                     output_value_satoshi, \
-                    output_tx_hash \
+                    output_" + self.txJoinColumn + " \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_created >= %s AND output_time_created < %s)) \
-            SELECT sum(o.output_value_satoshi) FROM t JOIN o ON t.tx_hash=o.output_tx_hash", (minDate, maxDate, minDate, maxDate))
+            SELECT sum(o.output_value_satoshi) FROM t JOIN o ON t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn, (minDate, maxDate, minDate, maxDate))
         return result[0] if result[0] is not None else 0
 
+    # range variants of the daily queries: one statement returns (day, value) rows for every day in [minDate, maxDate)
+    # that has data. Every row of a query belongs to the day of its transaction (outputs are created and spent at
+    # the time of the transaction creating / spending them), so grouping by that day gives the per-day results.
+    # Subclasses that adjust a daily query set its range variant to None.
+
+    def getDailyAverageDifficultyBetween(self, minDate, maxDate):
+        return self.dbAccess.queryReturnAll("\
+            SELECT \
+                date_trunc('day', block_time), AVG(block_difficulty) \
+            FROM " + self.blocksTable + " WHERE \
+                block_time >= %s AND block_time < %s \
+            GROUP BY 1", (minDate, maxDate))
+
+    def getDailyBlockSizeBetween(self, minDate, maxDate):
+        return self.dbAccess.queryReturnAll("\
+            SELECT \
+                date_trunc('day', block_time), SUM(block_size) \
+            FROM " + self.blocksTable + " WHERE \
+                block_time >= %s AND block_time < %s \
+            GROUP BY 1", (minDate, maxDate))
+
+    def getDailyBlockCountBetween(self, minDate, maxDate):
+        return self.dbAccess.queryReturnAll("\
+            SELECT \
+                date_trunc('day', block_time), COUNT(*) \
+            FROM " + self.blocksTable + " WHERE \
+                block_time >= %s AND block_time < %s \
+            GROUP BY 1", (minDate, maxDate))
+
+    def getDailyTxCountBetween(self, minDate, maxDate):
+        return self.dbAccess.queryReturnAll("\
+            SELECT \
+                date_trunc('day', tx_time), COUNT(*) \
+            FROM " + self.txTable + " WHERE \
+                tx_coinbase=false AND (tx_time >= %s AND tx_time < %s) \
+            GROUP BY 1", (minDate, maxDate))
+
+    def getDailyOutputVolumeBetween(self, minDate, maxDate):
+        return self.getDailyChangelessVolumeBetween(minDate, maxDate, "")
+
+    def getDailyHeuristicalOutputVolumeBetween(self, minDate, maxDate):
+        return self.getDailyChangelessVolumeBetween(minDate, maxDate, " \
+            AND ((output_time_spent is NULL) OR \
+                 (EXTRACT(EPOCH FROM (output_time_spent - output_time_created)) > 2400))")
+
+    def getDailyChangelessVolumeBetween(self, minDate, maxDate, outputCondition):
+        return self.dbAccess.queryReturnAll("WITH \
+            o AS (\
+                SELECT \
+                    output_" + self.txJoinColumn + ", \
+                    output_index, \
+                    output_value_satoshi, \
+                    output_addresses, \
+                    date_trunc('day', output_time_created) AS day \
+                FROM " + self.outputsTable + " WHERE \
+                    (output_time_created >= %s AND output_time_created < %s) \
+                    AND output_type>1" + outputCondition + "), \
+            i AS (\
+                SELECT \
+                    output_spending_" + self.txJoinColumn + ", \
+                    output_index, \
+                    output_addresses \
+                FROM " + self.outputsTable + " WHERE \
+                    (output_time_spent >= %s AND output_time_spent < %s)), \
+            t AS (\
+                SELECT \
+                    " + self.txJoinColumn + " \
+                FROM " + self.txTable + " WHERE \
+                    (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false) \
+            SELECT \
+                o.day, sum(o.output_value_satoshi) \
+            FROM o JOIN t ON \
+                o.output_" + self.txJoinColumn + " = t." + self.txJoinColumn + " \
+            LEFT JOIN (\
+                SELECT \
+                    o.output_" + self.txJoinColumn + " as change_output_tx, \
+                    o.output_index as change_output_index \
+                FROM o JOIN i ON \
+                    (o.output_" + self.txJoinColumn + " = i.output_spending_" + self.txJoinColumn + ") AND \
+                    ((o.output_addresses && i.output_addresses) = true)) change ON \
+                o.output_" + self.txJoinColumn + "=change.change_output_tx AND o.output_index=change.change_output_index \
+            WHERE change.change_output_tx is NULL \
+            GROUP BY o.day", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
+
+    def getDailyActiveAddressesCountBetween(self, minDate, maxDate):
+        return self.dbAccess.queryReturnAll("\
+            SELECT \
+                day, count(distinct address) \
+            FROM ( \
+                SELECT \
+                    date_trunc('day', output_time_created) AS day, \
+                    unnest(output_addresses) AS address \
+                FROM " + self.outputsTable + " WHERE \
+                    (output_time_created >= %s AND output_time_created < %s) \
+                UNION ALL \
+                SELECT \
+                    date_trunc('day', output_time_spent) AS day, \
+                    unnest(output_addresses) AS address \
+                FROM " + self.outputsTable + " WHERE \
+                    (output_time_spent >= %s AND output_time_spent < %s)) active_addresses \
+            GROUP BY day", (minDate, maxDate, minDate, maxDate))
+
+    def getDailyFeesVolumeBetween(self, minDate, maxDate):
+        return self.dbAccess.queryReturnAll("WITH \
+            o AS (\
+                SELECT \
+                    output_" + self.txJoinColumn + ", \
+                    output_value_satoshi \
+                FROM " + self.outputsTable + " WHERE \
+                    (output_time_created >= %s AND output_time_created < %s)), \
+            i AS (\
+                SELECT \
+                    output_spending_" + self.txJoinColumn + ", \
+                    output_value_satoshi \
+                FROM " + self.outputsTable + " WHERE \
+                    (output_time_spent >= %s AND output_time_spent < %s)), \
+            t AS (\
+                SELECT \
+                    " + self.txJoinColumn + ", \
+                    date_trunc('day', tx_time) AS day \
+                FROM " + self.txTable + " WHERE \
+                    (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false), \
+            volume_o AS (SELECT t.day, sum(o.output_value_satoshi) v FROM o JOIN t ON t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + " GROUP BY t.day), \
+            volume_i AS (SELECT t.day, sum(i.output_value_satoshi) v FROM i JOIN t ON t." + self.txJoinColumn + "=i.output_spending_" + self.txJoinColumn + " GROUP BY t.day) \
+            SELECT \
+                coalesce(volume_i.day, volume_o.day), coalesce(volume_i.v, 0) - coalesce(volume_o.v, 0) \
+            FROM \
+                volume_o FULL OUTER JOIN volume_i ON volume_o.day = volume_i.day", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
+
+    def getDailyMedianFeeBetween(self, minDate, maxDate):
+        return self.dbAccess.queryReturnAll("WITH \
+            o AS (\
+                SELECT \
+                    output_" + self.txJoinColumn + ", \
+                    output_value_satoshi \
+                FROM " + self.outputsTable + " WHERE \
+                    (output_time_created >= %s AND output_time_created < %s)), \
+            i AS (\
+                SELECT \
+                    output_spending_" + self.txJoinColumn + ", \
+                    output_value_satoshi \
+                FROM " + self.outputsTable + " WHERE \
+                    (output_time_spent >= %s AND output_time_spent < %s)), \
+            t AS (\
+                SELECT \
+                    " + self.txJoinColumn + ", \
+                    date_trunc('day', tx_time) AS day \
+                FROM " + self.txTable + " WHERE \
+                    (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false), \
+            so AS (\
+                SELECT \
+                    coalesce(sum(o.output_value_satoshi), 0) as sum_outputs, \
+                    t." + self.txJoinColumn + ", \
+                    t.day \
+                FROM t JOIN o ON \
+                    t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + ", t.day), \
+            si AS (\
+                SELECT \
+                    coalesce(sum(i.output_value_satoshi), 0) as sum_inputs, \
+                    t." + self.txJoinColumn + ", \
+                    t.day \
+                FROM t JOIN i ON \
+                    t." + self.txJoinColumn + "=i.output_spending_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + ", t.day), \
+            fees AS (\
+                SELECT \
+                    coalesce(si.sum_inputs, 0) - coalesce(so.sum_outputs, 0) as fee, \
+                    coalesce(si.day, so.day) as day \
+                FROM si FULL OUTER JOIN so ON \
+                    si." + self.txJoinColumn + "=so." + self.txJoinColumn + ") \
+            SELECT day, percentile_cont(0.5) WITHIN GROUP (ORDER BY fee) FROM fees GROUP BY day", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
+
+    def getDailyMedianTransactionValueBetween(self, minDate, maxDate):
+        return self.dbAccess.queryReturnAll("WITH \
+            o AS (\
+                SELECT \
+                    output_" + self.txJoinColumn + ", \
+                    output_index, \
+                    output_value_satoshi, \
+                    output_addresses \
+                FROM " + self.outputsTable + " WHERE \
+                    (output_time_created >= %s AND output_time_created < %s)), \
+            i AS (\
+                SELECT \
+                    output_spending_" + self.txJoinColumn + ", \
+                    output_index, \
+                    output_addresses \
+                FROM " + self.outputsTable + " WHERE \
+                    (output_time_spent >= %s AND output_time_spent < %s)), \
+            t AS (\
+                SELECT \
+                    " + self.txJoinColumn + ", \
+                    date_trunc('day', tx_time) AS day \
+                FROM " + self.txTable + " WHERE \
+                    (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false), \
+            so AS (\
+                SELECT \
+                    sum(o.output_value_satoshi) as sum_outputs, \
+                    t.day \
+                FROM t JOIN o ON \
+                    t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + " \
+                LEFT JOIN (\
+                    SELECT \
+                        o.output_" + self.txJoinColumn + " as change_output_tx, \
+                        o.output_index as change_output_index \
+                    FROM o JOIN i ON \
+                        (o.output_" + self.txJoinColumn + " = i.output_spending_" + self.txJoinColumn + ") AND \
+                        ((o.output_addresses && i.output_addresses) = true)) change ON \
+                    o.output_" + self.txJoinColumn + "=change.change_output_tx AND o.output_index=change.change_output_index \
+                WHERE change.change_output_tx is NULL \
+                GROUP BY t." + self.txJoinColumn + ", t.day) \
+            SELECT day, percentile_cont(0.5) WITHIN GROUP (ORDER BY sum_outputs) FROM so GROUP BY day", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
+
+    def getDailyPaymentCountBetween(self, minDate, maxDate):
+        return self.dbAccess.queryReturnAll("WITH \
+            o AS (\
+                SELECT \
+                    output_" + self.txJoinColumn + ", \
+                    output_value_satoshi \
+                FROM " + self.outputsTable + " WHERE \
+                    (output_time_created >= %s AND output_time_created < %s) AND output_type>1), \
+            t AS (\
+                SELECT \
+                    " + self.txJoinColumn + ", \
+                    date_trunc('day', tx_time) AS day \
+                FROM " + self.txTable + " WHERE \
+                    (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false), \
+            so AS (\
+                SELECT \
+                    GREATEST(count(*) - 1, 0) as payments, \
+                    t.day \
+                FROM t JOIN o ON \
+                    t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + ", t.day) \
+            SELECT day, sum(payments) FROM so GROUP BY day", (minDate, maxDate, minDate, maxDate))
+
+    def getDailyRewardBetween(self, minDate, maxDate):
+        return self.dbAccess.queryReturnAll("WITH \
+            t AS (\
+                SELECT \
+                    " + self.txJoinColumn + ", \
+                    date_trunc('day', tx_time) AS day \
+                FROM " + self.txTable + " WHERE \
+                    tx_coinbase=true AND (tx_time >= %s AND tx_time < %s)), \
+            o AS (\
+                SELECT \
+                    output_value_satoshi, \
+                    output_" + self.txJoinColumn + " \
+                FROM " + self.outputsTable + " WHERE \
+                    (output_time_created >= %s AND output_time_created < %s)) \
+            SELECT t.day, sum(o.output_value_satoshi) FROM t JOIN o ON t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + " GROUP BY t.day", (minDate, maxDate, minDate, maxDate))
+
+    def getBlockStatsTotalsBetween(self, minDate, maxDate):
+        # sums of block statistics written by the exporter, None unless every block of the range has its row
+        if not self.schema.usesBlockStats():
+            return None
+        result = self.dbAccess.queryReturnOne("WITH \
+            b AS (\
+                SELECT \
+                    count(*) AS block_count \
+                FROM " + self.blocksTable + " WHERE \
+                    block_time >= %s AND block_time < %s), \
+            s AS (\
+                SELECT \
+                    count(*) AS block_count, \
+                    sum(block_stats_tx_count) AS tx_count, \
+                    sum(block_stats_size) AS size, \
+                    sum(block_stats_output_sum) AS output_sum, \
+                    sum(block_stats_fee_sum) AS fee_sum, \
+                    sum(block_stats_reward) AS reward \
+                FROM " + self.schema.getBlockStatsTableName() + " WHERE \
+                    block_stats_time >= %s AND block_stats_time < %s) \
+            SELECT \
+                b.block_count, s.block_count, s.tx_count, s.size, s.output_sum, s.fee_sum, s.reward \
+            FROM b CROSS JOIN s", (minDate, maxDate, minDate, maxDate))
+        if result[0] == 0 or result[0] != result[1]:
+            return None
+        return dict(zip(["tx_count", "size", "output_sum", "fee_sum", "reward"], result[2:]))
+
     def getTotalSupplyBetween(self, minDate, maxDate):
         previousValue = self.dbAccess.queryReturnOne("""
             SELECT
@@ -349,6 +790,66 @@ class BitcoinQuery(object):
         todayFees = self.getFeesVolumeBetween(minDate, maxDate)
         return previousValue + todayReward - todayFees
 
+    def getLatestStatisticValueBefore(self, statisticName, date):
+        # range queries don't return days without blocks or outputs, supply doesn't change on them
+        result = self.dbAccess.queryReturnOne("""
+            SELECT
+                value
+            FROM
+                statistic_{statisticName}_{asset}
+            WHERE
+                date < %s
+            ORDER BY date DESC
+            LIMIT 1
+        """.format(
+            statisticName=statisticName,
+            asset=self.asset
+        ), (date,))
+        return result[0] if result is not None else 0
+
+    def getDailyTotalSupplyBetween(self, minDate, maxDate):
+        # reward minus fees of a day is the value of outputs created minus the value of outputs spent by its
+        # transactions; running totals of these deltas continue from the last saved value
+        return self.dbAccess.queryReturnAll("""
+            WITH
+            t AS (
+                SELECT
+                    {txJoinColumn},
+                    date_trunc('day', tx_time) AS day
+                FROM
+                    {transactions}
+                WHERE
+                    (tx_time >= %s AND tx_time < %s)),
+            o AS (
+                SELECT
+                    output_{txJoinColumn},
+                    output_value_satoshi
+                FROM
+                    {outputs}
+                WHERE
+                    (output_time_created >= %s AND output_time_created < %s)),
+            i AS (
+                SELECT
+                    output_spending_{txJoinColumn},
+                    output_value_satoshi
+                FROM
+                    {outputs}
+                WHERE
+                    (output_time_spent >= %s AND output_time_spent < %s)),
+            deltas AS (
+                SELECT t.day, sum(o.output_value_satoshi) AS delta FROM t JOIN o ON t.{txJoinColumn}=o.output_{txJoinColumn} GROUP BY t.day
+                UNION ALL
+                SELECT t.day, -sum(i.output_value_satoshi) AS delta FROM t JOIN i ON t.{txJoinColumn}=i.output_spending_{txJoinColumn} GROUP BY t.day),
+            days AS (
+                SELECT day, sum(delta) AS delta FROM deltas GROUP BY day)
+            SELECT
+                day, %s + sum(delta) OVER (ORDER BY day)
+            FROM
+                days
+        """.format(
+            outputs=self.outputsTable, transactions=self.txTable, txJoinColumn=self.txJoinColumn,
+        ), (minDate, maxDate) * 3 + (self.getLatestStatisticValueBefore("total_supply", minDate),))
+
     def get30DNaiveCirculatingSupplyBetween(self, _, maxDate):
         delta = timedelta(days=30)
 
@@ -360,7 +861,7 @@ class BitcoinQuery(object):
             JOIN
                 {transactions}
             ON
-                output_tx_hash = tx_hash
+                output_{txJoinColumn} = {txJoinColumn}
             WHERE
                 tx_coinbase IS FALSE
             AND
@@ -368,7 +869,7 @@ class BitcoinQuery(object):
             AND
                 ((output_time_created >= %s) AND (output_time_created < %s))
         """.format(
-            outputs=self.outputsTable, transactions=self.txTable,
+            outputs=self.outputsTable, transactions=self.txTable, txJoinColumn=self.txJoinColumn,
         ), (maxDate, maxDate - delta, maxDate,))
         return result[0]
 
@@ -400,7 +901,7 @@ class BitcoinQuery(object):
             JOIN
                 {transactions}
             ON
-                output_tx_hash = tx_hash
+                output_{txJoinColumn} = {txJoinColumn}
             WHERE
                 tx_coinbase IS FALSE
             AND
@@ -408,7 +909,7 @@ class BitcoinQuery(object):
             AND
                 (output_time_spent >= %s AND output_time_spent < %s)
         """.format(
-            outputs=self.outputsTable, transactions=self.txTable,
+            outputs=self.outputsTable, transactions=self.txTable, txJoinColumn=self.txJoinColumn,
         ), (minDate - delta, minDate, minDate, maxDate))
         spentValue = spentValue[0] if spentValue is not None else 0
 
@@ -420,7 +921,7 @@ class BitcoinQuery(object):
             JOIN
                 {transactions}
             ON
-                output_tx_hash = tx_hash
+                output_{txJoinColumn} = {txJoinColumn}
             WHERE
                 tx_coinbase IS FALSE
             AND
@@ -428,7 +929,7 @@ class BitcoinQuery(object):
             AND
                 (output_time_spent IS NULL OR output_time_spent >= %s)
         """.format(
-            outputs=self.outputsTable, transactions=self.txTable,
+            outputs=self.outputsTable, transactions=self.txTable, txJoinColumn=self.txJoinColumn,
         ), (minDate - delta, maxDate - delta, maxDate))
         maturedValue = maturedValue[0] if maturedValue is not None else 0
 
@@ -440,7 +941,7 @@ class BitcoinQuery(object):
             JOIN
                 {transactions}
             ON
-                output_tx_hash = tx_hash
+                output_{txJoinColumn} = {txJoinColumn}
             WHERE
                 tx_coinbase IS FALSE
             AND
@@ -448,12 +949,96 @@ class BitcoinQuery(object):
             AND
                 ((output_time_spent is NULL) OR (output_time_spent >= %s))
         """.format(
-            outputs=self.outputsTable, transactions=self.txTable,
+            outputs=self.outputsTable, transactions=self.txTable, txJoinColumn=self.txJoinColumn,
         ), (minDate, maxDate, maxDate))
         createdValue = createdValue[0] if createdValue is not None else 0
 
         return previousValue - spentValue - maturedValue + createdValue
 
+    def _getDailyCirculatingSupplyBetween(self, minDate, maxDate, delta, deltaString):
+        # the three terms of _getCirculatingSupplyBetween grouped by the day they apply to, summed up into running
+        # totals that continue from the last saved value
+        return self.dbAccess.queryReturnAll("""
+            WITH
+            spent AS (
+                SELECT
+                    date_trunc('day', output_time_spent) AS day,
+                    -SUM(output_value_satoshi) AS delta
+                FROM
+                    {outputs}
+                JOIN
+                    {transactions}
+                ON
+                    output_{txJoinColumn} = {txJoinColumn}
+                WHERE
+                    tx_coinbase IS FALSE
+                AND
+                    (output_time_created >= %s AND output_time_created < %s)
+                AND
+                    (output_time_spent >= %s AND output_time_spent < %s)
+                AND
+                    output_time_created >= date_trunc('day', output_time_spent) - %s
+                AND
+                    output_time_created < date_trunc('day', output_time_spent)
+                GROUP BY 1),
+            matured AS (
+                SELECT
+                    date_trunc('day', output_time_created) + %s AS day,
+                    -SUM(output_value_satoshi) AS delta
+                FROM
+                    {outputs}
+                JOIN
+                    {transactions}
+                ON
+                    output_{txJoinColumn} = {txJoinColumn}
+                WHERE
+                    tx_coinbase IS FALSE
+                AND
+                    (output_time_created >= %s AND output_time_created < %s)
+                AND
+                    (output_time_spent IS NULL OR output_time_spent >= date_trunc('day', output_time_created) + %s + INTERVAL '1 day')
+                GROUP BY 1),
+            created AS (
+                SELECT
+                    date_trunc('day', output_time_created) AS day,
+                    SUM(output_value_satoshi) AS delta
+                FROM
+                    {outputs}
+                JOIN
+                    {transactions}
+                ON
+                    output_{txJoinColumn} = {txJoinColumn}
+                WHERE
+                    tx_coinbase IS FALSE
+                AND
+                    (output_time_created >= %s AND output_time_created < %s)
+                AND
+                    (output_time_spent IS NULL OR output_time_spent >= date_trunc('day', output_time_created) + INTERVAL '1 day')
+                GROUP BY 1),
+            days AS (
+                SELECT day, sum(delta) AS delta FROM (
+                    SELECT * FROM spent UNION ALL SELECT * FROM matured UNION ALL SELECT * FROM created) deltas
+                GROUP BY day)
+            SELECT
+                day, %s + sum(delta) OVER (ORDER BY day)
+            FROM
+                days
+        """.format(
+            outputs=self.outputsTable, transactions=self.txTable, txJoinColumn=self.txJoinColumn,
+        ), (minDate - delta, maxDate, minDate, maxDate, delta,
+            delta, minDate - delta, maxDate - delta, delta,
+            minDate, maxDate,
+            self.getLatestStatisticValueBefore(deltaString + "_circulating_supply", minDate)))
+
+    def getDaily1YCirculatingSupplyBetween(self, minDate, maxDate):
+        return self._getDailyCirculatingSupplyBetween(minDate, maxDate, timedelta(days=365), "1y")
+
+    def getDaily180DCirculatingSupplyBetween(self, minDate, maxDate):
+        return self._getDailyCirculatingSupplyBetween(minDate, maxDate, timedelta(days=180), "180d")
+
+    def getDaily30DCirculatingSupplyBetween(self, minDate, maxDate):
+        return self._getDailyCirculatingSupplyBetween(minDate, maxDate, timedelta(days=30), "30d")
+
     def get1YCirculatingSupplyBetween(self, minDate, maxDate):
         return self._getCirculatingSupplyBetween(minDate, maxDate, timedelta(days=365), "1y")
 
@@ -468,7 +1053,16 @@ class BitcoinQuery(object):
 
 
 class ZcashQuery(BitcoinQuery):
-    
+    blockStatsTotals = ["tx_count", "size", "reward"]
+    # shielded values are added to these daily queries, there are no range variants for them
+    getDailyFeesVolumeBetween = None
+    getDailyOutputVolumeBetween = None
+    getDailyHeuristicalOutputVolumeBetween = None
+    getDailyMedianFeeBetween = None
+    getDailyMedianTransactionValueBetween = None
+    getDailyPaymentCountBetween = None
+    getDailyTotalSupplyBetween = None
+
     def __init__(self, dbAccess, schema):
         super(ZcashQuery, self).__init__(dbAccess, schema)
         self.joinSplitsTable = self.schema.getJoinSplitsTableName()
@@ -524,90 +1118,89 @@ class ZcashQuery(BitcoinQuery):
                 (sapling_payment_time >= %s AND sapling_payment_time < %s)", (minDate, maxDate))
         return result[0] if result[0] is not None else 0
 
-    def getMedianFeeBetween(self, minDate, maxDate):
-        result = self.dbAccess.queryReturnOne("WITH \
+    def getTxFeesQuery(self, minDate, maxDate):
+        return "WITH \
             joinsplit AS (\
                 SELECT \
                     joinsplit_value_new - joinsplit_value_old as value, \
-                    joinsplit_tx_hash \
+                    joinsplit_" + self.txJoinColumn + " \
                 FROM " + self.joinSplitsTable  + " WHERE \
                     (joinsplit_time >= %s AND joinsplit_time < %s)), \
             sapling_payment AS (\
                 SELECT \
                     sapling_payment_value_balance as value, \
-                    sapling_payment_tx_hash \
+                    sapling_payment_" + self.txJoinColumn + " \
                 FROM " + self.saplingPaymentTable + " WHERE \
                     (sapling_payment_time >= %s AND sapling_payment_time < %s)), \
             o AS (\
                 SELECT \
-                    output_tx_hash, \
+                    output_" + self.txJoinColumn + ", \
                     output_value_satoshi \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_created >= %s AND output_time_created < %s)), \
             i AS (\
                 SELECT \
-                    output_spending_tx_hash, \
+                    output_spending_" + self.txJoinColumn + ", \
                     output_value_satoshi \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_spent >= %s AND output_time_spent < %s)), \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false), \
             so AS (\
                 SELECT \
                     -coalesce(sum(o.output_value_satoshi), 0) as sum, \
-                    t.tx_hash \
+                    t." + self.txJoinColumn + " \
                 FROM t JOIN o ON \
-                    t.tx_hash=o.output_tx_hash \
-                GROUP BY t.tx_hash \
+                    t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + " \
                 UNION ALL \
                 SELECT \
                     coalesce(sum(i.output_value_satoshi), 0) as sum, \
-                    t.tx_hash \
+                    t." + self.txJoinColumn + " \
                 FROM t JOIN i ON \
-                    t.tx_hash=i.output_spending_tx_hash \
-                GROUP BY t.tx_hash \
+                    t." + self.txJoinColumn + "=i.output_spending_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + " \
                 UNION ALL \
                 SELECT \
                     coalesce(sum(joinsplit.value), 0) AS sum, \
-                    t.tx_hash \
+                    t." + self.txJoinColumn + " \
                 FROM t JOIN joinsplit ON \
-                    t.tx_hash=joinsplit.joinsplit_tx_hash \
-                GROUP BY t.tx_hash \
+                    t." + self.txJoinColumn + "=joinsplit.joinsplit_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + " \
                 UNION ALL \
                 SELECT \
                     coalesce(sum(sapling_payment.value), 0) AS sum, \
-                    t.tx_hash \
+                    t." + self.txJoinColumn + " \
                 FROM t JOIN sapling_payment ON \
-                    t.tx_hash=sapling_payment.sapling_payment_tx_hash \
-                GROUP BY t.tx_hash), \
+                    t." + self.txJoinColumn + "=sapling_payment.sapling_payment_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + "), \
             fees AS (\
                 SELECT \
                     coalesce(sum(so.sum), 0) as fee \
                 FROM so \
-                GROUP BY so.tx_hash) \
-            SELECT percentile_cont(0.5) WITHIN GROUP (ORDER BY fee) FROM fees", (minDate, maxDate, minDate, maxDate, minDate, maxDate, minDate, maxDate, minDate, maxDate))
-        return result[0]
+                GROUP BY so." + self.txJoinColumn + ") \
+            SELECT fee FROM fees", (minDate, maxDate, minDate, maxDate, minDate, maxDate, minDate, maxDate, minDate, maxDate)
 
-    def getMedianTransactionValueBetween(self, minDate, maxDate):
-        result = self.dbAccess.queryReturnOne("WITH \
+    def getTxValuesQuery(self, minDate, maxDate):
+        return "WITH \
             joinsplit AS (\
                 SELECT \
                     -least(joinsplit_value_new - joinsplit_value_old, 0) as value, \
-                    joinsplit_tx_hash \
+                    joinsplit_" + self.txJoinColumn + " \
                 FROM " + self.joinSplitsTable  + " WHERE \
                     (joinsplit_time >= %s AND joinsplit_time < %s)), \
             sapling_payment AS (\
                 SELECT \
                     -least(sapling_payment_value_balance, 0) as value, \
-                    sapling_payment_tx_hash \
+                    sapling_payment_" + self.txJoinColumn + " \
                 FROM " + self.saplingPaymentTable + " WHERE \
                     (sapling_payment_time >= %s AND sapling_payment_time < %s)), \
             o AS (\
                 SELECT \
-                    output_tx_hash, \
+                    output_" + self.txJoinColumn + ", \
                     output_index, \
                     output_value_satoshi, \
                     output_addresses \
@@ -615,93 +1208,102 @@ class ZcashQuery(BitcoinQuery):
                     (output_time_created >= %s AND output_time_created < %s)), \
             i AS (\
                 SELECT \
-                    output_spending_tx_hash, \
+                    output_spending_" + self.txJoinColumn + ", \
                     output_index, \
                     output_addresses \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_spent >= %s AND output_time_spent < %s)), \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                  FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false), \
             so AS (\
                 SELECT \
                     coalesce(sum(o.output_value_satoshi), 0) as partial_sum, \
-                    t.tx_hash as tx_hash \
+                    t." + self.txJoinColumn + " as " + self.txJoinColumn + " \
                 FROM t JOIN o ON \
-                    t.tx_hash=o.output_tx_hash \
-                WHERE (o.output_tx_hash, o.output_index) NOT IN (\
+                    t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + " \
+                WHERE (o.output_" + self.txJoinColumn + ", o.output_index) NOT IN (\
                     SELECT \
-                        o.output_tx_hash as output_tx_hash, \
+                        o.output_" + self.txJoinColumn + " as output_" + self.txJoinColumn + ", \
                         o.output_index as output_index \
                     FROM o JOIN i ON \
-                        (o.output_tx_hash = i.output_spending_tx_hash) \
+                        (o.output_" + self.txJoinColumn + " = i.output_spending_" + self.txJoinColumn + ") \
                         AND \
                         ((o.output_addresses && i.output_addresses) = true)) \
-                    GROUP BY t.tx_hash), \
+                    GROUP BY t." + self.txJoinColumn + "), \
             sj AS (\
                 SELECT \
                     coalesce(sum(joinsplit.value), 0) as partial_sum, \
-                    t.tx_hash as tx_hash \
+                    t." + self.txJoinColumn + " as " + self.txJoinColumn + " \
                 FROM t JOIN joinsplit ON \
-                    t.tx_hash=joinsplit.joinsplit_tx_hash \
-                GROUP BY t.tx_hash), \
+                    t." + self.txJoinColumn + "=joinsplit.joinsplit_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + "), \
             ssp AS (\
                 SELECT \
                     coalesce(sum(sapling_payment.value), 0) as partial_sum, \
-                    t.tx_hash as tx_hash \
+                    t." + self.txJoinColumn + " as " + self.txJoinColumn + " \
                 FROM t JOIN sapling_payment ON \
-                    t.tx_hash=sapling_payment.sapling_payment_tx_hash \
-                GROUP BY t.tx_hash), \
+                    t." + self.txJoinColumn + "=sapling_payment.sapling_payment_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + "), \
             sall AS (\
                 SELECT * FROM sj UNION ALL \
                 SELECT * FROM so UNION ALL \
                 SELECT * FROM ssp \
             ), \
-            total AS (SELECT sum(partial_sum) AS sum_total, tx_hash FROM sall GROUP BY tx_hash) \
-            SELECT percentile_cont(0.5) WITHIN GROUP (ORDER BY sum_total) FROM total", (minDate, maxDate, minDate, maxDate, minDate, maxDate, minDate, maxDate, minDate, maxDate))
-        return result[0]
+            total AS (SELECT sum(partial_sum) AS sum_total, " + self.txJoinColumn + " FROM sall GROUP BY " + self.txJoinColumn + ") \
+            SELECT sum_total FROM total", (minDate, maxDate, minDate, maxDate, minDate, maxDate, minDate, maxDate, minDate, maxDate)
 
     def getPaymentCountBetween(self, minDate, maxDate):
         result = self.dbAccess.queryReturnOne("WITH \
             o AS (\
                 SELECT \
-                    output_tx_hash, \
+                    output_" + self.txJoinColumn + ", \
                     output_value_satoshi \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_created >= %s AND output_time_created < %s) AND output_type>1), \
             sapling_payment AS (\
                 SELECT \
                     sapling_payment_output_count as output_count, \
-                    sapling_payment_tx_hash \
+                    sapling_payment_" + self.txJoinColumn + " \
                 FROM " + self.saplingPaymentTable + " WHERE \
                     (sapling_payment_time >= %s AND sapling_payment_time < %s)), \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false), \
             all_outputs AS (\
                 SELECT \
                     count(*) as output_count, \
-                    t.tx_hash \
+                    t." + self.txJoinColumn + " \
                 FROM t JOIN o ON \
-                    t.tx_hash=o.output_tx_hash \
-                GROUP BY t.tx_hash \
+                    t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + " \
                 UNION ALL \
                 SELECT \
                     sum(sapling_payment.output_count) as output_count, \
-                    t.tx_hash \
+                    t." + self.txJoinColumn + " \
                 FROM t JOIN sapling_payment ON \
-                    t.tx_hash=sapling_payment.sapling_payment_tx_hash \
-                GROUP BY t.tx_hash), \
-            total AS (SELECT greatest(sum(output_count) - 1, 0) as payments FROM all_outputs GROUP BY tx_hash) \
+                    t." + self.txJoinColumn + "=sapling_payment.sapling_payment_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + "), \
+            total AS (SELECT greatest(sum(output_count) - 1, 0) as payments FROM all_outputs GROUP BY " + self.txJoinColumn + ") \
             SELECT sum(payments) FROM total", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
         return result[0] if result[0] is not None else 0
 
 
 class PivxQuery(BitcoinQuery):
+    blockStatsTotals = ["tx_count", "size"]
+    # zerocoin values are added to these daily queries, there are no range variants for them
+    getDailyRewardBetween = None
+    getDailyFeesVolumeBetween = None
+    getDailyOutputVolumeBetween = None
+    getDailyHeuristicalOutputVolumeBetween = None
+    getDailyMedianFeeBetween = None
+    getDailyMedianTransactionValueBetween = None
+    getDailyPaymentCountBetween = None
+    getDailyTotalSupplyBetween = None
 
     def __init__(self, dbAccess, schema):
         super(PivxQuery, self).__init__(dbAccess, schema)
@@ -735,110 +1337,109 @@ class PivxQuery(BitcoinQuery):
         result = self.dbAccess.queryReturnOne("WITH \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=%s), \
             z AS (\
                 SELECT \
-                    zerocoin_mint_tx_hash, \
+                    zerocoin_mint_" + self.txJoinColumn + ", \
                     zerocoin_mint_value \
                 FROM " + self.zerocoinMintsTableName + " WHERE \
                     (zerocoin_mint_time >= %s AND zerocoin_mint_time < %s)) \
             SELECT \
                 sum(zerocoin_mint_value) \
             FROM z JOIN t ON \
-                z.zerocoin_mint_tx_hash=t.tx_hash", (minDate, maxDate, coinbase, minDate, maxDate))
+                z.zerocoin_mint_" + self.txJoinColumn + "=t." + self.txJoinColumn, (minDate, maxDate, coinbase, minDate, maxDate))
         return result[0] if result[0] is not None else 0
 
     def getZerocoinSpendsVolumeBetween(self, minDate, maxDate, coinbase):
         result = self.dbAccess.queryReturnOne("WITH \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=%s), \
             z AS (\
                 SELECT \
-                    zerocoin_spend_tx_hash, \
+                    zerocoin_spend_" + self.txJoinColumn + ", \
                     zerocoin_spend_value \
                 FROM " + self.zerocoinSpendsTableName + " WHERE \
                     (zerocoin_spend_time >= %s AND zerocoin_spend_time < %s)) \
             SELECT \
                 sum(zerocoin_spend_value) \
             FROM z JOIN t ON \
-                z.zerocoin_spend_tx_hash=t.tx_hash", (minDate, maxDate, coinbase, minDate, maxDate))
+                z.zerocoin_spend_" + self.txJoinColumn + "=t." + self.txJoinColumn, (minDate, maxDate, coinbase, minDate, maxDate))
         return result[0] if result[0] is not None else 0
 
-    def getMedianFeeBetween(self, minDate, maxDate):
-        result = self.dbAccess.queryReturnOne("WITH \
+    def getTxFeesQuery(self, minDate, maxDate):
+        return "WITH \
             zspend AS (\
                 SELECT \
-                    zerocoin_spend_tx_hash, \
+                    zerocoin_spend_" + self.txJoinColumn + ", \
                     zerocoin_spend_value \
                 FROM " + self.zerocoinSpendsTableName + " WHERE \
                     (zerocoin_spend_time >= %s AND zerocoin_spend_time < %s)), \
             zmint AS (\
                 SELECT \
-                    zerocoin_mint_tx_hash, \
+                    zerocoin_mint_" + self.txJoinColumn + ", \
                     zerocoin_mint_value \
                 FROM " + self.zerocoinMintsTableName + " WHERE \
                     (zerocoin_mint_time >= %s AND zerocoin_mint_time < %s)), \
             o AS (\
                 SELECT \
-                    output_tx_hash, \
+                    output_" + self.txJoinColumn + ", \
                     output_value_satoshi \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_created >= %s AND output_time_created < %s)), \
             i AS (\
                 SELECT \
-                    output_spending_tx_hash, \
+                    output_spending_" + self.txJoinColumn + ", \
                     output_value_satoshi \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_spent >= %s AND output_time_spent < %s)), \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false), \
             so AS (\
                 SELECT \
                     -coalesce(sum(o.output_value_satoshi), 0) as sum, \
-                    t.tx_hash \
-                FROM t JOIN o ON t.tx_hash=o.output_tx_hash GROUP BY t.tx_hash \
+                    t." + self.txJoinColumn + " \
+                FROM t JOIN o ON t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + " GROUP BY t." + self.txJoinColumn + " \
                 UNION ALL \
                 SELECT \
                     coalesce(sum(i.output_value_satoshi), 0) as sum, \
-                    t.tx_hash \
-                FROM t JOIN i ON t.tx_hash=i.output_spending_tx_hash GROUP BY t.tx_hash \
+                    t." + self.txJoinColumn + " \
+                FROM t JOIN i ON t." + self.txJoinColumn + "=i.output_spending_" + self.txJoinColumn + " GROUP BY t." + self.txJoinColumn + " \
                 UNION ALL \
                 SELECT \
                     coalesce(sum(zspend.zerocoin_spend_value), 0) as sum, \
-                    t.tx_hash \
-                FROM t join zspend ON t.tx_hash=zspend.zerocoin_spend_tx_hash GROUP BY t.tx_hash \
+                    t." + self.txJoinColumn + " \
+                FROM t join zspend ON t." + self.txJoinColumn + "=zspend.zerocoin_spend_" + self.txJoinColumn + " GROUP BY t." + self.txJoinColumn + " \
                 UNION ALL \
                 SELECT \
                     -coalesce(sum(zmint.zerocoin_mint_value), 0) as sum, \
-                    t.tx_hash \
-                FROM t join zmint ON t.tx_hash=zmint.zerocoin_mint_tx_hash GROUP BY t.tx_hash), \
+                    t." + self.txJoinColumn + " \
+                FROM t join zmint ON t." + self.txJoinColumn + "=zmint.zerocoin_mint_" + self.txJoinColumn + " GROUP BY t." + self.txJoinColumn + "), \
             fees AS (\
                 SELECT \
                     coalesce(sum(so.sum), 0) as fee \
                 FROM so \
-                GROUP BY so.tx_hash) \
-            SELECT percentile_cont(0.5) WITHIN GROUP (ORDER BY fee) FROM fees", (minDate, maxDate, minDate, maxDate, minDate, maxDate, minDate, maxDate, minDate, maxDate))
-        return result[0]
+                GROUP BY so." + self.txJoinColumn + ") \
+            SELECT fee FROM fees", (minDate, maxDate, minDate, maxDate, minDate, maxDate, minDate, maxDate, minDate, maxDate)
 
-    def getMedianTransactionValueBetween(self, minDate, maxDate):
-        result = self.dbAccess.queryReturnOne("WITH \
+    def getTxValuesQuery(self, minDate, maxDate):
+        return "WITH \
             z AS (\
                 SELECT \
-                    zerocoin_mint_tx_hash, \
+                    zerocoin_mint_" + self.txJoinColumn + ", \
                     zerocoin_mint_value \
                 FROM " + self.zerocoinMintsTableName + " WHERE \
                     (zerocoin_mint_time >= %s AND zerocoin_mint_time < %s)), \
             o AS (\
                 SELECT \
-                    output_tx_hash, \
+                    output_" + self.txJoinColumn + ", \
                     output_index, \
                     output_value_satoshi, \
                     output_addresses \
@@ -846,7 +1447,7 @@ class PivxQuery(BitcoinQuery):
                     (output_time_created >= %s AND output_time_created < %s)), \
             i AS (\
                 SELECT \
-                    output_spending_tx_hash, \
+                    output_spending_" + self.txJoinColumn + ", \
                     output_index, \
                     output_value_satoshi, \
                     output_addresses \
@@ -854,75 +1455,74 @@ class PivxQuery(BitcoinQuery):
                     (output_time_spent >= %s AND output_time_spent < %s)), \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false), \
             so AS (\
                 SELECT \
                     coalesce(sum(o.output_value_satoshi), 0) as sum_outputs, \
-                    t.tx_hash \
+                    t." + self.txJoinColumn + " \
                 FROM t JOIN o ON \
-                    t.tx_hash=o.output_tx_hash \
+                    t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + " \
                 WHERE \
-                    (o.output_tx_hash, o.output_index) NOT IN \
+                    (o.output_" + self.txJoinColumn + ", o.output_index) NOT IN \
                         (SELECT \
-                            o.output_tx_hash as output_tx_hash, \
+                            o.output_" + self.txJoinColumn + " as output_" + self.txJoinColumn + ", \
                             o.output_index as output_index \
                         FROM o JOIN i ON \
-                            (o.output_tx_hash = i.output_spending_tx_hash) AND \
+                            (o.output_" + self.txJoinColumn + " = i.output_spending_" + self.txJoinColumn + ") AND \
                             ((o.output_addresses && i.output_addresses) = true)) \
-                GROUP BY t.tx_hash), \
+                GROUP BY t." + self.txJoinColumn + "), \
             sz AS (\
                 SELECT \
                     sum(z.zerocoin_mint_value) as sum_zerocoin, \
-                    t.tx_hash \
+                    t." + self.txJoinColumn + " \
                 FROM t JOIN z ON \
-                    t.tx_hash=z.zerocoin_mint_tx_hash \
-                GROUP BY t.tx_hash), \
+                    t." + self.txJoinColumn + "=z.zerocoin_mint_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + "), \
             total AS (\
                 SELECT \
                     (coalesce(so.sum_outputs, 0) + coalesce(sz.sum_zerocoin, 0)) as sum_total \
                 FROM so FULL OUTER JOIN sz ON \
-                    so.tx_hash=sz.tx_hash) \
-            SELECT percentile_cont(0.5) WITHIN GROUP (ORDER BY sum_total) FROM total", (minDate, maxDate, minDate, maxDate, minDate, maxDate, minDate, maxDate))
-        return result[0]
+                    so." + self.txJoinColumn + "=sz." + self.txJoinColumn + ") \
+            SELECT sum_total FROM total", (minDate, maxDate, minDate, maxDate, minDate, maxDate, minDate, maxDate)
 
     def getPaymentCountBetween(self, minDate, maxDate):
         result = self.dbAccess.queryReturnOne("WITH \
             z AS (\
                 SELECT \
-                    zerocoin_mint_tx_hash \
+                    zerocoin_mint_" + self.txJoinColumn + " \
                 FROM " + self.zerocoinMintsTableName + " WHERE \
                     (zerocoin_mint_time >= %s AND zerocoin_mint_time < %s)), \
             o AS (\
                 SELECT \
-                    output_tx_hash \
+                    output_" + self.txJoinColumn + " \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_created >= %s AND output_time_created < %s) AND output_type>1), \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false), \
             so AS (\
                 SELECT \
                     count(*) as payments, \
-                    t.tx_hash \
+                    t." + self.txJoinColumn + " \
                 FROM t JOIN o ON \
-                    t.tx_hash=o.output_tx_hash \
-                GROUP BY t.tx_hash), \
+                    t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + "), \
             sz AS (\
                 SELECT \
                     count(*) as payments, \
-                    t.tx_hash \
+                    t." + self.txJoinColumn + " \
                 FROM t JOIN z ON \
-                    t.tx_hash=z.zerocoin_mint_tx_hash \
-                GROUP BY t.tx_hash), \
+                    t." + self.txJoinColumn + "=z.zerocoin_mint_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + "), \
             total AS (\
                 SELECT \
                     greatest(coalesce(so.payments, 0) + coalesce(sz.payments, 0) - 1, 0) AS payments \
                 FROM so FULL OUTER JOIN sz ON \
-                    so.tx_hash=sz.tx_hash) \
+                    so." + self.txJoinColumn + "=sz." + self.txJoinColumn + ") \
             SELECT sum(payments) FROM total", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
         return result[0]
 
@@ -930,23 +1530,34 @@ class PivxQuery(BitcoinQuery):
         result = self.dbAccess.queryReturnOne("WITH \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     tx_coinbase=true AND (tx_time >= %s AND tx_time < %s)), \
             i AS (\
                 SELECT \
-                    output_spending_tx_hash, \
+                    output_spending_" + self.txJoinColumn + ", \
                     output_value_satoshi \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_spent >= %s AND output_time_spent < %s)) \
             SELECT \
                 sum(output_value_satoshi) \
             FROM i JOIN t ON \
-                t.tx_hash=i.output_spending_tx_hash", (minDate, maxDate, minDate, maxDate))
+                t." + self.txJoinColumn + "=i.output_spending_" + self.txJoinColumn, (minDate, maxDate, minDate, maxDate))
         return result[0] if result[0] is not None else 0
 
 
 class DecredQuery(BitcoinQuery):
+    blockStatsTotals = ["size"]
+    # votes and stake transactions are treated separately by these daily queries, there are no range variants for them
+    getDailyTxCountBetween = None
+    getDailyFeesVolumeBetween = None
+    getDailyOutputVolumeBetween = None
+    getDailyHeuristicalOutputVolumeBetween = None
+    getDailyMedianFeeBetween = None
+    getDailyMedianTransactionValueBetween = None
+    getDailyPaymentCountBetween = None
+    getDailyRewardBetween = None
+    getDailyTotalSupplyBetween = None
 
     def getTxCountBetween(self, minDate, maxDate):
         result = self.dbAccess.queryReturnOne("\
@@ -960,23 +1571,23 @@ class DecredQuery(BitcoinQuery):
         result = self.dbAccess.queryReturnOne("WITH \
             o AS (\
                 SELECT \
-                    output_tx_hash, \
+                    output_" + self.txJoinColumn + ", \
                     output_value_satoshi \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_created >= %s AND output_time_created < %s)), \
             i AS (\
                 SELECT \
-                    output_spending_tx_hash, \
+                    output_spending_" + self.txJoinColumn + ", \
                     output_value_satoshi \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_spent >= %s AND output_time_spent < %s)), \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false AND tx_vote=false), \
-            volume_o AS (SELECT sum(o.output_value_satoshi) v FROM o JOIN t ON t.tx_hash=o.output_tx_hash), \
-            volume_i AS (SELECT sum(i.output_value_satoshi) v FROM i JOIN t ON t.tx_hash=i.output_spending_tx_hash) \
+            volume_o AS (SELECT sum(o.output_value_satoshi) v FROM o JOIN t ON t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + "), \
+            volume_i AS (SELECT sum(i.output_value_satoshi) v FROM i JOIN t ON t." + self.txJoinColumn + "=i.output_spending_" + self.txJoinColumn + ") \
             SELECT \
                 coalesce(volume_i.v, 0) - coalesce(volume_o.v, 0) \
             FROM \
@@ -987,7 +1598,7 @@ class DecredQuery(BitcoinQuery):
         result = self.dbAccess.queryReturnOne("WITH \
             o AS (\
                 SELECT \
-                    output_tx_hash, \
+                    output_" + self.txJoinColumn + ", \
                     output_index, \
                     output_value_satoshi, \
                     output_addresses \
@@ -995,36 +1606,36 @@ class DecredQuery(BitcoinQuery):
                     (output_time_created >= %s AND output_time_created < %s) AND output_type>1), \
             i AS (\
                 SELECT \
-                    output_spending_tx_hash, \
+                    output_spending_" + self.txJoinColumn + ", \
                     output_index, \
                     output_addresses \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_spent >= %s AND output_time_spent < %s)), \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false AND tx_vote=false AND tx_ticket=false) \
             SELECT \
                 sum(o.output_value_satoshi) \
             FROM o JOIN t ON \
-                o.output_tx_hash = t.tx_hash \
+                o.output_" + self.txJoinColumn + " = t." + self.txJoinColumn + " \
             LEFT JOIN (\
                 SELECT \
-                    o.output_tx_hash as change_output_tx_hash, \
+                    o.output_" + self.txJoinColumn + " as change_output_tx, \
                     o.output_index as change_output_index \
                 FROM o JOIN i ON \
-                    (o.output_tx_hash = i.output_spending_tx_hash) AND \
+                    (o.output_" + self.txJoinColumn + " = i.output_spending_" + self.txJoinColumn + ") AND \
                     ((o.output_addresses && i.output_addresses) = true)) change ON \
-                o.output_tx_hash=change.change_output_tx_hash AND o.output_index=change.change_output_index \
-            WHERE change.change_output_tx_hash is NULL", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
+                o.output_" + self.txJoinColumn + "=change.change_output_tx AND o.output_index=change.change_output_index \
+            WHERE change.change_output_tx is NULL", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
         return result[0] if result[0] is not None else 0
 
     def getHeuristicalOutputVolumeBetween(self, minDate, maxDate):
         result = self.dbAccess.queryReturnOne("WITH \
             o AS (\
                 SELECT \
-                    output_tx_hash, \
+                    output_" + self.txJoinColumn + ", \
                     output_index, \
                     output_value_satoshi, \
                     output_addresses \
@@ -1035,78 +1646,77 @@ class DecredQuery(BitcoinQuery):
                          (EXTRACT(EPOCH FROM (output_time_spent - output_time_created)) > 2400))), \
             i AS (\
                 SELECT \
-                    output_spending_tx_hash, \
+                    output_spending_" + self.txJoinColumn + ", \
                     output_index, \
                     output_addresses \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_spent >= %s AND output_time_spent < %s)), \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false AND tx_vote=false AND tx_ticket=false) \
             SELECT \
                 sum(o.output_value_satoshi) \
             FROM o JOIN t ON \
-                o.output_tx_hash = t.tx_hash \
+                o.output_" + self.txJoinColumn + " = t." + self.txJoinColumn + " \
             LEFT JOIN (\
                 SELECT \
-                    o.output_tx_hash as change_output_tx_hash, \
+                    o.output_" + self.txJoinColumn + " as change_output_tx, \
                     o.output_index as change_output_index \
                 FROM o JOIN i ON \
-                    (o.output_tx_hash = i.output_spending_tx_hash) AND \
+                    (o.output_" + self.txJoinColumn + " = i.output_spending_" + self.txJoinColumn + ") AND \
                     ((o.output_addresses && i.output_addresses) = true)) change ON \
-                o.output_tx_hash=change.change_output_tx_hash AND o.output_index=change.change_output_index \
-            WHERE change.change_output_tx_hash is NULL", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
+                o.output_" + self.txJoinColumn + "=change.change_output_tx AND o.output_index=change.change_output_index \
+            WHERE change.change_output_tx is NULL", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
         return result[0] if result[0] is not None else 0
 
-    def getMedianFeeBetween(self, minDate, maxDate):
-        result = self.dbAccess.queryReturnOne("WITH \
+    def getTxFeesQuery(self, minDate, maxDate):
+        return "WITH \
             o AS (\
                 SELECT \
-                    output_tx_hash, \
+                    output_" + self.txJoinColumn + ", \
                     output_value_satoshi \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_created >= %s AND output_time_created < %s)), \
             i AS (\
                 SELECT \
-                    output_spending_tx_hash, \
+                    output_spending_" + self.txJoinColumn + ", \
                     output_value_satoshi \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_spent >= %s AND output_time_spent < %s)), \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false AND tx_vote=false), \
             so AS (\
                 SELECT \
                     coalesce(sum(o.output_value_satoshi), 0) as sum_outputs, \
-                    t.tx_hash \
+                    t." + self.txJoinColumn + " \
                 FROM t JOIN o ON \
-                    t.tx_hash=o.output_tx_hash \
-                GROUP BY t.tx_hash), \
+                    t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + "), \
             si AS (\
                 SELECT \
                     coalesce(sum(i.output_value_satoshi), 0) as sum_inputs, \
-                    t.tx_hash \
+                    t." + self.txJoinColumn + " \
                 FROM t JOIN i ON \
-                    t.tx_hash=i.output_spending_tx_hash \
-                GROUP BY t.tx_hash), \
+                    t." + self.txJoinColumn + "=i.output_spending_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + "), \
             fees AS (\
                 SELECT \
                     coalesce(si.sum_inputs, 0) - coalesce(so.sum_outputs, 0) as fee, \
-                    si.tx_hash as hash \
+                    si." + self.txJoinColumn + " as hash \
                 FROM si FULL OUTER JOIN so ON \
-                    si.tx_hash=so.tx_hash) \
-            SELECT percentile_cont(0.5) WITHIN GROUP (ORDER BY fee) FROM fees", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
-        return result[0]
+                    si." + self.txJoinColumn + "=so." + self.txJoinColumn + ") \
+            SELECT fee FROM fees", (minDate, maxDate, minDate, maxDate, minDate, maxDate)
 
-    def getMedianTransactionValueBetween(self, minDate, maxDate):
-        result = self.dbAccess.queryReturnOne("WITH \
+    def getTxValuesQuery(self, minDate, maxDate):
+        return "WITH \
             o AS (\
                 SELECT \
-                    output_tx_hash, \
+                    output_" + self.txJoinColumn + ", \
                     output_index, \
                     output_value_satoshi, \
                     output_addresses \
@@ -1114,54 +1724,53 @@ class DecredQuery(BitcoinQuery):
                     (output_time_created >= %s AND output_time_created < %s)), \
             i AS (\
                 SELECT \
-                    output_spending_tx_hash, \
+                    output_spending_" + self.txJoinColumn + ", \
                     output_index, \
                     output_addresses \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_spent >= %s AND output_time_spent < %s)), \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false AND tx_vote=false AND tx_ticket=false), \
             so AS (\
                 SELECT \
                     sum(o.output_value_satoshi) as sum_outputs \
                 FROM t JOIN o ON \
-                    t.tx_hash=o.output_tx_hash \
+                    t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + " \
                 LEFT JOIN (\
                     SELECT \
-                        o.output_tx_hash as change_output_tx_hash, \
+                        o.output_" + self.txJoinColumn + " as change_output_tx, \
                         o.output_index as change_output_index \
                     FROM o JOIN i ON \
-                        (o.output_tx_hash = i.output_spending_tx_hash) AND \
+                        (o.output_" + self.txJoinColumn + " = i.output_spending_" + self.txJoinColumn + ") AND \
                         ((o.output_addresses && i.output_addresses) = true)) change ON \
-                    o.output_tx_hash=change.change_output_tx_hash AND o.output_index=change.change_output_index \
-                WHERE change.change_output_tx_hash is NULL \
-                GROUP BY t.tx_hash) \
-            SELECT percentile_cont(0.5) WITHIN GROUP (ORDER BY sum_outputs) FROM so", (minDate, maxDate, minDate, maxDate, minDate, maxDate))
-        return result[0]
+                    o.output_" + self.txJoinColumn + "=change.change_output_tx AND o.output_index=change.change_output_index \
+                WHERE change.change_output_tx is NULL \
+                GROUP BY t." + self.txJoinColumn + ") \
+            SELECT sum_outputs FROM so", (minDate, maxDate, minDate, maxDate, minDate, maxDate)
 
     def getPaymentCountBetween(self, minDate, maxDate):
         result = self.dbAccess.queryReturnOne("WITH \
             o AS (\
                 SELECT \
-                    output_tx_hash, \
+                    output_" + self.txJoinColumn + ", \
                     output_value_satoshi \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_created >= %s AND output_time_created < %s) AND output_type>1), \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     (tx_time >= %s AND tx_time < %s) AND tx_coinbase=false AND tx_ticket=false AND tx_vote=false), \
             so AS (\
                 SELECT \
                     GREATEST(count(*) - 1, 0) as payments, \
-                    t.tx_hash \
+                    t." + self.txJoinColumn + " \
                 FROM t JOIN o ON \
-                    t.tx_hash=o.output_tx_hash \
-                GROUP BY t.tx_hash) \
+                    t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + " \
+                GROUP BY t." + self.txJoinColumn + ") \
             SELECT sum(payments) FROM so", (minDate, maxDate, minDate, maxDate))
         return result[0] if result[0] is not None else 0
 
@@ -1169,47 +1778,47 @@ class DecredQuery(BitcoinQuery):
         result = self.dbAccess.queryReturnOne("WITH \
             t AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     tx_coinbase=true AND (tx_time >= %s AND tx_time < %s)), \
             o AS (\
                 SELECT \
                     output_value_satoshi, \
-                    output_tx_hash \
+                    output_" + self.txJoinColumn + " \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_created >= %s AND output_time_created < %s)), \
             pow AS (\
                 SELECT \
                     sum(o.output_value_satoshi) AS value \
                 FROM t JOIN o ON \
-                    t.tx_hash=o.output_tx_hash), \
+                    t." + self.txJoinColumn + "=o.output_" + self.txJoinColumn + "), \
             st AS (\
                 SELECT \
-                    tx_hash \
+                    " + self.txJoinColumn + " \
                 FROM " + self.txTable + " WHERE \
                     tx_vote=true AND (tx_time >= %s AND tx_time < %s)), \
             so AS (\
                 SELECT \
                     output_value_satoshi, \
-                    output_tx_hash \
+                    output_" + self.txJoinColumn + " \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_created >= %s AND output_time_created < %s)), \
             si AS (\
                 SELECT \
                     output_value_satoshi, \
-                    output_spending_tx_hash \
+                    output_spending_" + self.txJoinColumn + " \
                 FROM " + self.outputsTable + " WHERE \
                     (output_time_spent >= %s AND output_time_spent < %s)), \
             sso AS (\
                 SELECT \
                     sum(so.output_value_satoshi) AS value \
                 FROM st JOIN so ON \
-                    st.tx_hash=so.output_tx_hash), \
+                    st." + self.txJoinColumn + "=so.output_" + self.txJoinColumn + "), \
             ssi AS (\
                 SELECT \
                     sum(si.output_value_satoshi) AS value \
                 FROM st JOIN si ON \
-                    st.tx_hash=si.output_spending_tx_hash) \
+                    st." + self.txJoinColumn + "=si.output_spending_" + self.txJoinColumn + ") \
             SELECT \
                 (coalesce(pow.value, 0) + coalesce(sso.value, 0) - coalesce(ssi.value, 0)) \
             FROM pow CROSS JOIN sso CROSS JOIN ssi", (minDate, maxDate, minDate, maxDate, minDate, maxDate, minDate, maxDate, minDate, maxDate))
@@ -0,0 +1,367 @@
+import hashlib
+import struct
+from coinmetrics.utils import base58, bech32
+
+OP_0 = 0x00
+OP_PUSHDATA1 = 0x4c
+OP_PUSHDATA2 = 0x4d
+OP_PUSHDATA4 = 0x4e
+OP_1 = 0x51
+OP_16 = 0x60
+OP_RETURN = 0x6a
+OP_DUP = 0x76
+OP_EQUAL = 0x87
+OP_EQUALVERIFY = 0x88
+OP_HASH160 = 0xa9
+OP_CHECKSIG = 0xac
+OP_CHECKMULTISIG = 0xae
+OP_ZEROCOINMINT = 0xc1
+OP_ZEROCOINSPEND = 0xc2
+
+NULL_HASH = b"\x00" * 32
+BLOCK_HEADER_SIZE = 80
+BLOCK_VERSION_AUXPOW = 1 << 8
+MAX_LEGACY_NULL_DATA_SIZE = 80
+
+
+class RawBlockFormat(object):
+
+    def __init__(self, pubKeyHashVersion, scriptHashVersion, segwitHrp=None, legacySolver=False, auxPow=False,
+                 accumulatorCheckpoint=False, transactionTime=False, specialTransactions=False, zerocoin=False,
+                 falseReturnNullData=False):
+        self.pubKeyHashVersion = bytes([pubKeyHashVersion])
+        self.scriptHashVersion = bytes([scriptHashVersion])
+        # bech32 prefix of segwit addresses, None for chains without segwit
+        self.segwitHrp = segwitHrp
+        # template-based script solver of bitcoin 0.9-0.11 based nodes, it is looser about pushes than the modern one
+        self.legacySolver = legacySolver
+        # merge-mined blocks carry an auxiliary proof of work right after the header
+        self.auxPow = auxPow
+        # zerocoin accumulator checkpoint follows the header of PIVX blocks of versions 4-6
+        self.accumulatorCheckpoint = accumulatorCheckpoint
+        # PoS coins derived from peercoin have transaction timestamp right after the version
+        self.transactionTime = transactionTime
+        # DIP2 special transactions have an extra payload after lock time
+        self.specialTransactions = specialTransactions
+        self.zerocoin = zerocoin
+        self.falseReturnNullData = falseReturnNullData
+
+
+BITCOIN_FORMAT = RawBlockFormat(0x00, 0x05, segwitHrp="bc")
+BITCOIN_SV_FORMAT = RawBlockFormat(0x00, 0x05, falseReturnNullData=True)
+DOGECOIN_FORMAT = RawBlockFormat(0x1e, 0x16, legacySolver=True, auxPow=True)
+DASH_FORMAT = RawBlockFormat(0x4c, 0x10, specialTransactions=True)
+PIVX_FORMAT = RawBlockFormat(0x1e, 0x0d, legacySolver=True, accumulatorCheckpoint=True, zerocoin=True)
+VERGE_FORMAT = RawBlockFormat(0x1e, 0x21, legacySolver=True, transactionTime=True)
+
+
+def doubleSha256(data):
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+
+
+def hash160(data):
+    return hashlib.new("ripemd160", hashlib.sha256(data).digest()).digest()
+
+
+def hashToHex(hashBytes):
+    return hashBytes[::-1].hex()
+
+
+def decodeBlockHeader(data, offset=0):
+    version, prevHash, merkleRoot, time, bits, nonce = struct.unpack_from("<i32s32sIII", data, offset)
+    return {
+        "hash": hashToHex(doubleSha256(data[offset:offset + BLOCK_HEADER_SIZE])),
+        "version": version,
+        "previousblockhash": hashToHex(prevHash),
+        "time": time,
+        "bits": bits,
+    }
+
+
+def decodeBlock(data, blockFormat):
+    reader = RawReader(data)
+    header = decodeBlockHeader(data)
+    reader.skip(BLOCK_HEADER_SIZE)
+    if blockFormat.auxPow and header["version"] & BLOCK_VERSION_AUXPOW:
+        skipAuxPow(reader)
+    if blockFormat.accumulatorCheckpoint and 3 < header["version"] < 7:
+        reader.skip(32)
+
+    txCount = reader.readVarInt()
+    txDicts = []
+    for _ in range(txCount):
+        txDicts.append(decodeTransaction(reader, blockFormat))
+    # anything after transactions (i.e. PoS block signature) is of no interest to us
+    return header, txDicts
+
+
+def skipAuxPow(reader):
+    # parent coinbase as CMerkleTx: tx, block hash, merkle branch, index
+    decodeTransaction(reader, DOGECOIN_FORMAT)
+    reader.skip(32)
+    reader.skip(32 * reader.readVarInt() + 4)
+    # chain merkle branch, chain index, parent block header
+    reader.skip(32 * reader.readVarInt() + 4)
+    reader.skip(BLOCK_HEADER_SIZE)
+
+
+def decodeTransaction(reader, blockFormat):
+    start = reader.offset
+    version = reader.readUInt32()
+    if blockFormat.transactionTime:
+        reader.skip(4)
+
+    segwit = False
+    if reader.peekByte() == 0 and reader.peekByte(1) == 1:
+        segwit = True
+        prefixEnd = reader.offset
+        reader.skip(2)
+        bodyStart = reader.offset
+
+    inputs = []
+    for _ in range(reader.readVarInt()):
+        prevHash = reader.readBytes(32)
+        prevIndex = reader.readUInt32()
+        scriptSig = reader.readBytes(reader.readVarInt())
+        sequence = reader.readUInt32()
+        inputs.append((prevHash, prevIndex, scriptSig, sequence))
+
+    outputs = []
+    for _ in range(reader.readVarInt()):
+        value = reader.readUInt64()
+        script = reader.readBytes(reader.readVarInt())
+        outputs.append((value, script))
+
+    if segwit:
+        bodyEnd = reader.offset
+        for _ in range(len(inputs)):
+            for _ in range(reader.readVarInt()):
+                reader.skip(reader.readVarInt())
+        witnessEnd = reader.offset
+
+    reader.skip(4)
+    if blockFormat.specialTransactions and (version & 0xffff) >= 3 and (version >> 16) != 0:
+        reader.skip(reader.readVarInt())
+    end = reader.offset
+
+    if segwit:
+        strippedTx = reader.data[start:prefixEnd] + reader.data[bodyStart:bodyEnd] + reader.data[witnessEnd:end]
+    else:
+        strippedTx = reader.data[start:end]
+
+    coinbase = len(inputs) == 1 and inputs[0][0] == NULL_HASH and inputs[0][1] == 0xffffffff
+    if coinbase and blockFormat.zerocoin and len(inputs[0][2]) > 0 and inputs[0][2][0] == OP_ZEROCOINSPEND:
+        coinbase = False
+
+    vin = []
+    for prevHash, prevIndex, scriptSig, sequence in inputs:
+        if coinbase:
+            vin.append({"coinbase": scriptSig.hex(), "sequence": sequence})
+        else:
+            vin.append({"txid": hashToHex(prevHash), "vout": prevIndex, "scriptSig": {"hex": scriptSig.hex()}, "sequence": sequence})
+
+    vout = []
+    for index, (value, script) in enumerate(outputs):
+        outputType, addresses = solveScript(script, blockFormat)
+        scriptPubKey = {"hex": script.hex(), "type": outputType}
+        if len(addresses) > 0:
+            scriptPubKey["addresses"] = addresses
+        vout.append({"value": "%d.%08d" % (value // 100000000, value % 100000000), "n": index, "scriptPubKey": scriptPubKey})
+
+    return {
+        "txid": hashToHex(doubleSha256(strippedTx)),
+        "size": end - start,
+        "version": version,
+        "vin": vin,
+        "vout": vout,
+    }
+
+
+def solveScript(script, blockFormat):
+    if blockFormat.zerocoin and len(script) > 0 and script[0] == OP_ZEROCOINMINT:
+        return "zerocoinmint", []
+
+    if len(script) == 23 and script[0] == OP_HASH160 and script[1] == 20 and script[22] == OP_EQUAL:
+        return "scripthash", [base58.encodeCheck(blockFormat.scriptHashVersion, script[2:22])]
+
+    if blockFormat.segwitHrp is not None:
+        witness = solveWitnessProgram(script, blockFormat)
+        if witness is not None:
+            return witness
+
+    if blockFormat.falseReturnNullData and len(script) >= 2 and script[0] == OP_0 and script[1] == OP_RETURN:
+        return "nulldata", []
+
+    ops = parseScript(script)
+    if ops is None:
+        return "nonstandard", []
+
+    if blockFormat.legacySolver:
+        return solveLegacyTemplate(ops, blockFormat)
+    else:
+        return solveModern(script, ops, blockFormat)
+
+
+def solveWitnessProgram(script, blockFormat):
+    if len(script) < 4 or len(script) > 42:
+        return None
+    if script[0] != OP_0 and not (OP_1 <= script[0] <= OP_16):
+        return None
+    if script[1] + 2 != len(script):
+        return None
+
+    version = 0 if script[0] == OP_0 else script[0] - OP_1 + 1
+    program = script[2:]
+    if version == 0 and len(program) == 20:
+        return "witness_v0_keyhash", [bech32.encode(blockFormat.segwitHrp, 0, program)]
+    elif version == 0 and len(program) == 32:
+        return "witness_v0_scripthash", [bech32.encode(blockFormat.segwitHrp, 0, program)]
+    elif version != 0:
+        return "witness_unknown", []
+    else:
+        return None
+
+
+def solveModern(script, ops, blockFormat):
+    if len(script) == 25 and script[0] == OP_DUP and script[1] == OP_HASH160 and script[2] == 20 and \
+            script[23] == OP_EQUALVERIFY and script[24] == OP_CHECKSIG:
+        return "pubkeyhash", [base58.encodeCheck(blockFormat.pubKeyHashVersion, script[3:23])]
+
+    if len(script) >= 1 and script[0] == OP_RETURN and all(data is not None or op <= OP_16 for op, data in ops[1:]):
+        return "nulldata", []
+
+    if len(ops) == 2 and ops[1][0] == OP_CHECKSIG and ops[0][1] is not None and len(script) == len(ops[0][1]) + 2 and \
+            pubKeyHasValidSize(ops[0][1]):
+        return "pubkey", [pubKeyToAddress(ops[0][1], blockFormat)]
+
+    if len(ops) >= 4 and ops[-1][0] == OP_CHECKMULTISIG and OP_1 <= ops[0][0] <= OP_16 and OP_1 <= ops[-2][0] <= OP_16:
+        required, total = ops[0][0] - OP_1 + 1, ops[-2][0] - OP_1 + 1
+        pubKeys = [data for _, data in ops[1:-2]]
+        if required <= total and total == len(pubKeys) and all(data is not None and pubKeyHasValidSize(data) for data in pubKeys):
+            return "multisig", [pubKeyToAddress(pubKey, blockFormat) for pubKey in pubKeys]
+
+    return "nonstandard", []
+
+
+def solveLegacyTemplate(ops, blockFormat):
+    def isPubKey(op):
+        return op[1] is not None and 33 <= len(op[1]) <= 65
+
+    if len(ops) == 5 and ops[0][0] == OP_DUP and ops[1][0] == OP_HASH160 and ops[2][1] is not None and \
+            len(ops[2][1]) == 20 and ops[3][0] == OP_EQUALVERIFY and ops[4][0] == OP_CHECKSIG:
+        return "pubkeyhash", [base58.encodeCheck(blockFormat.pubKeyHashVersion, ops[2][1])]
+
+    if len(ops) == 2 and ops[0][0] == OP_RETURN and ops[1][1] is not None and len(ops[1][1]) <= MAX_LEGACY_NULL_DATA_SIZE:
+        return "nulldata", []
+
+    if len(ops) == 2 and isPubKey(ops[0]) and ops[1][0] == OP_CHECKSIG:
+        if pubKeyIsValid(ops[0][1]):
+            return "pubkey", [pubKeyToAddress(ops[0][1], blockFormat)]
+        else:
+            return "pubkey", []
+
+    if len(ops) >= 4 and ops[-1][0] == OP_CHECKMULTISIG and OP_1 <= ops[0][0] <= OP_16 and OP_1 <= ops[-2][0] <= OP_16:
+        required, total = ops[0][0] - OP_1 + 1, ops[-2][0] - OP_1 + 1
+        if required <= total and total == len(ops) - 3 and all(isPubKey(op) for op in ops[1:-2]):
+            return "multisig", [pubKeyToAddress(data, blockFormat) for _, data in ops[1:-2] if pubKeyIsValid(data)]
+
+    return "nonstandard", []
+
+
+def parseScript(script):
+    # returns list of (opcode, pushed data or None), or None if the script can't be parsed
+    ops = []
+    offset = 0
+    length = len(script)
+    while offset < length:
+        op = script[offset]
+        offset += 1
+        if op < OP_PUSHDATA1:
+            size = op
+        elif op == OP_PUSHDATA1:
+            if offset + 1 > length:
+                return None
+            size = script[offset]
+            offset += 1
+        elif op == OP_PUSHDATA2:
+            if offset + 2 > length:
+                return None
+            size = struct.unpack_from("<H", script, offset)[0]
+            offset += 2
+        elif op == OP_PUSHDATA4:
+            if offset + 4 > length:
+                return None
+            size = struct.unpack_from("<I", script, offset)[0]
+            offset += 4
+        else:
+            ops.append((op, None))
+            continue
+
+        if offset + size > length:
+            return None
+        ops.append((op, script[offset:offset + size]))
+        offset += size
+    return ops
+
+
+def pubKeyHasValidSize(pubKey):
+    if len(pubKey) == 33:
+        return pubKey[0] in (0x02, 0x03)
+    elif len(pubKey) == 65:
+        return pubKey[0] in (0x04, 0x06, 0x07)
+    else:
+        return False
+
+
+def pubKeyIsValid(pubKey):
+    return len(pubKey) > 0 and pubKeyHasValidSize(pubKey)
+
+
+def pubKeyToAddress(pubKey, blockFormat):
+    return base58.encodeCheck(blockFormat.pubKeyHashVersion, hash160(pubKey))
+
+
+class RawReader(object):
+
+    def __init__(self, data, offset=0):
+        self.data = data
+        self.offset = offset
+
+    def skip(self, count):
+        self.offset += count
+        if self.offset > len(self.data):
+            raise ValueError("unexpected end of data at offset %d" % self.offset)
+
+    def peekByte(self, position=0):
+        return self.data[self.offset + position]
+
+    def readBytes(self, count):
+        result = bytes(self.data[self.offset:self.offset + count])
+        self.skip(count)
+        return result
+
+    def readUInt32(self):
+        result = struct.unpack_from("<I", self.data, self.offset)[0]
+        self.offset += 4
+        return result
+
+    def readUInt64(self):
+        result = struct.unpack_from("<Q", self.data, self.offset)[0]
+        self.offset += 8
+        return result
+
+    def readVarInt(self):
+        prefix = self.data[self.offset]
+        self.offset += 1
+        if prefix < 0xfd:
+            return prefix
+        elif prefix == 0xfd:
+            result = struct.unpack_from("<H", self.data, self.offset)[0]
+            self.offset += 2
+        elif prefix == 0xfe:
+            result = struct.unpack_from("<I", self.data, self.offset)[0]
+            self.offset += 4
+        else:
+            result = struct.unpack_from("<Q", self.data, self.offset)[0]
+            self.offset += 8
+        return result
@@ -1,4 +1,8 @@
 from coinmetrics.bitsql.constants import *
+from datetime import datetime
+
+# median time that nodes report for assets which don't provide it
+NO_MEDIAN_TIME = datetime(1970, 1, 1)
 
 
 class BitcoinSchema(object):
@@ -6,6 +10,9 @@ class BitcoinSchema(object):
     def __init__(self, asset, dbAccess):
         self.asset = asset
         self.dbAccess = dbAccess
+        self.compactLayout = None
+        self.partitioned = None
+        self.indexProfile = "btree"
         self.init()
 
     def getAsset(self):
@@ -23,79 +30,484 @@ class BitcoinSchema(object):
     def getCoinbaseScriptsTableName(self):
         return self.coinbaseScriptsTableName
 
+    def getInputsTableName(self):
+        return self.inputsTableName
+
+    def getOutputsViewName(self):
+        return self.outputsViewName
+
+    def usesInputsTable(self):
+        return self.inputsTableUsed
+
+    def getOutputsQueryTableName(self):
+        # relation that queries read outputs with their spends from: outputs table itself in the default layout, or the
+        # view joining outputs with inputs in the inputs table layout; columns are the same in both cases
+        return self.outputsViewName if self.inputsTableUsed else self.outputsTableName
+
+    def usesCompactLayout(self):
+        return self.compactLayout
+
+    def encodeHash(self, hashAsNumber):
+        # hashes are stored as numbers in the default layout and as 32 bytes (same order as hex) in the compact one
+        return hashAsNumber.to_bytes(32, "big") if self.compactLayout else hashAsNumber
+
+    def encodeMedianTime(self, medianTime):
+        return None if self.compactLayout and medianTime == NO_MEDIAN_TIME else medianTime
+
+    def checkEmpty(self, layoutName):
+        # storage layouts are chosen once for an empty database and detected from table definitions afterwards
+        if self.dbAccess.queryReturnOne("SELECT count(*) FROM (SELECT 1 FROM %s LIMIT 1) AS t" % self.blocksTableName)[0] > 0:
+            raise Exception("%s can only be chosen for empty %s tables" % (layoutName, self.asset))
+
+    def getColumnType(self, tableName, columnName):
+        result = self.dbAccess.queryReturnOne("SELECT data_type FROM information_schema.columns \
+            WHERE table_name = %s AND column_name = %s", (tableName, columnName))
+        return result[0] if result is not None else None
+
+    def detectCompactLayout(self):
+        return self.getColumnType(self.blocksTableName, "block_hash") == "bytea"
+
+    def usesTxIds(self):
+        return self.txIdsUsed
+
+    def getTxIdColumns(self):
+        # BIGINT transaction ids, see BitcoinExporter.getTxId; tables that reference transactions by hash get an id
+        # column next to it, so that queries can join on integers instead of wide hashes
+        return [
+            (self.transactionsTableName, "tx_id"),
+            (self.outputsTableName, "output_tx_id"),
+            (self.outputsTableName, "output_spending_tx_id"),
+        ] + ([
+            (self.inputsTableName, "input_tx_id"),
+        ] if self.inputsTableUsed else [])
+
+    def useTxIds(self):
+        if self.txIdsUsed:
+            return
+        self.checkEmpty("transaction ids")
+        for tableName, columnName in self.getTxIdColumns():
+            self.dbAccess.queryNoReturnCommit("ALTER TABLE %s ADD COLUMN IF NOT EXISTS %s BIGINT" % (tableName, columnName))
+        self.txIdsUsed = True
+        if self.inputsTableUsed:
+            self.createOutputsView()
+
+    def usesAddressIds(self):
+        return self.addressIdsUsed
+
+    def getAddressesTableName(self):
+        return self.addressesTableName
+
+    def useAddressIds(self):
+        # addresses are stored once in a dictionary table and outputs reference them by BIGINT id, which makes outputs
+        # rows smaller and lets queries compare and count integers instead of strings
+        if self.addressIdsUsed:
+            return
+        self.checkEmpty("address ids")
+        self.dbAccess.queryNoReturnCommit("CREATE TABLE IF NOT EXISTS %s (\
+            address_id BIGSERIAL PRIMARY KEY, \
+            address VARCHAR(%s) UNIQUE \
+            )" % (self.addressesTableName, MAX_ADDRESS_LENGTH))
+        if self.inputsTableUsed:
+            self.dbAccess.queryNoReturnCommit("DROP VIEW IF EXISTS %s" % self.outputsViewName)
+        self.dbAccess.queryNoReturnCommit("ALTER TABLE %s DROP COLUMN IF EXISTS output_addresses" % self.outputsTableName)
+        self.dbAccess.queryNoReturnCommit("ALTER TABLE %s ADD COLUMN IF NOT EXISTS output_address_ids BIGINT[]" % self.outputsTableName)
+        self.addressIdsUsed = True
+        if self.inputsTableUsed:
+            self.createOutputsView()
+
+    def getSpendColumns(self):
+        # outputs columns that are filled when the output is spent
+        return ["output_spend_signature", "output_spending_tx_hash", "output_time_spent", "output_median_time_spent"] + \
+            (["output_spending_tx_id"] if self.txIdsUsed else [])
+
+    def getOutputColumns(self):
+        # address ids take the place of addresses, so positions of the other columns don't depend on the layout
+        return ["output_tx_hash", "output_index", "output_type",
+                "output_address_ids" if self.addressIdsUsed else "output_addresses", "output_script",
+                "output_value_satoshi", "output_time_created", "output_time_spent", "output_median_time_created",
+                "output_median_time_spent", "output_spend_signature", "output_spending_tx_hash"] + \
+            (["output_tx_id", "output_spending_tx_id"] if self.txIdsUsed else [])
+
+    def useCompactLayout(self):
+        # compact layout stores hashes as BYTEA and values as BIGINT, which makes rows and indexes about half as wide
+        # and joins on hashes cheaper; like the inputs table layout, it is chosen once for an empty database
+        if self.compactLayout:
+            return
+        self.checkEmpty("compact layout")
+        self.compactLayout = True
+        self.recreate()
+
+    def usesPartitions(self):
+        return self.partitioned
+
+    def getPartitionedTableNames(self):
+        return [self.transactionsTableName, self.outputsTableName]
+
+    def detectPartitions(self):
+        result = self.dbAccess.queryReturnOne("SELECT relkind FROM pg_class WHERE relname = %s", (self.outputsTableName,))
+        return result is not None and result[0] == "p"
+
+    def usePartitions(self):
+        # transactions and outputs are range partitioned by month of tx_time / output_time_created (PostgreSQL 11+):
+        # queries filtering on creation time only touch matching partitions, and old months can be vacuumed or
+        # reindexed one by one; partitions are created by the exporter as blocks of a new month arrive
+        if self.partitioned:
+            return
+        self.checkEmpty("partitioned layout")
+        self.partitioned = True
+        self.recreate()
+
+    def getPartitionName(self, tableName, month):
+        return "%s_y%04dm%02d" % (tableName, month.year, month.month)
+
+    def createPartitions(self, time):
+        # runs within the caller's transaction, so that the exporter can commit it together with the first rows
+        month = datetime(time.year, time.month, 1)
+        nextMonth = datetime(time.year + time.month // 12, time.month % 12 + 1, 1)
+        for tableName in self.getPartitionedTableNames():
+            self.dbAccess.queryNoReturnNoCommit("CREATE TABLE IF NOT EXISTS %s PARTITION OF %s FOR VALUES FROM ('%s') TO ('%s')" % (
+                self.getPartitionName(tableName, month), tableName, month.isoformat(" "), nextMonth.isoformat(" ")))
+
+    def getPartitions(self, tableName):
+        return [row[0] for row in self.dbAccess.queryReturnAll("SELECT c.relname FROM pg_inherits AS i \
+            JOIN pg_class AS c ON c.oid = i.inhrelid JOIN pg_class AS p ON p.oid = i.inhparent \
+            WHERE p.relname = %s ORDER BY c.relname", (tableName,))]
+
+    def getMonthPartitions(self, month):
+        return [self.getPartitionName(tableName, month) for tableName in self.getPartitionedTableNames()
+                if self.getPartitionName(tableName, month) in self.getPartitions(tableName)]
+
+    def recreate(self):
+        # drops the (empty) tables and creates them again with current layout settings, keeping optional layouts
+        inputsTableUsed, txIdsUsed, addressIdsUsed = self.inputsTableUsed, self.txIdsUsed, self.addressIdsUsed
+        blockStatsUsed = self.blockStatsUsed
+        self.drop()
+        self.init()
+        if inputsTableUsed:
+            self.useInputsTable()
+        if txIdsUsed:
+            self.useTxIds()
+        if addressIdsUsed:
+            self.useAddressIds()
+        if blockStatsUsed:
+            self.useBlockStats()
+
     def init(self):
         self.blocksTableName = self.asset + "_blocks"
         self.transactionsTableName = self.asset + "_transactions"
         self.outputsTableName = self.asset + "_outputs"
         self.coinbaseScriptsTableName = self.asset + "_coinbase_scripts"
+        if self.compactLayout is None:
+            self.compactLayout = self.detectCompactLayout()
+        if self.partitioned is None:
+            self.partitioned = self.detectPartitions()
+        # partitioned tables need the partition key in their primary keys
+        partitionClause = (lambda column: " PARTITION BY RANGE (%s)" % column) if self.partitioned else (lambda column: "")
+        self.hashType = "BYTEA" if self.compactLayout else "DECIMAL(%d)" % HASH_PRECISION
+        self.valueType = "BIGINT" if self.compactLayout else "DECIMAL(%d)" % OUTPUT_VALUE_PRECISION
 
         self.dbAccess.queryNoReturnCommit("CREATE TABLE IF NOT EXISTS %s (\
-            block_hash DECIMAL(%s) PRIMARY KEY, \
+            block_hash %s PRIMARY KEY, \
             block_height INTEGER, \
             block_size INTEGER, \
             block_time TIMESTAMP, \
             block_median_time TIMESTAMP, \
             block_difficulty DOUBLE PRECISION, \
             block_chainwork DECIMAL(%s) \
-            )" % (self.blocksTableName, HASH_PRECISION, CHAINWORK_PRECISION))
+            )" % (self.blocksTableName, self.hashType, CHAINWORK_PRECISION))
 
         self.dbAccess.queryNoReturnCommit("CREATE TABLE IF NOT EXISTS %s (\
-            tx_hash DECIMAL(%s) PRIMARY KEY, \
-            tx_block_hash DECIMAL(%s), \
+            tx_hash %s, \
+            tx_block_hash %s, \
             tx_size INTEGER, \
             tx_time TIMESTAMP, \
             tx_median_time TIMESTAMP, \
-            tx_coinbase BOOLEAN \
-            )" % (self.transactionsTableName, HASH_PRECISION, HASH_PRECISION))
+            tx_coinbase BOOLEAN, \
+            PRIMARY KEY(%s)\
+            )%s" % (self.transactionsTableName, self.hashType, self.hashType, self.getTransactionsPrimaryKey(),
+                    partitionClause("tx_time")))
 
         self.dbAccess.queryNoReturnCommit("CREATE TABLE IF NOT EXISTS %s (\
-            output_tx_hash DECIMAL(%s), \
+            output_tx_hash %s, \
             output_index INTEGER, \
             output_type SMALLINT, \
             output_addresses VARCHAR(%s)[], \
             output_script BYTEA, \
             output_spend_signature BYTEA, \
-            output_value_satoshi DECIMAL(%s), \
-            output_spending_tx_hash DECIMAL(%s), \
+            output_value_satoshi %s, \
+            output_spending_tx_hash %s, \
             output_time_created TIMESTAMP, \
             output_time_spent TIMESTAMP, \
             output_median_time_created TIMESTAMP, \
             output_median_time_spent TIMESTAMP, \
-            PRIMARY KEY(output_tx_hash, output_index)\
-            )" % (self.outputsTableName, HASH_PRECISION, MAX_ADDRESS_LENGTH, OUTPUT_VALUE_PRECISION, HASH_PRECISION))
+            PRIMARY KEY(%s)\
+            )%s" % (self.outputsTableName, self.hashType, MAX_ADDRESS_LENGTH, self.valueType, self.hashType,
+                    self.getOutputsPrimaryKey(), partitionClause("output_time_created")))
 
         self.dbAccess.queryNoReturnCommit("CREATE TABLE IF NOT EXISTS %s (\
-            coinbase_script_tx_hash DECIMAL(%s) PRIMARY KEY, \
+            coinbase_script_tx_hash %s PRIMARY KEY, \
             coinbase_script_hex BYTEA \
-            )" % (self.coinbaseScriptsTableName, HASH_PRECISION))
+            )" % (self.coinbaseScriptsTableName, self.hashType))
+
+        # inputs table layout is chosen once for an empty database (see useInputsTable) and detected afterwards
+        self.inputsTableName = self.asset + "_inputs"
+        self.outputsViewName = self.asset + "_outputs_view"
+        self.inputsTableUsed = self.inputsTableName in self.dbAccess.getTableNames()
+        self.txIdsUsed = self.getColumnType(self.transactionsTableName, "tx_id") is not None
+        self.addressesTableName = self.asset + "_addresses"
+        self.addressIdsUsed = self.getColumnType(self.outputsTableName, "output_address_ids") is not None
+        self.blockStatsTableName = self.asset + "_block_stats"
+        self.blockStatsUsed = self.blockStatsTableName in self.dbAccess.getTableNames()
+
+    def getBlockStatsTableName(self):
+        return self.blockStatsTableName
+
+    def usesBlockStats(self):
+        return self.blockStatsUsed
+
+    def useBlockStats(self):
+        # the exporter writes a row of totals and a fee sketch (see QuantileSketch) for every block, which daily
+        # metrics are rolled up from; can be enabled at any time, days with blocks exported before are computed as usual
+        self.dbAccess.queryNoReturnCommit("CREATE TABLE IF NOT EXISTS %s (\
+            block_stats_hash %s PRIMARY KEY, \
+            block_stats_time TIMESTAMP, \
+            block_stats_tx_count INTEGER, \
+            block_stats_size INTEGER, \
+            block_stats_output_sum %s, \
+            block_stats_fee_sum %s, \
+            block_stats_reward %s, \
+            block_stats_fee_sketch_keys INTEGER[], \
+            block_stats_fee_sketch_counts INTEGER[] \
+            )" % (self.blockStatsTableName, self.hashType, self.valueType, self.valueType, self.valueType))
+        self.dbAccess.queryNoReturnCommit("CREATE INDEX IF NOT EXISTS %s_block_stats_time_index ON %s(block_stats_time)" % (
+            self.asset, self.blockStatsTableName))
+        self.blockStatsUsed = True
+
+    def useInputsTable(self):
+        # spends are appended to a separate inputs table instead of updating outputs rows, so outputs are written once
+        # and never need vacuuming; queries read outputs through a view that joins both tables
+        if self.inputsTableUsed:
+            return
+        self.checkEmpty("inputs table layout")
+
+        self.dbAccess.queryNoReturnCommit("CREATE TABLE IF NOT EXISTS %s (\
+            input_spent_tx_hash %s, \
+            input_spent_index INTEGER, \
+            input_tx_hash %s, \
+            input_spend_signature BYTEA, \
+            input_time TIMESTAMP, \
+            input_median_time TIMESTAMP, \
+            PRIMARY KEY(input_spent_tx_hash, input_spent_index)\
+            )" % (self.inputsTableName, self.hashType, self.hashType))
+        if self.txIdsUsed:
+            self.dbAccess.queryNoReturnCommit("ALTER TABLE %s ADD COLUMN IF NOT EXISTS input_tx_id BIGINT" % self.inputsTableName)
+        self.inputsTableUsed = True
+        self.createOutputsView()
+
+    def createOutputsView(self):
+        inputColumns = {
+            "output_spend_signature": "input_spend_signature",
+            "output_spending_tx_hash": "input_tx_hash",
+            "output_time_spent": "input_time",
+            "output_median_time_spent": "input_median_time",
+            "output_spending_tx_id": "input_tx_id",
+        }
+        values = ["i.%s AS %s" % (inputColumns[column], column) if column in inputColumns else "o." + column
+                  for column in self.getOutputColumns()]
+        self.dbAccess.queryNoReturnCommit("DROP VIEW IF EXISTS %s" % self.outputsViewName)
+        self.dbAccess.queryNoReturnCommit("CREATE VIEW %s AS SELECT %s \
+            FROM %s AS o LEFT JOIN %s AS i \
+                ON i.input_spent_tx_hash = o.output_tx_hash AND i.input_spent_index = o.output_index" % (
+            self.outputsViewName, ", ".join(values), self.outputsTableName, self.inputsTableName))
 
     def drop(self):
         self.dropIndexes()
+        self.dbAccess.queryNoReturnCommit("DROP VIEW IF EXISTS %s" % (self.outputsViewName,))
+        self.dbAccess.queryNoReturnCommit("DROP TABLE IF EXISTS %s" % (self.inputsTableName,))
+        self.dbAccess.queryNoReturnCommit("DROP TABLE IF EXISTS %s" % (self.addressesTableName,))
+        self.dbAccess.queryNoReturnCommit("DROP TABLE IF EXISTS %s" % (self.blockStatsTableName,))
         self.dbAccess.queryNoReturnCommit("DROP TABLE IF EXISTS %s" % (self.coinbaseScriptsTableName,))
         self.dbAccess.queryNoReturnCommit("DROP TABLE IF EXISTS %s" % (self.outputsTableName,))
         self.dbAccess.queryNoReturnCommit("DROP TABLE IF EXISTS %s" % (self.transactionsTableName,))
         self.dbAccess.queryNoReturnCommit("DROP TABLE IF EXISTS %s" % (self.blocksTableName,))
 
     def addIndexes(self):
-        self.dbAccess.queryNoReturnCommit("CREATE INDEX %s_block_time_index ON %s_blocks(block_time)" % (self.asset, self.asset))
-        self.dbAccess.queryNoReturnCommit("CREATE INDEX %s_block_height_index ON %s_blocks(block_height)" % (self.asset, self.asset))
-        self.dbAccess.queryNoReturnCommit("CREATE INDEX %s_tx_time_index ON %s_transactions(tx_time)" % (self.asset, self.asset))
-        self.dbAccess.queryNoReturnCommit("CREATE INDEX %s_output_time_spent_index ON %s_outputs(output_time_spent)" % (self.asset, self.asset))
-        self.dbAccess.queryNoReturnCommit("CREATE INDEX %s_output_time_created_index ON %s_outputs(output_time_created)" % (self.asset, self.asset))
+        for _, statement in self.getIndexes():
+            self.dbAccess.queryNoReturnCommit(statement)
+
+    def setIndexProfile(self, indexProfile):
+        self.indexProfile = indexProfile
+
+    def getQueryColumns(self, columns):
+        # names under which metric queries read columns on optional layouts, see BitcoinQuery.txJoinColumn and
+        # LayoutQueryAccess
+        if self.txIdsUsed:
+            columns = [column[:-len("tx_hash")] + "tx_id" if column.endswith("tx_hash") else column for column in columns]
+        if self.addressIdsUsed:
+            columns = ["output_address_ids" if column == "output_addresses" else column for column in columns]
+        return ", ".join(columns)
+
+    def getTxIdIndexes(self):
+        # primary keys stay on hashes, as spends look up outputs by the hash of the spent transaction; these serve the
+        # joins of metric queries on ids
+        if not self.txIdsUsed:
+            return []
+        return [
+            ("tx_id", "CREATE INDEX %s_tx_id_index ON %s_transactions(tx_id)" % (self.asset, self.asset)),
+            ("output_tx_id", "CREATE INDEX %s_output_tx_id_index ON %s_outputs(output_tx_id)" % (self.asset, self.asset)),
+        ] + ([
+            ("input_tx_id", "CREATE INDEX %s_input_tx_id_index ON %s_inputs(input_tx_id)" % (self.asset, self.asset)),
+        ] if self.inputsTableUsed else [
+            ("output_spending_tx_id", "CREATE INDEX %s_output_spending_tx_id_index ON %s_outputs(output_spending_tx_id)" % (
+                self.asset, self.asset)),
+        ])
+
+    def getIndexes(self):
+        if self.indexProfile == "brin":
+            return self.getBrinIndexes() + self.getTxIdIndexes()
+        return [
+            ("block_time", "CREATE INDEX %s_block_time_index ON %s_blocks(block_time)" % (self.asset, self.asset)),
+            ("block_height", "CREATE INDEX %s_block_height_index ON %s_blocks(block_height)" % (self.asset, self.asset)),
+            ("tx_time", "CREATE INDEX %s_tx_time_index ON %s_transactions(tx_time)" % (self.asset, self.asset)),
+            ("output_time_spent", "CREATE INDEX %s_output_time_spent_index ON %s_outputs(output_time_spent)" % (self.asset, self.asset)),
+            ("output_time_created", "CREATE INDEX %s_output_time_created_index ON %s_outputs(output_time_created)" % (self.asset, self.asset)),
+        ] + ([
+            ("input_time", "CREATE INDEX %s_input_time_index ON %s_inputs(input_time)" % (self.asset, self.asset)),
+        ] if self.inputsTableUsed else []) + self.getTxIdIndexes()
+
+    def getBrinIndexes(self):
+        # rows are appended in block order, so BRIN indexes on creation times take a few pages and let day ranges
+        # be read as contiguous heap ranges; spent time is not append-ordered and gets a B-tree, which like the tx_time
+        # one includes every column the metric CTEs read from it, so those can be answered by index-only scans
+        # (on vacuumed tables); names match the default profile, so --drop-index removes either.
+        # INCLUDE needs PostgreSQL 11. Without the inputs table every spend UPDATE writes a new version of the output
+        # row wherever there is room, which breaks the creation time order BRIN relies on, so outputs get a B-tree then
+        if self.inputsTableUsed:
+            outputTimeCreatedIndex = "CREATE INDEX %s_output_time_created_index ON %s_outputs USING BRIN (output_time_created)"
+        else:
+            outputTimeCreatedIndex = "CREATE INDEX %s_output_time_created_index ON %s_outputs(output_time_created)"
+        return [
+            ("block_time", "CREATE INDEX %s_block_time_index ON %s_blocks USING BRIN (block_time)" % (self.asset, self.asset)),
+            ("block_height", "CREATE INDEX %s_block_height_index ON %s_blocks(block_height)" % (self.asset, self.asset)),
+            ("tx_time", "CREATE INDEX %s_tx_time_index ON %s_transactions(tx_time) INCLUDE (%s)" % (self.asset,
+                self.asset, self.getQueryColumns(["tx_hash", "tx_coinbase"]))),
+            ("output_time_spent", "CREATE INDEX %s_output_time_spent_index ON %s_outputs(output_time_spent) INCLUDE (%s)" % (
+                self.asset, self.asset, self.getQueryColumns(["output_spending_tx_hash", "output_index", "output_value_satoshi",
+                                                              "output_addresses"]))),
+            ("output_time_created", outputTimeCreatedIndex % (self.asset, self.asset)),
+        ] + ([
+            ("input_time", "CREATE INDEX %s_input_time_index ON %s_inputs USING BRIN (input_time)" % (self.asset, self.asset)),
+        ] if self.inputsTableUsed else [])
+
+    def getTransactionsPrimaryKey(self):
+        return "tx_hash, tx_time" if self.partitioned else "tx_hash"
+
+    def getOutputsPrimaryKey(self):
+        return "output_tx_hash, output_index, output_time_created" if self.partitioned else "output_tx_hash, output_index"
+
+    def getPrimaryKeys(self):
+        return [
+            (self.blocksTableName, "block_hash"),
+            (self.transactionsTableName, self.getTransactionsPrimaryKey()),
+            (self.outputsTableName, self.getOutputsPrimaryKey()),
+            (self.coinbaseScriptsTableName, "coinbase_script_tx_hash"),
+        ] + ([
+            (self.inputsTableName, "input_spent_tx_hash, input_spent_index"),
+        ] if self.inputsTableUsed else [])
+
+    def getDeferredSpendsTableName(self):
+        return self.asset + "_deferred_spends"
+
+    def prepareInitialSync(self):
+        # bulk load layout: no WAL and no primary keys on the big tables, spends are appended to a separate table instead
+        # of updating outputs; finishInitialSync* methods turn it back into the regular layout
+        for tableName, _ in self.getPrimaryKeys():
+            self.dbAccess.queryNoReturnCommit("ALTER TABLE %s DROP CONSTRAINT IF EXISTS %s_pkey" % (tableName, tableName))
+            # partitioned tables can't be unlogged
+            if not self.isPartitionedTable(tableName):
+                self.dbAccess.queryNoReturnCommit("ALTER TABLE %s SET UNLOGGED" % tableName)
+        # with the inputs table layout spends are append-only already, nothing to defer
+        if self.inputsTableUsed:
+            return
+        self.dbAccess.queryNoReturnCommit("CREATE UNLOGGED TABLE IF NOT EXISTS %s AS SELECT output_tx_hash, output_index, %s \
+            FROM %s WITH NO DATA" % (self.getDeferredSpendsTableName(), ", ".join(self.getSpendColumns()), self.outputsTableName))
+
+    def applyDeferredSpends(self):
+        # outputs are rewritten with a single join instead of millions of single-row updates; the swap is done in one
+        # transaction, so an interrupted run leaves either the old or the new table in place
+        outputsTableName = self.getOutputsTableName()
+        spendsTableName = self.getDeferredSpendsTableName()
+        newOutputsTableName = outputsTableName + "_spent"
+        if spendsTableName not in self.dbAccess.getTableNames():
+            return
+        if self.partitioned:
+            # partitioned outputs can't be swapped as a whole, spends are applied by one set-based UPDATE per partition
+            # instead; the updates can be repeated, so partitions are committed one by one
+            spendColumns = self.getSpendColumns()
+            for partitionName in self.getPartitions(outputsTableName):
+                self.dbAccess.queryNoReturnCommit("UPDATE %s AS o SET %s FROM %s AS s \
+                    WHERE o.output_tx_hash = s.output_tx_hash AND o.output_index = s.output_index" % (partitionName,
+                    ", ".join("%s = s.%s" % (column, column) for column in spendColumns), spendsTableName))
+            self.dbAccess.queryNoReturnCommit("DROP TABLE %s" % spendsTableName)
+            return
+        self.dbAccess.queryNoReturnNoCommit("DROP TABLE IF EXISTS %s" % newOutputsTableName)
+        self.dbAccess.queryNoReturnNoCommit("CREATE UNLOGGED TABLE %s (LIKE %s INCLUDING DEFAULTS)" % (newOutputsTableName, outputsTableName))
+        outputColumns = self.getOutputColumns()
+        spendColumns = self.getSpendColumns()
+        values = ["COALESCE(o.%s, s.%s)" % (column, column) if column in spendColumns else "o." + column
+                  for column in outputColumns]
+        self.dbAccess.queryNoReturnNoCommit("INSERT INTO %s (%s) SELECT %s \
+            FROM %s AS o LEFT JOIN %s AS s \
+                ON o.output_tx_hash = s.output_tx_hash AND o.output_index = s.output_index" % (newOutputsTableName,
+                ", ".join(outputColumns), ", ".join(values), outputsTableName, spendsTableName))
+        self.dbAccess.queryNoReturnNoCommit("DROP TABLE %s" % outputsTableName)
+        self.dbAccess.queryNoReturnNoCommit("ALTER TABLE %s RENAME TO %s" % (newOutputsTableName, outputsTableName))
+        self.dbAccess.queryNoReturnNoCommit("DROP TABLE %s" % spendsTableName)
+        self.dbAccess.commit()
+
+    def isPartitionedTable(self, tableName):
+        return self.partitioned and tableName in self.getPartitionedTableNames()
+
+    def setTableLogged(self, tableName):
+        if not self.isPartitionedTable(tableName):
+            self.dbAccess.queryNoReturnCommit("ALTER TABLE %s SET LOGGED" % tableName)
+
+    def addPrimaryKey(self, tableName, columns):
+        self.dbAccess.queryNoReturnNoCommit("ALTER TABLE %s DROP CONSTRAINT IF EXISTS %s_pkey" % (tableName, tableName))
+        self.dbAccess.queryNoReturnNoCommit("ALTER TABLE %s ADD CONSTRAINT %s_pkey PRIMARY KEY (%s)" % (tableName, tableName, columns))
+        self.dbAccess.commit()
 
     def dropIndexes(self):
+        self.dbAccess.queryNoReturnCommit("DROP INDEX IF EXISTS %s_input_tx_id_index" % (self.asset,))
+        self.dbAccess.queryNoReturnCommit("DROP INDEX IF EXISTS %s_output_spending_tx_id_index" % (self.asset,))
+        self.dbAccess.queryNoReturnCommit("DROP INDEX IF EXISTS %s_output_tx_id_index" % (self.asset,))
+        self.dbAccess.queryNoReturnCommit("DROP INDEX IF EXISTS %s_tx_id_index" % (self.asset,))
         self.dbAccess.queryNoReturnCommit("DROP INDEX IF EXISTS %s_output_time_created_index" % (self.asset,))
+        self.dbAccess.queryNoReturnCommit("DROP INDEX IF EXISTS %s_input_time_index" % (self.asset,))
         self.dbAccess.queryNoReturnCommit("DROP INDEX IF EXISTS %s_output_time_spent_index" % (self.asset,))
         self.dbAccess.queryNoReturnCommit("DROP INDEX IF EXISTS %s_tx_time_index" % (self.asset,))
         self.dbAccess.queryNoReturnCommit("DROP INDEX IF EXISTS %s_block_height_index" % (self.asset,))
         self.dbAccess.queryNoReturnCommit("DROP INDEX IF EXISTS %s_block_time_index" % (self.asset,))
 
+    def getTableStats(self):
+        # size on disk and dead rows of the asset tables, to compare bloat of storage layouts
+        return self.dbAccess.queryReturnAll("SELECT relname, pg_total_relation_size(relid), n_live_tup, n_dead_tup \
+            FROM pg_stat_user_tables WHERE relname LIKE %s ORDER BY relname", (self.asset + "\\_%",))
+
     def vacuum(self):
+        self.vacuumTables([self.getOutputsTableName()] + ([self.getInputsTableName()] if self.inputsTableUsed else []))
+
+    def vacuumTables(self, tableNames):
         isolationLevel = self.dbAccess.connection.isolation_level
         self.dbAccess.connection.set_isolation_level(0)
-        self.dbAccess.queryNoReturnNoCommit("VACUUM ANALYZE %s" % self.getOutputsTableName())
+        for tableName in tableNames:
+            self.dbAccess.queryNoReturnNoCommit("VACUUM ANALYZE %s" % tableName)
         self.dbAccess.connection.set_isolation_level(isolationLevel)
 
+    def reindexTables(self, tableNames):
+        for tableName in tableNames:
+            self.dbAccess.queryNoReturnCommit("REINDEX TABLE %s" % tableName)
+
 
 class ZcashSchema(BitcoinSchema):
 
@@ -110,31 +522,38 @@ class ZcashSchema(BitcoinSchema):
         self.joinSplitsTableName = self.asset + "_joinsplits"
         self.dbAccess.queryNoReturnCommit("CREATE TABLE IF NOT EXISTS %s (\
             id SERIAL PRIMARY KEY, \
-            joinsplit_tx_hash DECIMAL(%s), \
-            joinsplit_value_old DECIMAL(%s), \
-            joinsplit_value_new DECIMAL(%s), \
+            joinsplit_tx_hash %s, \
+            joinsplit_value_old %s, \
+            joinsplit_value_new %s, \
             joinsplit_time TIMESTAMP \
-            )" % (self.joinSplitsTableName, HASH_PRECISION, OUTPUT_VALUE_PRECISION, OUTPUT_VALUE_PRECISION))
+            )" % (self.joinSplitsTableName, self.hashType, self.valueType, self.valueType))
 
         self.saplingPaymentTableName = self.asset + "_sapling_payments"
         self.dbAccess.queryNoReturnCommit("CREATE TABLE IF NOT EXISTS %s (\
-            sapling_payment_tx_hash DECIMAL(%s), \
-            sapling_payment_value_balance DECIMAL(%s), \
+            sapling_payment_tx_hash %s, \
+            sapling_payment_value_balance %s, \
             sapling_payment_input_count INTEGER, \
             sapling_payment_output_count INTEGER, \
             sapling_payment_time TIMESTAMP, \
             PRIMARY KEY(sapling_payment_tx_hash) \
-        )" % (self.saplingPaymentTableName, HASH_PRECISION, OUTPUT_VALUE_PRECISION))
+        )" % (self.saplingPaymentTableName, self.hashType, self.valueType))
 
     def drop(self):
         self.dbAccess.queryNoReturnCommit("DROP TABLE IF EXISTS %s" % (self.saplingPaymentTableName,))
         self.dbAccess.queryNoReturnCommit("DROP TABLE IF EXISTS %s" % (self.joinSplitsTableName,))
         super(ZcashSchema, self).drop()
 
-    def addIndexes(self):
-        super(ZcashSchema, self).addIndexes()
-        self.dbAccess.queryNoReturnCommit("CREATE INDEX %s_joinsplit_time_index ON %s_joinsplits(joinsplit_time)" % (self.asset, self.asset))
-        self.dbAccess.queryNoReturnCommit("CREATE INDEX %s_sapling_payment_time_index ON %s_sapling_payments(sapling_payment_time)" % (self.asset, self.asset))
+    def getTxIdColumns(self):
+        return super(ZcashSchema, self).getTxIdColumns() + [
+            (self.joinSplitsTableName, "joinsplit_tx_id"),
+            (self.saplingPaymentTableName, "sapling_payment_tx_id"),
+        ]
+
+    def getIndexes(self):
+        return super(ZcashSchema, self).getIndexes() + [
+            ("joinsplit_time", "CREATE INDEX %s_joinsplit_time_index ON %s_joinsplits(joinsplit_time)" % (self.asset, self.asset)),
+            ("sapling_payment_time", "CREATE INDEX %s_sapling_payment_time_index ON %s_sapling_payments(sapling_payment_time)" % (self.asset, self.asset)),
+        ]
 
     def dropIndexes(self):
         self.dbAccess.queryNoReturnCommit("DROP INDEX IF EXISTS %s_sapling_payment_time_index" % (self.asset,))
@@ -157,27 +576,34 @@ class PivxSchema(BitcoinSchema):
 
         self.dbAccess.queryNoReturnCommit("CREATE TABLE IF NOT EXISTS %s (\
             id SERIAL PRIMARY KEY, \
-            zerocoin_mint_tx_hash DECIMAL(%s), \
-            zerocoin_mint_value DECIMAL(%s), \
+            zerocoin_mint_tx_hash %s, \
+            zerocoin_mint_value %s, \
             zerocoin_mint_time TIMESTAMP \
-            )" % (self.zerocoinMintsTableName, HASH_PRECISION, OUTPUT_VALUE_PRECISION))
+            )" % (self.zerocoinMintsTableName, self.hashType, self.valueType))
 
         self.dbAccess.queryNoReturnCommit("CREATE TABLE IF NOT EXISTS %s (\
             id SERIAL PRIMARY KEY, \
-            zerocoin_spend_tx_hash DECIMAL(%s), \
-            zerocoin_spend_value DECIMAL(%s), \
+            zerocoin_spend_tx_hash %s, \
+            zerocoin_spend_value %s, \
             zerocoin_spend_time TIMESTAMP \
-            )" % (self.zerocoinSpendsTableName, HASH_PRECISION, OUTPUT_VALUE_PRECISION))
+            )" % (self.zerocoinSpendsTableName, self.hashType, self.valueType))
 
     def drop(self):
         self.dbAccess.queryNoReturnCommit("DROP TABLE IF EXISTS %s" % (self.zerocoinSpendsTableName,))
         self.dbAccess.queryNoReturnCommit("DROP TABLE IF EXISTS %s" % (self.zerocoinMintsTableName,))
         super(PivxSchema, self).drop()
 
-    def addIndexes(self):
-        super(PivxSchema, self).addIndexes()
-        self.dbAccess.queryNoReturnCommit("CREATE INDEX %s_zerocoin_mint_time_index ON %s_zerocoin_mints(zerocoin_mint_time)" % (self.asset, self.asset))
-        self.dbAccess.queryNoReturnCommit("CREATE INDEX %s_zerocoin_spend_time_index ON %s_zerocoin_spends(zerocoin_spend_time)" % (self.asset, self.asset))
+    def getTxIdColumns(self):
+        return super(PivxSchema, self).getTxIdColumns() + [
+            (self.zerocoinMintsTableName, "zerocoin_mint_tx_id"),
+            (self.zerocoinSpendsTableName, "zerocoin_spend_tx_id"),
+        ]
+
+    def getIndexes(self):
+        return super(PivxSchema, self).getIndexes() + [
+            ("zerocoin_mint_time", "CREATE INDEX %s_zerocoin_mint_time_index ON %s_zerocoin_mints(zerocoin_mint_time)" % (self.asset, self.asset)),
+            ("zerocoin_spend_time", "CREATE INDEX %s_zerocoin_spend_time_index ON %s_zerocoin_spends(zerocoin_spend_time)" % (self.asset, self.asset)),
+        ]
 
     def dropIndexes(self):
         self.dbAccess.queryNoReturnCommit("DROP INDEX IF EXISTS %s_zerocoin_spend_time_index" % (self.asset,))
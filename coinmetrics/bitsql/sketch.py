@@ -0,0 +1,102 @@
+import math
+from coinmetrics.bitsql.constants import SKETCH_RELATIVE_ACCURACY, HLL_PRECISION
+
+
+class QuantileSketch(object):
+    # log-bucketed histogram (as in DDSketch): a value is counted in the bucket of its logarithm base gamma, so
+    # quantiles are estimated within the relative accuracy and sketches of blocks merge by adding bucket counts.
+    # Bucket 0 holds values below 1 (e.g. zero fees), bucket k > 0 holds values in (gamma^(k-2), gamma^(k-1)].
+
+    def __init__(self, relativeAccuracy=SKETCH_RELATIVE_ACCURACY):
+        self.gamma = (1 + relativeAccuracy) / (1 - relativeAccuracy)
+        self.logGamma = math.log(self.gamma)
+        self.buckets = {}
+        self.count = 0
+
+    def getKey(self, value):
+        if value < 1:
+            return 0
+        return int(math.ceil(math.log(value) / self.logGamma)) + 1
+
+    def getValue(self, key):
+        if key == 0:
+            return 0
+        return 2 * self.gamma ** (key - 1) / (self.gamma + 1)
+
+    def add(self, value):
+        self.addBuckets([self.getKey(value)], [1])
+
+    def addBuckets(self, keys, counts):
+        for key, count in zip(keys, counts):
+            self.buckets[key] = self.buckets.get(key, 0) + count
+            self.count += count
+
+    def getBuckets(self):
+        keys = sorted(self.buckets.keys())
+        return keys, [self.buckets[key] for key in keys]
+
+    def getQuantile(self, quantile):
+        # the value of rank quantile * (count - 1) within the relative accuracy, like percentile_disc; percentile_cont
+        # additionally interpolates between the two values around the rank
+        if self.count == 0:
+            return None
+        rank = quantile * (self.count - 1)
+        seen = 0
+        for key in sorted(self.buckets.keys()):
+            seen += self.buckets[key]
+            if seen > rank:
+                return self.getValue(key)
+
+
+def getQuantileSketchQuery(valuesQuery, relativeAccuracy=SKETCH_RELATIVE_ACCURACY):
+    # (key, count) buckets of a QuantileSketch of the single column of valuesQuery; aggregating by key keeps memory
+    # at the number of buckets instead of sorting all values
+    logGamma = QuantileSketch(relativeAccuracy).logGamma
+    return "\
+        SELECT \
+            CASE WHEN value < 1 THEN 0 ELSE ceil(ln(value) / " + repr(logGamma) + ")::INTEGER + 1 END AS bucket_key, \
+            count(*) \
+        FROM (" + valuesQuery + ") sketch_values (value) \
+        GROUP BY 1"
+
+
+def getHllRegistersQuery(addressesQuery, precision=HLL_PRECISION):
+    # (register, rank) rows of a HyperLogLog sketch of the address column of addressesQuery: the low bits of a 32-bit
+    # hash of the address select the register, the rank is the position of the first set bit in the remaining bits
+    hashBits = 32 - precision
+    return "\
+        SELECT \
+            h & " + str((1 << precision) - 1) + ", \
+            max(" + str(hashBits + 1) + " - length(ltrim((h >> " + str(precision) + ")::bit(" + str(hashBits) + ")::text, '0'))) \
+        FROM (\
+            SELECT \
+                hashtext(address::text)::bigint & 4294967295 AS h \
+            FROM (" + addressesQuery + ") addresses) hashes \
+        GROUP BY 1"
+
+
+class HyperLogLog(object):
+    # registers of a HyperLogLog sketch, computed in SQL by getHllRegistersQuery; sketches of days merge by taking the
+    # maximum of every register, so counts of any span of days come from the stored daily sketches
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = [0] * (1 << precision)
+
+    def setRanks(self, rows):
+        for register, rank in rows:
+            self.registers[register] = max(self.registers[register], rank)
+
+    def merge(self, registers):
+        self.registers = [max(a, b) for a, b in zip(self.registers, registers)]
+
+    def getEstimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros > 0:
+            estimate = m * math.log(float(m) / zeros)
+        elif estimate > (1 << 32) / 30.0:
+            estimate = -(1 << 32) * math.log(1 - estimate / (1 << 32))
+        return int(round(estimate))
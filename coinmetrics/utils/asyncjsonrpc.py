@@ -0,0 +1,51 @@
+import json
+import aiohttp
+from coinmetrics.utils.jsonrpc import RpcCallFailedException, parseRpcResponse
+
+
+class AsyncJsonRpcCaller(object):
+
+    def __init__(self, url, headers, tlsVerify=True, maxConnections=8):
+        self.url = url
+        self.headers = headers
+        self.tlsVerify = tlsVerify
+        self.maxConnections = maxConnections
+        self.session = None
+
+    @staticmethod
+    def fromJsonRpcCaller(caller, maxConnections=8):
+        return AsyncJsonRpcCaller(caller.url, caller.headers, caller.tls and caller.tlsVerify, maxConnections)
+
+    async def makeRpcCall(self, payload):
+        if self.session is None:
+            # session must be created from within a running event loop
+            connector = aiohttp.TCPConnector(limit=self.maxConnections, ssl=None if self.tlsVerify else False)
+            self.session = aiohttp.ClientSession(connector=connector, headers=self.headers)
+
+        try:
+            async with self.session.post(self.url, data=payload) as response:
+                status = response.status
+                content = await response.read()
+        except Exception as e:
+            raise RpcCallFailedException(e)
+
+        if status != 200:
+            raise RpcCallFailedException("Invalid status code: %s" % status)
+
+        return parseRpcResponse(json.loads(content.decode(), parse_float=lambda f: f))
+
+    async def call(self, method, params=None):
+        if params is None:
+            params = []
+        payload = json.dumps({"jsonrpc": "2.0", "id": "0", "method": method, "params": params})
+        return await self.makeRpcCall(payload)
+
+    async def bulkCall(self, methodParamsTuples):
+        payload = json.dumps([{"jsonrpc": "2.0", "id": "0", "method": method, "params": params}
+                              for method, params in methodParamsTuples])
+        return await self.makeRpcCall(payload)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
@@ -0,0 +1,25 @@
+import hashlib
+
+ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def encode(data: bytes) -> str:
+    value = int.from_bytes(data, byteorder="big")
+    result = []
+    while value > 0:
+        value, remainder = divmod(value, 58)
+        result.append(ALPHABET[remainder])
+
+    leadingZeros = 0
+    for byte in data:
+        if byte != 0:
+            break
+        leadingZeros += 1
+
+    return ALPHABET[0] * leadingZeros + "".join(reversed(result))
+
+
+def encodeCheck(version: bytes, payload: bytes) -> str:
+    data = version + payload
+    checksum = hashlib.sha256(hashlib.sha256(data).digest()).digest()[:4]
+    return encode(data + checksum)
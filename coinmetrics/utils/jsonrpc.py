@@ -2,15 +2,38 @@ import requests
 import json
 import base64
 import time
+import queue
+import threading
+from requests.adapters import HTTPAdapter
 
 
 class RpcCallFailedException(Exception):
     pass
 
 
+def parseRpcResponse(responseJson):
+    if type(responseJson) != list:
+        if "error" in responseJson and responseJson["error"] is not None:
+            raise RpcCallFailedException("RPC call error: %s" % responseJson["error"])
+        else:
+            return responseJson["result"]
+    else:
+        result = []
+        for subResult in responseJson:
+            if "error" in subResult and subResult["error"] is not None:
+                raise RpcCallFailedException("RPC call error: %s" % subResult["error"])
+            else:
+                result.append(subResult["result"])
+        return result
+
+
+def parseRpcResponseBody(body):
+    return parseRpcResponse(json.loads(body, parse_float=lambda f: f))
+
+
 class JsonRpcCaller(object):
 
-    def __init__(self, host, port, user, password, queryPath="", tls=False, tlsVerify=True):
+    def __init__(self, host, port, user, password, queryPath="", tls=False, tlsVerify=True, poolSize=1):
         self.host = host
         self.port = str(port)
         self.user = user
@@ -19,46 +42,96 @@ class JsonRpcCaller(object):
         self.tls = tls
         self.tlsVerify = tlsVerify
 
+        protocol = "https" if self.tls else "http"
+        self.url = "{0}://{1}:{2}/{3}".format(protocol, self.host, self.port, self.queryPath)
+        authString = base64.b64encode("{0}:{1}".format(self.user, self.password).encode()).decode()
+        self.headers = {'content-type': 'application/json', 'Authorization': 'Basic ' + authString}
+
+        # sessions are created lazily, up to poolSize of them, and each keeps a single persistent connection
+        assert poolSize > 0, "pool size should be positive"
+        self.poolSize = poolSize
+        self.sessions = queue.LifoQueue()
+        self.adapters = []
+        self.requestCount = 0
+        self.lock = threading.Lock()
+
     def getAddress(self):
         return self.host + ":" + self.port
 
+    def getConnectionStats(self):
+        with self.lock:
+            requestCount = self.requestCount
+            adapters = list(self.adapters)
+        connectionCount = 0
+        for adapter in adapters:
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    connectionCount += pool.num_connections
+        return {
+            "sessions": len(adapters),
+            "requests": requestCount,
+            "connections": connectionCount,
+            "reused": max(requestCount - connectionCount, 0),
+        }
+
     def makeRpcCall(self, headers, payload):
+        return parseRpcResponseBody(self.makeRawRpcCall(headers, payload))
+
+    def makeRawRpcCall(self, headers, payload):
+        # returns response body as is, so that it can be decoded elsewhere (i.e. in another process)
+        session = self._acquireSession()
+        with self.lock:
+            self.requestCount += 1
         try:
-            protocol = "https" if self.tls else "http"
-            response = requests.post("{0}://{1}:{2}/{3}".format(protocol, self.host, self.port, self.queryPath),
-                                     headers=headers, data=payload, verify=(self.tls and self.tlsVerify))
+            response = session.post(self.url, headers=headers, data=payload)
         except Exception as e:
             raise RpcCallFailedException(e)
+        finally:
+            self._releaseSession(session)
 
         if response.status_code != 200:
             raise RpcCallFailedException("Invalid status code: %s" % response.status_code)
 
-        responseJson = response.json(parse_float=lambda f: f)
-        if type(responseJson) != list:
-            if "error" in responseJson and responseJson["error"] is not None:
-                raise RpcCallFailedException("RPC call error: %s" % responseJson["error"])
-            else:
-                return responseJson["result"]
-        else:
-            result = []
-            for subResult in responseJson:
-                if "error" in subResult and subResult["error"] is not None:
-                    raise RpcCallFailedException("RPC call error: %s" % subResult["error"])
-                else:
-                    result.append(subResult["result"])
-            return result
+        return response.content
 
     def call(self, method, params=None):
+        return parseRpcResponseBody(self.callRaw(method, params))
+
+    def bulkCall(self, methodParamsTuples):
+        return parseRpcResponseBody(self.bulkCallRaw(methodParamsTuples))
+
+    def callRaw(self, method, params=None):
         if params is None:
             params = []
-        authString = str(base64.b64encode("{0}:{1}".format(self.user, self.password).encode()))[2:-1]
-        headers = {'content-type': 'application/json', 'Authorization': 'Basic ' + (authString)}
         payload = json.dumps({"jsonrpc": "2.0", "id": "0", "method": method, "params": params})
-        return self.makeRpcCall(headers, payload)
+        return self.makeRawRpcCall(self.headers, payload)
 
-    def bulkCall(self, methodParamsTuples):
-        authString = str(base64.b64encode("{0}:{1}".format(self.user, self.password).encode()))[2:-1]
-        headers = {'content-type': 'application/json', 'Authorization': 'Basic ' + (authString)}
+    def bulkCallRaw(self, methodParamsTuples):
         payload = json.dumps([{"jsonrpc": "2.0", "id": "0", "method": method, "params": params}
                               for method, params in methodParamsTuples])
-        return self.makeRpcCall(headers, payload)
+        return self.makeRawRpcCall(self.headers, payload)
+
+    def _acquireSession(self):
+        try:
+            return self.sessions.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.lock:
+            if len(self.adapters) < self.poolSize:
+                return self._createSession()
+
+        return self.sessions.get()
+
+    def _releaseSession(self, session):
+        self.sessions.put(session)
+
+    def _createSession(self):
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        session = requests.Session()
+        session.mount(self.url, adapter)
+        session.verify = self.tls and self.tlsVerify
+        self.adapters.append(adapter)
+        return session
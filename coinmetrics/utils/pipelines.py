@@ -15,10 +15,41 @@ class AtomicCounter(object):
         with self.lock:
             self.value += 1
 
+    def dec(self):
+        with self.lock:
+            self.value -= 1
+
     def get(self):
         return self.value
 
 
+class AdaptiveBatchSize(object):
+
+    def __init__(self, targetSize, minBatchSize, maxBatchSize, initialBatchSize=None, smoothing=0.5):
+        self.targetSize = targetSize
+        self.minBatchSize = minBatchSize
+        self.maxBatchSize = maxBatchSize
+        self.batchSize = initialBatchSize if initialBatchSize is not None else minBatchSize
+        self.smoothing = smoothing
+        self.averageItemSize = None
+        self.lock = threading.Lock()
+
+    def observe(self, itemCount, totalSize):
+        if itemCount == 0:
+            return
+        with self.lock:
+            itemSize = float(max(totalSize, 1)) / itemCount
+            if self.averageItemSize is None:
+                self.averageItemSize = itemSize
+            else:
+                self.averageItemSize = self.smoothing * self.averageItemSize + (1.0 - self.smoothing) * itemSize
+            self.batchSize = int(self.targetSize / self.averageItemSize)
+            self.batchSize = max(self.minBatchSize, min(self.maxBatchSize, self.batchSize))
+
+    def get(self):
+        return self.batchSize
+
+
 class LinearMultithreadedPipeline(object):
 
     def __init__(self, workersCount, proc, name):
@@ -29,11 +60,13 @@ class LinearMultithreadedPipeline(object):
         self.name = name
         self.exceptions = []
         self.onExecuted = EventEmitter()
+        self.pending = AtomicCounter(0)
 
     def __str__(self):
         return self.name
 
     def pushTask(self, task, taskIndex):
+        self.pending.inc()
         self.executor.submit(self._executeTask, task, taskIndex)
 
     def shutdown(self):
@@ -42,15 +75,71 @@ class LinearMultithreadedPipeline(object):
     def faulted(self):
         return len(self.exceptions) > 0
 
+    def getPendingCount(self):
+        # tasks pushed but not yet finished, including the ones being executed
+        return self.pending.get()
+
     def _executeTask(self, task, taskIndex):
+        try:
+            if not self.stopSignal():
+                try:
+                    result = self.proc(task, self.stopSignal)
+                    self.onExecuted.trigger(result, taskIndex)
+                except:
+                    self.exceptions.append((taskIndex, traceback.format_exc()))
+        finally:
+            self.pending.dec()
+
+
+class LinearMultiprocessPipeline(object):
+    # same interface as LinearMultithreadedPipeline, but tasks are executed in worker processes, for CPU-bound stages
+    # that don't scale with threads because of the GIL. proc, tasks and results must be picklable; proc is called as
+    # proc(task), since stop signal can't be passed to another process. Per-process state (i.e. objects that are
+    # expensive to pickle with every task) should be created lazily by proc and cached in a module-level variable.
+
+    def __init__(self, workersCount, proc, name):
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=workersCount)
+        self.proc = proc
+        self.workersCount = workersCount
+        self.stopSignal = None
+        self.name = name
+        self.exceptions = []
+        self.onExecuted = EventEmitter()
+
+    def __str__(self):
+        return self.name
+
+    def pushTask(self, task, taskIndex):
+        if not self.stopSignal():
+            future = self.executor.submit(self.proc, task)
+            future.add_done_callback(lambda future: self._onTaskDone(future, taskIndex))
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+    def faulted(self):
+        return len(self.exceptions) > 0
+
+    def _onTaskDone(self, future, taskIndex):
         if not self.stopSignal():
             try:
-                result = self.proc(task, self.stopSignal)
+                result = future.result()
                 self.onExecuted.trigger(result, taskIndex)
             except:
                 self.exceptions.append((taskIndex, traceback.format_exc()))
 
 
+class UnorderedConnector(object):
+
+    def __init__(self, source, destination):
+        self.source = source
+        self.destination = destination
+        self.source.onExecuted.subscribe(self._onSourceReceived)
+
+    def _onSourceReceived(self, result, taskIndex):
+        self.destination.pushTask(result, taskIndex)
+
+
 class OrderingConnector(object):
 
     def __init__(self, source, destination):
@@ -1,5 +1,35 @@
+import io
 import psycopg2
 import psycopg2.extras
+from datetime import datetime
+
+COPY_TEXT_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def copyTextValue(value):
+    # value formatted for COPY text format, see https://www.postgresql.org/docs/current/sql-copy.html
+    if value is None:
+        return "\\N"
+    elif value is True:
+        return "t"
+    elif value is False:
+        return "f"
+    elif isinstance(value, (int, float)):
+        return str(value)
+    elif isinstance(value, datetime):
+        return value.isoformat(" ")
+    elif isinstance(value, (bytes, bytearray)):
+        return "\\\\x" + value.hex()
+    elif isinstance(value, list):
+        items = []
+        for item in value:
+            if item is None:
+                items.append("NULL")
+            else:
+                items.append('"' + str(item).replace("\\", "\\\\").replace('"', '\\"') + '"')
+        return ("{" + ",".join(items) + "}").translate(COPY_TEXT_ESCAPES)
+    else:
+        return str(value).translate(COPY_TEXT_ESCAPES)
 
 
 class PostgresAccess(object):
@@ -29,9 +59,21 @@ class PostgresAccess(object):
     def executeValues(self, sql, rows, batchSize):
         return psycopg2.extras.execute_values(self.cursor, sql, rows, page_size=batchSize)
 
+    def copyFrom(self, table, columns, rows):
+        # bulk insert with COPY: rows are streamed to the server as is, without per-row statement parsing
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(copyTextValue(value) for value in row))
+            buffer.write("\n")
+        buffer.seek(0)
+        self.cursor.copy_expert("COPY %s (%s) FROM STDIN" % (table, ", ".join(columns)), buffer)
+
     def commit(self):
         self.connection.commit()
 
+    def rollback(self):
+        self.connection.rollback()
+
     def close(self):
         if self.cursor is not None:
             self.cursor.close()
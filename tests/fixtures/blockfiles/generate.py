@@ -0,0 +1,62 @@
+# writes the blk*.dat fixture: bitcoin genesis followed by synthetic blocks stored out of height order, a stale branch
+# at height 2 and xor obfuscation of bitcoin core 28+
+import hashlib
+import os
+import struct
+
+MAGIC = bytes.fromhex("f9beb4d9")
+XOR_KEY = bytes.fromhex("5a0f3c96e1d2b487")
+BITS = 0x1d00ffff
+GENESIS = bytes.fromhex(
+    "0100000000000000000000000000000000000000000000000000000000000000000000003ba3edfd7a7b12b27ac72c3e67768f617fc81bc38"
+    "88a51323a9fb8aa4b1e5e4a29ab5f49ffff001d1dac2b7c0101000000010000000000000000000000000000000000000000000000000000000"
+    "000000000ffffffff4d04ffff001d0104455468652054696d65732030332f4a616e2f32303039204368616e63656c6c6f72206f6e206272696e"
+    "6b206f66207365636f6e64206261696c6f757420666f722062616e6b73ffffffff0100f2052a01000000434104678afdb0fe5548271967f1a67"
+    "130b7105cd6a828e03909a67962e0ea1f61deb649f6bc3f4cef38c4f35504e51ec112de5c384df7ba0b8d578a4c702b6bf11d5fac00000000")
+
+
+def doubleSha256(data):
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+
+
+def makeBlock(prevHash, height, time, tag):
+    scriptSig = bytes([3]) + height.to_bytes(3, "little") + bytes([len(tag)]) + tag
+    script = b"\x76\xa9\x14" + hashlib.sha256(tag).digest()[:20] + b"\x88\xac"
+    tx = struct.pack("<I", 1) + b"\x01" + b"\x00" * 32 + b"\xff\xff\xff\xff" + bytes([len(scriptSig)]) + scriptSig + \
+        b"\xff\xff\xff\xff" + b"\x01" + struct.pack("<Q", 50 * 100000000) + bytes([len(script)]) + script + b"\x00" * 4
+    header = struct.pack("<i32s32sIII", 1, prevHash, doubleSha256(tx), time, BITS, height)
+    return header + b"\x01" + tx
+
+
+def blockHash(block):
+    return doubleSha256(block[:80])
+
+
+def record(block):
+    return MAGIC + struct.pack("<I", len(block)) + block
+
+
+def obfuscate(data):
+    return bytes(b ^ XOR_KEY[i % len(XOR_KEY)] for i, b in enumerate(data))
+
+
+def main():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    block1 = makeBlock(blockHash(GENESIS), 1, 1231470000, b"main 1")
+    block2 = makeBlock(blockHash(block1), 2, 1231470600, b"main 2")
+    stale2 = makeBlock(blockHash(block1), 2, 1231470700, b"stale 2")
+    block3 = makeBlock(blockHash(block2), 3, 1231471200, b"main 3")
+    files = [
+        record(GENESIS) + record(block2) + record(block1) + record(stale2),
+        record(block3),
+    ]
+    for number, data in enumerate(files):
+        with open(os.path.join(directory, "blk%05d.dat" % number), "wb") as f:
+            # the last file ends with preallocated space that was never written
+            f.write(obfuscate(data) + (b"\x00" * 64 if number == len(files) - 1 else b""))
+    with open(os.path.join(directory, "xor.dat"), "wb") as f:
+        f.write(XOR_KEY)
+
+
+if __name__ == "__main__":
+    main()
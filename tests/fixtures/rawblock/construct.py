@@ -0,0 +1,285 @@
+# builds the *_constructed.json fixtures: blocks serialized by hand in each chain's format, together with the
+# verbose JSON a node reports for them. Nothing here is shared with coinmetrics.bitsql.rawblock, so the raw decoder
+# is checked against an independent encoder. Blocks recorded from real nodes (see record.py) should be preferred
+# whenever a node is at hand.
+import hashlib
+import json
+import os
+import re
+import struct
+
+COIN = 100000000
+ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+FIXTURES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def sha256d(data):
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+
+
+def hash160(data):
+    return hashlib.new("ripemd160", hashlib.sha256(data).digest()).digest()
+
+
+def base58Check(version, payload):
+    data = bytes([version]) + payload
+    data += sha256d(data)[:4]
+    number = int.from_bytes(data, "big")
+    result = ""
+    while number > 0:
+        number, remainder = divmod(number, 58)
+        result = ALPHABET[remainder] + result
+    return "1" * (len(data) - len(data.lstrip(b"\x00"))) + result
+
+
+def varInt(n):
+    if n < 0xfd:
+        return bytes([n])
+    return b"\xfd" + struct.pack("<H", n)
+
+
+def push(data):
+    if len(data) < 0x4c:
+        return bytes([len(data)]) + data
+    return b"\x4c" + bytes([len(data)]) + data
+
+
+def key(seed, compressed=True):
+    digest = hashlib.sha256(seed.encode()).digest()
+    if compressed:
+        return b"\x02" + digest
+    return b"\x04" + digest + hashlib.sha256(digest).digest()
+
+
+def keyHash(seed):
+    return hashlib.sha256(seed.encode()).digest()[:20]
+
+
+def fakeHash(seed):
+    return hashlib.sha256(seed.encode()).digest()
+
+
+def p2pkh(pubKeyHash):
+    return b"\x76\xa9\x14" + pubKeyHash + b"\x88\xac"
+
+
+def p2sh(scriptHash):
+    return b"\xa9\x14" + scriptHash + b"\x87"
+
+
+def p2pk(pubKey):
+    return push(pubKey) + b"\xac"
+
+
+def multisig(required, pubKeys):
+    return bytes([0x50 + required]) + b"".join(push(pubKey) for pubKey in pubKeys) + bytes([0x50 + len(pubKeys)]) + b"\xae"
+
+
+def heightPush(height):
+    data = height.to_bytes((height.bit_length() + 8) // 8, "little")
+    return push(data)
+
+
+def amount(value):
+    # numbers are written unquoted, the way nodes report them
+    return "__number:%d.%08d" % (value // COIN, value % COIN)
+
+
+def serializeTx(version, inputs, outputs, payload=None):
+    data = struct.pack("<I", version) + varInt(len(inputs))
+    for prevHash, prevIndex, scriptSig in inputs:
+        data += prevHash[::-1] + struct.pack("<I", prevIndex) + varInt(len(scriptSig)) + scriptSig + b"\xff\xff\xff\xff"
+    data += varInt(len(outputs))
+    for value, script, _, _ in outputs:
+        data += struct.pack("<Q", value) + varInt(len(script)) + script
+    data += b"\x00\x00\x00\x00"
+    if payload is not None:
+        data += varInt(len(payload)) + payload
+    return data
+
+
+def txJson(data, version, inputs, outputs, coinbase=False):
+    # outputs are (value, script, type, addresses) as reported by the node
+    vin = []
+    for prevHash, prevIndex, scriptSig in inputs:
+        if coinbase:
+            vin.append({"coinbase": scriptSig.hex(), "sequence": 4294967295})
+        else:
+            vin.append({"txid": prevHash.hex(), "vout": prevIndex, "scriptSig": {"hex": scriptSig.hex()},
+                        "sequence": 4294967295})
+    vout = []
+    for index, (value, script, outputType, addresses) in enumerate(outputs):
+        scriptPubKey = {"hex": script.hex(), "type": outputType}
+        if len(addresses) > 0:
+            scriptPubKey["reqSigs"] = 1
+            scriptPubKey["addresses"] = addresses
+        vout.append({"value": amount(value), "n": index, "scriptPubKey": scriptPubKey})
+    return {"txid": sha256d(data)[::-1].hex(), "version": version, "size": len(data), "locktime": 0, "vin": vin, "vout": vout}
+
+
+def merkleRoot(txs):
+    level = [sha256d(tx) for tx in txs]
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [sha256d(level[i] + level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0]
+
+
+def header(version, prevHash, txs, time, bits, nonce):
+    return struct.pack("<i", version) + prevHash[::-1] + merkleRoot(txs) + struct.pack("<III", time, bits, nonce)
+
+
+def difficulty(bits):
+    target = (bits & 0xffffff) << (8 * ((bits >> 24) - 3))
+    return "__number:%r" % (0xffff * 2**208 / target)
+
+
+def chainwork(bits, height):
+    target = (bits & 0xffffff) << (8 * ((bits >> 24) - 3))
+    return "%064x" % (2**256 // (target + 1) * (height + 1))
+
+
+def writeFixture(name, source, height, blockHash, headerData, prevHash, rawBlock, txs, extraCalls=()):
+    version, _, _, time, bits, nonce = struct.unpack("<i32s32sIII", headerData)
+    headerDict = {"hash": blockHash, "height": height, "version": version, "merkleroot": headerData[36:68][::-1].hex(),
+                  "time": time, "mediantime": time - 600, "nonce": nonce, "bits": "%08x" % bits,
+                  "difficulty": difficulty(bits), "chainwork": chainwork(bits, height),
+                  "previousblockhash": prevHash.hex()}
+    blockDict = dict(headerDict)
+    blockDict["size"] = len(rawBlock)
+    blockDict["tx"] = [txDict["txid"] for txDict in txs]
+    calls = [{"method": "getblockhash", "params": [height], "result": blockHash},
+             {"method": "getblockheader", "params": [blockHash, True], "result": headerDict},
+             {"method": "getblock", "params": [blockHash, False], "result": rawBlock.hex()},
+             {"method": "getblock", "params": [blockHash], "result": blockDict}]
+    calls += [{"method": "getrawtransaction", "params": [txDict["txid"], 1], "result": txDict} for txDict in txs]
+    calls += list(extraCalls)
+    text = json.dumps({"source": source, "height": height, "calls": calls}, indent=2)
+    with open(os.path.join(FIXTURES_DIR, name), "w") as f:
+        f.write(re.sub(r'"__number:([^"]*)"', r"\1", text) + "\n")
+
+
+def buildBitcoinSv():
+    # P2PKH spend paying to P2PKH, P2SH, bare 1-of-2 multisig, OP_FALSE OP_RETURN and a nonstandard script
+    height, time, bits = 500000, 1511837000, 0x18009645
+    payee, change, script = keyHash("bsv payee"), keyHash("bsv change"), keyHash("bsv script")
+    keyA, keyB = key("bsv multisig a"), key("bsv multisig b", compressed=False)
+    coinbaseInputs = [(b"\x00" * 32, 0xffffffff, heightPush(height) + push(b"/coinmetrics/"))]
+    coinbaseOutputs = [(1250000000 + 2260, p2pkh(payee), "pubkeyhash", [base58Check(0x00, payee)])]
+    coinbase = serializeTx(1, coinbaseInputs, coinbaseOutputs)
+
+    spendInputs = [(fakeHash("bsv prev tx"), 3, push(bytes(range(71))) + push(key("bsv spender")))]
+    spendOutputs = [
+        (123456789, p2pkh(change), "pubkeyhash", [base58Check(0x00, change)]),
+        (50000000, p2sh(script), "scripthash", [base58Check(0x05, script)]),
+        (1000, multisig(1, [keyA, keyB]), "multisig", [base58Check(0x00, hash160(keyA)), base58Check(0x00, hash160(keyB))]),
+        (0, b"\x00\x6a" + push(b"coinmetrics fixture"), "nulldata", []),
+        (546, b"\x51", "nonstandard", []),
+    ]
+    spend = serializeTx(2, spendInputs, spendOutputs)
+
+    prevHash = fakeHash("bsv previous block")
+    headerData = header(0x20000000, prevHash, [coinbase, spend], time, bits, 1234)
+    rawBlock = headerData + varInt(2) + coinbase + spend
+    txs = [txJson(coinbase, 1, coinbaseInputs, coinbaseOutputs, coinbase=True), txJson(spend, 2, spendInputs, spendOutputs)]
+    writeFixture("bsv_constructed.json", "constructed block in Bitcoin SV serialization, not taken from the chain", height,
+                 sha256d(headerData)[::-1].hex(), headerData, prevHash, rawBlock, txs)
+
+
+def buildDogecoin():
+    # merge-mined block: auxpow with one-element coinbase and chain branches, P2SH and 2-of-3 multisig outputs
+    height, time, bits = 400000, 1443700000, 0x1b267eeb
+    miner, script = keyHash("doge miner"), keyHash("doge script")
+    keys = [key("doge multisig a"), key("doge multisig b"), key("doge multisig c", compressed=False)]
+    coinbaseInputs = [(b"\x00" * 32, 0xffffffff, heightPush(height) + push(b"auxpow"))]
+    coinbaseOutputs = [(10000 * COIN + 100000000, p2pkh(miner), "pubkeyhash", [base58Check(0x1e, miner)])]
+    coinbase = serializeTx(1, coinbaseInputs, coinbaseOutputs)
+
+    spendInputs = [(fakeHash("doge prev tx"), 0, push(bytes(range(72))) + push(key("doge spender")))]
+    spendOutputs = [
+        (420 * COIN, p2sh(script), "scripthash", [base58Check(0x16, script)]),
+        (69 * COIN, multisig(2, keys), "multisig", [base58Check(0x1e, hash160(pubKey)) for pubKey in keys]),
+    ]
+    spend = serializeTx(1, spendInputs, spendOutputs)
+
+    prevHash = fakeHash("doge previous block")
+    headerData = header(0x00620104, prevHash, [coinbase, spend], time, bits, 0)
+    parentCoinbase = serializeTx(1, [(b"\x00" * 32, 0xffffffff, b"\xfa\xbe\x6d\x6d" + sha256d(headerData)[::-1] + b"\x01\x00\x00\x00")],
+                                 [(25 * COIN, p2pkh(keyHash("ltc miner")), None, None)])
+    parentHeader = header(0x20000000, fakeHash("ltc previous block"), [parentCoinbase, b"ltc tx"], time - 10, 0x1b00ffff, 77)
+    auxPow = parentCoinbase + sha256d(parentHeader) + varInt(1) + fakeHash("coinbase branch") + struct.pack("<i", 0) + \
+        varInt(1) + fakeHash("chain branch") + struct.pack("<i", 1) + parentHeader
+    rawBlock = headerData + auxPow + varInt(2) + coinbase + spend
+    txs = [txJson(coinbase, 1, coinbaseInputs, coinbaseOutputs, coinbase=True), txJson(spend, 1, spendInputs, spendOutputs)]
+    writeFixture("doge_constructed.json", "constructed merge-mined block in Dogecoin serialization, not taken from the chain",
+                 height, fakeHash("doge block %d" % height).hex(), headerData, prevHash, rawBlock, txs)
+
+
+def buildDash():
+    # DIP3 coinbase with a CbTx special transaction payload, a normal transaction with P2SH and nulldata outputs
+    height, time, bits = 1100000, 1560000000, 0x1930aa3e
+    miner, masternode, script = keyHash("dash miner"), keyHash("dash masternode"), keyHash("dash script")
+    coinbaseVersion = 3 | (5 << 16)
+    payload = struct.pack("<HI", 2, height) + fakeHash("mn list root") + fakeHash("quorum root")
+    coinbaseInputs = [(b"\x00" * 32, 0xffffffff, heightPush(height) + push(b"dash"))]
+    coinbaseOutputs = [(155000000, p2pkh(miner), "pubkeyhash", [base58Check(0x4c, miner)]),
+                       (155000000, p2pkh(masternode), "pubkeyhash", [base58Check(0x4c, masternode)])]
+    coinbase = serializeTx(coinbaseVersion, coinbaseInputs, coinbaseOutputs, payload)
+
+    spendInputs = [(fakeHash("dash prev tx"), 1, push(bytes(range(71))) + push(key("dash spender")))]
+    spendOutputs = [(77700000, p2sh(script), "scripthash", [base58Check(0x10, script)]),
+                    (0, b"\x6a" + push(b"coinmetrics"), "nulldata", [])]
+    spend = serializeTx(2, spendInputs, spendOutputs)
+
+    prevHash = fakeHash("dash previous block")
+    headerData = header(0x20000000, prevHash, [coinbase, spend], time, bits, 555)
+    rawBlock = headerData + varInt(2) + coinbase + spend
+    coinbaseJson = txJson(coinbase, 3, coinbaseInputs, coinbaseOutputs, coinbase=True)
+    coinbaseJson.update({"type": 5, "extraPayloadSize": len(payload), "extraPayload": payload.hex(),
+                         "cbTx": {"version": 2, "height": height, "merkleRootMNList": fakeHash("mn list root")[::-1].hex(),
+                                  "merkleRootQuorums": fakeHash("quorum root")[::-1].hex()}})
+    txs = [coinbaseJson, txJson(spend, 2, spendInputs, spendOutputs)]
+    writeFixture("dash_constructed.json", "constructed block in Dash serialization with a DIP3 coinbase, not taken from the chain",
+                 height, fakeHash("dash block %d" % height).hex(), headerData, prevHash, rawBlock, txs)
+
+
+def buildPivx():
+    # proof of stake block of version 4: accumulator checkpoint, empty coinbase, coinstake, zerocoin spend and mint,
+    # block signature
+    height, time, bits = 900000, 1509000000, 0x1b0e8cb3
+    staker = key("pivx staker")
+    coinbaseInputs = [(b"\x00" * 32, 0xffffffff, heightPush(height))]
+    coinbaseOutputs = [(0, b"", "nonstandard", [])]
+    coinbase = serializeTx(1, coinbaseInputs, coinbaseOutputs)
+
+    stakeInputs = [(fakeHash("pivx staked tx"), 1, push(bytes(range(71))))]
+    stakeOutputs = [(0, b"", "nonstandard", []),
+                    (1005 * COIN, p2pk(staker), "pubkey", [base58Check(0x1e, hash160(staker))])]
+    coinstake = serializeTx(1, stakeInputs, stakeOutputs)
+
+    spendInputs = [(b"\x00" * 32, 0xffffffff, b"\xc2" + push(fakeHash("coin spend")) + push(bytes(64)))]
+    spendOutputs = [(99980000, p2pkh(keyHash("pivx redeemer")), "pubkeyhash", [base58Check(0x1e, keyHash("pivx redeemer"))])]
+    spend = serializeTx(1, spendInputs, spendOutputs)
+
+    mintInputs = [(fakeHash("pivx mint funding tx"), 0, push(bytes(range(72))) + push(key("pivx minter")))]
+    mintOutputs = [(10 * COIN, b"\xc1" + push(fakeHash("public coin") * 2), "zerocoinmint", []),
+                   (4990000, p2pkh(keyHash("pivx change")), "pubkeyhash", [base58Check(0x1e, keyHash("pivx change"))])]
+    mint = serializeTx(1, mintInputs, mintOutputs)
+
+    prevHash = fakeHash("pivx previous block")
+    checkpoint = fakeHash("accumulator checkpoint")
+    headerData = header(4, prevHash, [coinbase, coinstake, spend, mint], time, bits, 0)
+    rawBlock = headerData + checkpoint + varInt(4) + coinbase + coinstake + spend + mint + push(bytes(range(70)))
+    txs = [txJson(coinbase, 1, coinbaseInputs, coinbaseOutputs, coinbase=True), txJson(coinstake, 1, stakeInputs, stakeOutputs),
+           txJson(spend, 1, spendInputs, spendOutputs), txJson(mint, 1, mintInputs, mintOutputs)]
+    extraCalls = [{"method": "getspentzerocoinamount", "params": [txs[2]["txid"], 0], "result": amount(COIN)}]
+    writeFixture("pivx_constructed.json", "constructed proof of stake block in PIVX serialization, not taken from the chain",
+                 height, sha256d(headerData + checkpoint)[::-1].hex(), headerData, prevHash, rawBlock, txs, extraCalls)
+
+
+if __name__ == "__main__":
+    buildBitcoinSv()
+    buildDogecoin()
+    buildDash()
+    buildPivx()
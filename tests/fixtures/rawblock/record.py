@@ -0,0 +1,44 @@
+# records node responses for a block in the format replayed by tests/test_rawblock.py:
+# python -m tests.fixtures.rawblock.record pivx host:port:user:password 1156138 pivx_1156138.json
+import json
+import os
+import sys
+from coinmetrics.bitsql.constants import SUPPORTED_ASSETS
+from coinmetrics.bitsql import nodeFactory
+from coinmetrics.utils.arguments import bitcoin_node_connection_argument
+
+
+class RecordingRpcAccess(object):
+
+    def __init__(self, rpc):
+        self.rpc = rpc
+        self.calls = []
+
+    def call(self, method, params=None):
+        result = self.rpc.call(method, params)
+        self.calls.append({"method": method, "params": params, "result": result})
+        return result
+
+    def bulkCall(self, methodParamsTuples):
+        return [self.call(method, params) for method, params in methodParamsTuples]
+
+
+def main():
+    asset, nodeParams, height, fileName = sys.argv[1], bitcoin_node_connection_argument(sys.argv[2]), int(sys.argv[3]), sys.argv[4]
+    if asset not in SUPPORTED_ASSETS:
+        raise Exception("unknown asset %s" % asset)
+
+    calls = []
+    for rawBlocks in [False, True]:
+        node = nodeFactory(asset, *nodeParams, rawBlocks=rawBlocks)
+        node.bitcoinAccess = RecordingRpcAccess(node.bitcoinAccess)
+        node.getBlock(height)
+        calls += [call for call in node.bitcoinAccess.calls if call not in calls]
+
+    with open(os.path.join(os.path.dirname(__file__), fileName), "w") as f:
+        json.dump({"source": "%s block %d, recorded from a node" % (asset, height), "height": height, "calls": calls}, f, indent=2)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
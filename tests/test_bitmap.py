@@ -0,0 +1,84 @@
+import random
+import unittest
+from coinmetrics.bitsql.bitmap import RoaringBitmap, ARRAY_CONTAINER_MAX_SIZE
+
+
+def bitmapFromIds(ids):
+    containers = {}
+    for value in sorted(set(ids)):
+        containers.setdefault(value >> 16, []).append(value & 0xffff)
+    return RoaringBitmap.fromContainers(containers)
+
+
+def getIds(bitmap):
+    ids = set()
+    for key, container in bitmap.containers.items():
+        if isinstance(container, list):
+            values = container
+        else:
+            values = [value for value in range(65536) if (container >> value) & 1]
+        ids.update((key << 16) | value for value in values)
+    return ids
+
+
+class RoaringBitmapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.random = random.Random(42)
+        # a sparse container, a dense one, a full one and one right at the array size limit
+        self.sparseIds = set(self.random.sample(range(0, 65536), 100))
+        self.denseIds = set(self.random.sample(range(3 << 16, 4 << 16), 20000))
+        self.fullIds = set(range(7 << 16, 8 << 16))
+        self.limitIds = set(self.random.sample(range(9 << 16, 10 << 16), ARRAY_CONTAINER_MAX_SIZE))
+
+    def test_container_kinds(self):
+        bitmap = bitmapFromIds(self.sparseIds | self.denseIds | self.fullIds | self.limitIds)
+        self.assertIsInstance(bitmap.containers[0], list)
+        self.assertIsInstance(bitmap.containers[3], int)
+        self.assertIsInstance(bitmap.containers[7], int)
+        self.assertIsInstance(bitmap.containers[9], list)
+
+    def test_serialize_round_trip(self):
+        for name, ids in [("empty", set()), ("sparse", self.sparseIds), ("dense", self.denseIds), ("full", self.fullIds),
+                          ("limit", self.limitIds), ("mixed", self.sparseIds | self.denseIds | self.fullIds | self.limitIds)]:
+            with self.subTest(bitmap=name):
+                data = bitmapFromIds(ids).serialize()
+                restored = RoaringBitmap.deserialize(memoryview(data))
+                self.assertEqual(getIds(restored), ids)
+                self.assertEqual(restored.getCardinality(), len(ids))
+                self.assertEqual(restored.serialize(), data)
+
+    def test_union(self):
+        otherSparseIds = set(self.random.sample(range(0, 65536), 100))
+        otherDenseIds = set(self.random.sample(range(3 << 16, 4 << 16), 100))
+        # two arrays whose union no longer fits an array container
+        halfIds = set(self.random.sample(range(11 << 16, 12 << 16), 3000))
+        otherHalfIds = set(self.random.sample(range(11 << 16, 12 << 16), 3000))
+        left = self.sparseIds | self.denseIds | halfIds
+        right = otherSparseIds | otherDenseIds | self.fullIds | otherHalfIds
+
+        bitmap = bitmapFromIds(left)
+        bitmap.union(bitmapFromIds(right))
+        self.assertEqual(getIds(bitmap), left | right)
+        self.assertEqual(bitmap.getCardinality(), len(left | right))
+        self.assertIsInstance(bitmap.containers[11], int)
+
+        restored = RoaringBitmap.deserialize(bitmap.serialize())
+        self.assertEqual(getIds(restored), left | right)
+
+    def test_union_is_idempotent(self):
+        ids = self.sparseIds | self.denseIds
+        bitmap = bitmapFromIds(ids)
+        bitmap.union(bitmapFromIds(ids))
+        bitmap.union(RoaringBitmap())
+        self.assertEqual(bitmap.getCardinality(), len(ids))
+
+    def test_cardinality(self):
+        self.assertEqual(RoaringBitmap().getCardinality(), 0)
+        self.assertEqual(bitmapFromIds(self.fullIds).getCardinality(), 65536)
+        self.assertEqual(bitmapFromIds(self.sparseIds | self.denseIds | self.limitIds).getCardinality(),
+                         len(self.sparseIds) + len(self.denseIds) + len(self.limitIds))
+
+
+if __name__ == "__main__":
+    unittest.main()
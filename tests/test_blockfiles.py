@@ -0,0 +1,89 @@
+import importlib.util
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from coinmetrics.bitsql.blockfiles import BlockFileNode, INDEX_RECORD
+from coinmetrics.bitsql.node import BitcoinNode
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "blockfiles")
+GENESIS_HASH = "000000000019d6689c085ae165831e934ff763ae46a2a6c172b3f1b60a8ce26f"
+
+
+def loadGenerator():
+    spec = importlib.util.spec_from_file_location("generate", os.path.join(FIXTURES_DIR, "generate.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class BlockFileNodeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.blocksDir = os.path.join(self.tempDir, "blocks")
+        shutil.copytree(FIXTURES_DIR, self.blocksDir)
+        self.indexPath = os.path.join(self.tempDir, "blocks.idx")
+        self.log = logging.getLogger("test_blockfiles")
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def createNode(self):
+        node = BitcoinNode("localhost", 8332, "user", "password")
+        return BlockFileNode("btc", node, self.blocksDir, self.indexPath, self.log)
+
+    def getChainTags(self, blockFileNode):
+        tags = []
+        for height in range(1, blockFileNode.getBlockCount() + 1):
+            coinbaseScript = bytes.fromhex(blockFileNode.getBlock(height).getTransactions()[0].getCoinbaseScript())
+            tags.append(coinbaseScript[5:].decode())
+        return tags
+
+    def test_best_chain(self):
+        blockFileNode = self.createNode()
+        self.assertIsNotNone(blockFileNode.xorKey)
+        self.assertEqual(len(blockFileNode.entries), 5)
+        self.assertEqual(blockFileNode.getBlockCount(), 3)
+        self.assertEqual(self.getChainTags(blockFileNode), ["main 1", "main 2", "main 3"])
+
+        genesis = blockFileNode.getBlock(0)
+        self.assertEqual(genesis.hashAsNumber, int(GENESIS_HASH, base=16))
+        self.assertEqual(genesis.getTransactions()[0].getOutputs()[0][2], ["1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa"])
+        for height, block in enumerate(blockFileNode.getBlocks(range(4))):
+            self.assertEqual(block.blockHeight, height)
+            self.assertEqual(block.chainworkAsNumber, (height + 1) * 0x100010001)
+            self.assertEqual(block.difficulty, 1.0)
+
+    def test_index_reload(self):
+        blockFileNode = self.createNode()
+        chain = [entry.blockHash for entry in blockFileNode.chain]
+        self.assertEqual(os.path.getsize(self.indexPath), 5 * INDEX_RECORD.size)
+
+        reloadedNode = self.createNode()
+        self.assertEqual(os.path.getsize(self.indexPath), 5 * INDEX_RECORD.size)
+        self.assertEqual([entry.blockHash for entry in reloadedNode.chain], chain)
+        self.assertEqual(self.getChainTags(reloadedNode), ["main 1", "main 2", "main 3"])
+
+    def test_appended_block(self):
+        blockFileNode = self.createNode()
+        generator = loadGenerator()
+        tip = blockFileNode.chain[-1]
+        block4 = generator.makeBlock(tip.blockHash, 4, tip.time + 600, b"main 4")
+        # node writes the new block over the preallocated space right after the last one
+        offset = tip.offset + tip.size
+        data = bytes(b ^ generator.XOR_KEY[(offset + i) % len(generator.XOR_KEY)]
+                     for i, b in enumerate(generator.record(block4)))
+        with open(os.path.join(self.blocksDir, "blk00001.dat"), "r+b") as f:
+            f.seek(offset)
+            f.write(data)
+
+        self.assertEqual(blockFileNode.getBlockCount(), 4)
+        self.assertEqual(self.getChainTags(blockFileNode), ["main 1", "main 2", "main 3", "main 4"])
+        self.assertEqual(os.path.getsize(self.indexPath), 6 * INDEX_RECORD.size)
+        self.assertEqual(self.createNode().getBlockCount(), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import json
+import os
+import unittest
+from coinmetrics.bitsql import rawblock
+from coinmetrics.bitsql.constants import OUTPUT_TYPES
+from coinmetrics.bitsql.node import BitcoinSvNode, DashNode, DogecoinNode, PivxNode, VergeNode
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "rawblock")
+
+
+class RecordedRpcAccess(object):
+    # replays recorded node responses, floats are kept as strings just like JsonRpcCaller does
+
+    def __init__(self, fileName):
+        with open(os.path.join(FIXTURES_DIR, fileName)) as f:
+            fixture = json.load(f, parse_float=lambda f: f)
+        self.height = fixture["height"]
+        self.responses = {}
+        for call in fixture["calls"]:
+            self.responses[(call["method"], json.dumps(call["params"]))] = call["result"]
+
+    def call(self, method, params=None):
+        return self.responses[(method, json.dumps(params))]
+
+    def bulkCall(self, methodParamsTuples):
+        return [self.call(method, params) for method, params in methodParamsTuples]
+
+
+def createNode(nodeClass, fileName, rawBlocks):
+    node = nodeClass("localhost", 8332, "user", "password", rawBlocks=rawBlocks)
+    node.bitcoinAccess = RecordedRpcAccess(fileName)
+    return node
+
+
+def getBlockRows(block):
+    transactions = []
+    for tx in block.getTransactions():
+        transactions.append((tx.txHash, tx.txSize, tx.txTime, tx.txMedianTime, tx.coinbase, tx.getCoinbaseScript(),
+                             tx.getInputs(), tx.getOutputs()))
+    return (block.blockHeight, block.hashAsNumber, block.chainworkAsNumber, block.blockTime, block.blockMedianTime,
+            block.blockSize, block.difficulty, transactions)
+
+
+class RawBlockTest(unittest.TestCase):
+
+    FIXTURES = [
+        (BitcoinSvNode, "bsv_genesis.json"),
+        (BitcoinSvNode, "bsv_block1.json"),
+        (DogecoinNode, "doge_genesis.json"),
+        (DashNode, "dash_genesis.json"),
+        (PivxNode, "pivx_genesis.json"),
+        (VergeNode, "xvg_synthetic.json"),
+        (BitcoinSvNode, "bsv_constructed.json"),
+        (DogecoinNode, "doge_constructed.json"),
+        (DashNode, "dash_constructed.json"),
+        (PivxNode, "pivx_constructed.json"),
+    ]
+
+    def test_raw_and_json_blocks_are_equal(self):
+        for nodeClass, fileName in self.FIXTURES:
+            with self.subTest(fixture=fileName):
+                jsonNode = createNode(nodeClass, fileName, False)
+                rawNode = createNode(nodeClass, fileName, True)
+                height = jsonNode.bitcoinAccess.height
+                jsonBlock = jsonNode.getBlock(height)
+                rawBlock = rawNode.getBlock(height)
+                self.assertGreater(len(jsonBlock.getTransactions()), 0)
+                self.assertEqual(getBlockRows(jsonBlock), getBlockRows(rawBlock))
+
+    def test_decoded_transactions_match_merkle_root(self):
+        for nodeClass, fileName in self.FIXTURES:
+            with self.subTest(fixture=fileName):
+                node = createNode(nodeClass, fileName, True)
+                access = node.bitcoinAccess
+                blockHash = access.call("getblockhash", [access.height])
+                headerDict = access.call("getblockheader", [blockHash, True])
+                rawBlock = bytes.fromhex(access.call("getblock", [blockHash, False]))
+                header, txDicts = rawblock.decodeBlock(rawBlock, node.getRawBlockFormat())
+                hashes = [bytes.fromhex(txDict["txid"])[::-1] for txDict in txDicts]
+                while len(hashes) > 1:
+                    if len(hashes) % 2 == 1:
+                        hashes.append(hashes[-1])
+                    hashes = [rawblock.doubleSha256(hashes[i] + hashes[i + 1]) for i in range(0, len(hashes), 2)]
+                self.assertEqual(rawblock.hashToHex(hashes[0]), headerDict["merkleroot"])
+                self.assertEqual(header["time"], headerDict["time"])
+
+    def test_sha256_block_hashes(self):
+        for fileName, blockHash in [
+                ("bsv_genesis.json", "000000000019d6689c085ae165831e934ff763ae46a2a6c172b3f1b60a8ce26f"),
+                ("bsv_block1.json", "00000000839a8e6886ab5951d76f411475428afc90947ee320161bbf18eb6048"),
+                ("doge_genesis.json", "1a91e3dace36e2be3bf030a65679fe821aa1d6ef92e7c9902eb318182c355691")]:
+            with self.subTest(fixture=fileName):
+                access = RecordedRpcAccess(fileName)
+                rawBlock = bytes.fromhex(access.call("getblock", [blockHash, False]))
+                self.assertEqual(rawblock.decodeBlockHeader(rawBlock)["hash"], blockHash)
+
+    def test_genesis_address(self):
+        block = createNode(BitcoinSvNode, "bsv_genesis.json", True).getBlock(0)
+        outputs = block.getTransactions()[0].getOutputs()
+        self.assertEqual(outputs[0][2], ["1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa"])
+        self.assertEqual(outputs[0][4], 50 * 100000000)
+
+    def test_output_types(self):
+        # addresses were derived by construct.py, which doesn't use the raw block decoder
+        for nodeClass, fileName, txIndex, expectedOutputs in [
+                (BitcoinSvNode, "bsv_constructed.json", 1, [
+                    ("pubkeyhash", ["1FALmmLGNvXW7WHnKpoEnkWdWmmQUz6MzW"]),
+                    ("scripthash", ["3MQ3iA7fU7wS6soWcXFkKGxDxKhaougAzc"]),
+                    ("multisig", ["1GQMpn6tRpsBCQJhQup2H2P9XWTYu4HomJ", "1QKmW16tXNfQwDmGA8kcx96gQr1YLZMMzi"]),
+                    ("nulldata", []),
+                    ("nonstandard", [])]),
+                (DogecoinNode, "doge_constructed.json", 1, [
+                    ("scripthash", ["9rvSuNHXiL1nUBXWpRb8it9zmuVyLpSRes"]),
+                    ("multisig", ["DDXQnE3jyQruYSshhWHgWYgbq4TxDpNSAK", "D5sbrYWNQJVefQTdeTC7Gmb119yKUM4Npx",
+                                  "D7Tw7W6gf6Jsyht3teJt6pM1WgsFCRzgc7"])]),
+                (DashNode, "dash_constructed.json", 0, [
+                    ("pubkeyhash", ["XamM7egCz7AkJe6ngzyqjVYCE2bN5wateK"]),
+                    ("pubkeyhash", ["Xf7F4vHTppqFrh81Pysbh1sTzz94tj6Az7"])]),
+                (DashNode, "dash_constructed.json", 1, [
+                    ("scripthash", ["7oS7A6DSfhSL6Ns8yJVPJ8UCrBmTrN2SSo"]),
+                    ("nulldata", [])]),
+                (PivxNode, "pivx_constructed.json", 1, [
+                    ("nonstandard", []),
+                    ("pubkey", ["DQNqC41ThXsRLxqdU44h73FuvGbjWyMZmq"])])]:
+            with self.subTest(fixture=fileName, txIndex=txIndex):
+                node = createNode(nodeClass, fileName, True)
+                transaction = node.getBlock(node.bitcoinAccess.height).getTransactions()[txIndex]
+                outputs = [(output[1], output[2]) for output in transaction.getOutputs()]
+                self.assertEqual(outputs, [(OUTPUT_TYPES[outputType], addresses) for outputType, addresses in expectedOutputs])
+
+    def test_pivx_zerocoin(self):
+        for rawBlocks in [False, True]:
+            with self.subTest(rawBlocks=rawBlocks):
+                node = createNode(PivxNode, "pivx_constructed.json", rawBlocks)
+                coinbase, coinstake, spend, mint = node.getBlock(900000).getTransactions()
+                self.assertEqual([coinbase.coinbase, coinstake.coinbase, spend.coinbase, mint.coinbase], [True, True, False, False])
+                self.assertEqual(len(coinstake.getInputs()), 1)
+                self.assertEqual((spend.getInputs(), spend.getZerocoinSpends()), ([], [100000000]))
+                self.assertEqual(mint.getZerocoinMints(), [1000000000])
+                self.assertEqual([output[0] for output in mint.getOutputs()], [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import random
+import unittest
+from coinmetrics.bitsql.constants import SKETCH_RELATIVE_ACCURACY
+from coinmetrics.bitsql.sketch import QuantileSketch
+
+QUANTILES = [0.0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1.0]
+
+
+def getValues(seed, count):
+    # satoshi amounts spread over many orders of magnitude, with some zero fees
+    generator = random.Random(seed)
+    return [0 if generator.random() < 0.05 else int(generator.lognormvariate(14, 3)) for _ in range(count)]
+
+
+def sketchOf(values):
+    sketch = QuantileSketch()
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+class QuantileSketchTest(unittest.TestCase):
+
+    def test_merge(self):
+        values = getValues(1, 30000)
+        merged = QuantileSketch()
+        # like block sketches rolled up into a day
+        for i in range(0, len(values), 1000):
+            part = sketchOf(values[i:i + 1000])
+            merged.addBuckets(*part.getBuckets())
+
+        whole = sketchOf(values)
+        self.assertEqual(merged.count, len(values))
+        self.assertEqual(merged.getBuckets(), whole.getBuckets())
+        for quantile in QUANTILES:
+            self.assertEqual(merged.getQuantile(quantile), whole.getQuantile(quantile))
+
+    def test_bounded_error(self):
+        for seed in range(5):
+            values = getValues(seed, 20000)
+            sketch = sketchOf(values)
+            values.sort()
+            for quantile in QUANTILES:
+                with self.subTest(seed=seed, quantile=quantile):
+                    # percentile_disc of the rank used by getQuantile
+                    exact = values[int(quantile * (len(values) - 1))]
+                    estimate = sketch.getQuantile(quantile)
+                    if exact == 0:
+                        self.assertEqual(estimate, 0)
+                    else:
+                        self.assertLessEqual(abs(estimate - exact), SKETCH_RELATIVE_ACCURACY * exact)
+
+    def test_empty(self):
+        self.assertIsNone(QuantileSketch().getQuantile(0.5))
+
+
+if __name__ == "__main__":
+    unittest.main()